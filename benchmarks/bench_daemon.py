@@ -0,0 +1,61 @@
+"""
+Times repeated 'gitter status' calls in a generated repository, each a new
+process as editor integrations run them, with and without the daemon.
+
+Usage:
+    python benchmarks/bench_daemon.py [--files 10000] [--runs 20]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SERVICE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "service.py")
+
+
+def gitter(*args, env=None):
+    subprocess.run(
+        [sys.executable, SERVICE, *args], check=True, stdout=subprocess.DEVNULL, env=env
+    )
+
+
+def time_runs(runs, env=None):
+    start = time.perf_counter()
+    for _ in range(runs):
+        gitter("status", env=env)
+    return (time.perf_counter() - start) / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=20)
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        gitter("init")
+        for i in range(options.files):
+            path = f"src/pkg{i // 1000}/file{i}.txt"
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(f"line {i}\n")
+        gitter("add", ".")
+        gitter("commit", "-m", "Generated files")
+
+        local = time_runs(options.runs, env=dict(os.environ, GITTER_NO_DAEMON="1"))
+        gitter("daemon", "start")
+        try:
+            gitter("status")  # Loads the repository into the daemon
+            daemon = time_runs(options.runs)
+        finally:
+            gitter("daemon", "stop")
+
+    print(f"{'files':>8} {'local s':>9} {'daemon s':>9}")
+    print(f"{options.files:>8} {local:>9.4f} {daemon:>9.4f}")
+
+
+if __name__ == "__main__":
+    main()
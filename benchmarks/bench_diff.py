@@ -0,0 +1,73 @@
+"""
+Times the diff algorithms on generated inputs shaped like lockfiles and SQL
+dumps: many similar lines with scattered edits, insertions and deletions.
+
+Usage:
+    python benchmarks/bench_diff.py [--lines 10000,100000,1000000] [--changes 0.01]
+                                    [--algorithms myers,patience,histogram] [--difflib]
+"""
+import argparse
+import difflib
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import diff_blocks  # noqa: E402
+
+
+def make_inputs(count, change_rate, seed=0):
+    """Returns an old and new version of a count-line file with edits spread through it."""
+    rng = random.Random(seed)
+    old = [f'  "package-{i % 5000}": "^{i % 7}.{i % 13}.{i}",\n' for i in range(count)]
+    new = []
+    for line in old:
+        roll = rng.random()
+        if roll < change_rate / 3:
+            continue  # Deleted
+        if roll < 2 * change_rate / 3:
+            new.append(line.replace("^", "~"))  # Edited
+        elif roll < change_rate:
+            new.append(line)
+            new.append(f"  -- inserted {rng.random()}\n")  # Inserted
+        else:
+            new.append(line)
+    return old, new
+
+
+def time_call(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", default="10000,100000,1000000")
+    parser.add_argument("--changes", type=float, default=0.01)
+    parser.add_argument("--algorithms", default="myers,patience,histogram")
+    parser.add_argument(
+        "--difflib",
+        action="store_true",
+        help="Also time difflib.SequenceMatcher (very slow on large inputs)",
+    )
+    options = parser.parse_args()
+
+    print(f"{'lines':>9} {'algorithm':>10} {'seconds':>9} {'matched':>9}")
+    for count in [int(n) for n in options.lines.split(",")]:
+        old, new = make_inputs(count, options.changes)
+        for algorithm in options.algorithms.split(","):
+            elapsed, blocks = time_call(lambda: diff_blocks(old, new, algorithm))
+            matched = sum(size for _, _, size in blocks)
+            print(f"{count:>9} {algorithm:>10} {elapsed:>9.3f} {matched:>9}")
+        if options.difflib:
+            matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+            elapsed, blocks = time_call(matcher.get_matching_blocks)
+            matched = sum(block.size for block in blocks)
+            print(f"{count:>9} {'difflib':>10} {elapsed:>9.3f} {matched:>9}")
+
+
+if __name__ == "__main__":
+    main()
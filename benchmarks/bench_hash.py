@@ -0,0 +1,85 @@
+"""
+Measures hash_file throughput and peak memory on files of increasing size.
+
+Usage:
+    python benchmarks/bench_hash.py [--sizes 1M,100M,2G]
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import hash_file  # noqa: E402
+
+UNITS = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+
+def parse_size(text):
+    """Parses sizes such as '100M' or '2G' into a byte count."""
+    text = text.strip().upper()
+    if text[-1] in UNITS:
+        return int(text[:-1]) * UNITS[text[-1]]
+    return int(text)
+
+
+def make_file(directory, size):
+    """Writes a file of the given size without holding it in memory."""
+    block = os.urandom(1 << 20)
+    path = os.path.join(directory, f"bench-{size}.bin")
+    with open(path, "wb") as f:
+        remaining = size
+        while remaining > 0:
+            f.write(block[: min(remaining, len(block))])
+            remaining -= len(block)
+    return path
+
+
+def legacy_hash_file(path):
+    """The previous implementation, which reads the whole file at once."""
+    hasher = hashlib.sha1()
+    with open(path, "rb") as f:
+        hasher.update(f.read())
+    return hasher.hexdigest()
+
+
+def measure(func, path):
+    """Returns (seconds, peak traced bytes) for a single call."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1M,100M,2G")
+    parser.add_argument(
+        "--legacy", action="store_true", help="also run the read-all implementation"
+    )
+    options = parser.parse_args()
+
+    print(f"{'size':>8} {'impl':>9} {'MB/s':>10} {'peak mem':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for label in options.sizes.split(","):
+            size = parse_size(label)
+            path = make_file(directory, size)
+            impls = [("streaming", hash_file)]
+            if options.legacy:
+                impls.append(("legacy", legacy_hash_file))
+            for name, func in impls:
+                elapsed, peak = measure(func, path)
+                rate = size / (1 << 20) / elapsed if elapsed else float("inf")
+                print(f"{label:>8} {name:>9} {rate:>10.1f} {peak / 1024:>10.1f}KB")
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
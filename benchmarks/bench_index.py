@@ -0,0 +1,86 @@
+"""
+Times writing, loading and looking up entries in the binary index against
+the previous pretty-printed JSON index, and compares their sizes.
+
+Usage:
+    python benchmarks/bench_index.py [--entries 10000,100000] [--lookups 1000]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import IndexFile, write_index  # noqa: E402
+
+
+def make_entries(count):
+    entries = {}
+    for i in range(count):
+        path = f"src/pkg{i // 1000}/module{i // 50}/file{i}.py"
+        entries[path] = {
+            "hash": f"{i:040x}",
+            "size": i,
+            "mtime_ns": 1700000000000000000 + i,
+            "ctime_ns": 1700000000000000000 + i,
+            "ino": 1000000 + i,
+            "mode": 0o100644,
+        }
+    return entries
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", default="10000,100000")
+    parser.add_argument("--lookups", type=int, default=1000)
+    options = parser.parse_args()
+
+    print(
+        f"{'entries':>8} {'format':>7} {'size':>10} {'write s':>8} "
+        f"{'load s':>8} {'lookups s':>10}"
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        for count in (int(value) for value in options.entries.split(",")):
+            entries = make_entries(count)
+            probes = random.Random(0).sample(sorted(entries), min(options.lookups, count))
+
+            json_path = os.path.join(directory, "index.json")
+
+            def write_json():
+                with open(json_path, "w") as f:
+                    json.dump(entries, f, indent=4)
+
+            def load_json():
+                with open(json_path, "r") as f:
+                    return json.load(f)
+
+            write_seconds, _ = timed(write_json)
+            load_seconds, loaded = timed(load_json)
+            lookup_seconds, _ = timed(lambda: [loaded[path] for path in probes])
+            print(
+                f"{count:>8} {'json':>7} {os.path.getsize(json_path):>10} "
+                f"{write_seconds:>8.3f} {load_seconds:>8.3f} {lookup_seconds:>10.4f}"
+            )
+
+            binary_path = os.path.join(directory, "index")
+            write_seconds, _ = timed(lambda: write_index(entries, binary_path))
+            load_seconds, index = timed(lambda: IndexFile(binary_path))
+            lookup_seconds, _ = timed(lambda: [index.get(path) for path in probes])
+            print(
+                f"{count:>8} {'binary':>7} {os.path.getsize(binary_path):>10} "
+                f"{write_seconds:>8.3f} {load_seconds:>8.3f} {lookup_seconds:>10.4f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
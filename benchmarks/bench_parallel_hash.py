@@ -0,0 +1,100 @@
+"""
+Compares serial and parallel hashing of a tree of many files. With
+--commands, times 'gitter add', 'status' and 'commit -a' on the tree
+instead, touching every file before status and commit so they rehash it.
+
+Usage:
+    python benchmarks/bench_parallel_hash.py [--files 10000] [--size 64K] [--jobs 1,4,8]
+                                             [--commands]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_hash import parse_size  # noqa: E402
+from utils import hash_files, resolve_jobs  # noqa: E402
+
+
+def make_tree(directory, count, size):
+    """Creates count files of the given size spread over 100 directories."""
+    paths = []
+    for i in range(count):
+        subdir = os.path.join(directory, f"d{i % 100:02d}")
+        os.makedirs(subdir, exist_ok=True)
+        path = os.path.join(subdir, f"f{i}.bin")
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+        paths.append(path)
+    return paths
+
+
+SERVICE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "service.py")
+
+
+def time_gitter(*args):
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, SERVICE, *args],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        env=dict(os.environ, GITTER_NO_DAEMON="1"),
+    )
+    return time.perf_counter() - start
+
+
+def touch(paths):
+    now = time.time_ns()
+    for path in paths:
+        os.utime(path, ns=(now, now))
+
+
+def time_commands(directory, paths, jobs):
+    """Returns the seconds add, status and commit -a take with the given jobs."""
+    shutil.rmtree(os.path.join(directory, ".gitter"), ignore_errors=True)
+    time_gitter("init")
+    add = time_gitter("add", ".", "-j", str(jobs))
+    touch(paths)
+    status = time_gitter("status", "-j", str(jobs))
+    touch(paths)
+    commit = time_gitter("commit", "-a", "-m", "Benchmark", "-j", str(jobs))
+    return add, status, commit
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=10000)
+    parser.add_argument("--size", default="64K")
+    parser.add_argument("--jobs", default=f"1,{resolve_jobs()}")
+    parser.add_argument("--commands", action="store_true")
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = make_tree(directory, options.files, parse_size(options.size))
+        hash_files(paths, 1)  # Warm the page cache so runs are comparable
+
+        if options.commands:
+            os.chdir(directory)
+            print(f"{'jobs':>5} {'add s':>8} {'status s':>9} {'commit s':>9}")
+            for jobs in [int(j) for j in options.jobs.split(",")]:
+                add, status, commit = time_commands(directory, paths, jobs)
+                print(f"{jobs:>5} {add:>8.3f} {status:>9.3f} {commit:>9.3f}")
+            return
+
+        baseline = None
+        print(f"{'jobs':>5} {'seconds':>9} {'speedup':>8}")
+        for jobs in [int(j) for j in options.jobs.split(",")]:
+            start = time.perf_counter()
+            hash_files(paths, jobs)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{jobs:>5} {elapsed:>9.3f} {baseline / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
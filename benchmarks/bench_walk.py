@@ -0,0 +1,147 @@
+"""
+Counts the filesystem syscalls made to list and stat a tree, comparing the
+os.scandir walker against the previous os.walk + os.stat implementation.
+
+Directory scans and stat calls are counted by wrapping os.scandir, os.stat,
+os.lstat and DirEntry.stat, which covers every listing and stat syscall both
+implementations issue.
+
+Usage:
+    python benchmarks/bench_walk.py [--dirs 200] [--files-per-dir 50]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import compile_ignore, normalize_path, walk_files  # noqa: E402
+
+
+def legacy_get_files(paths, ignore_patterns=None):
+    """The previous os.walk based get_files followed by a stat per file."""
+    matcher = compile_ignore(ignore_patterns)
+    valid_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs[:] = [d for d in dirs if d != ".git" and d != ".gitter"]
+                for file in files:
+                    file_path = os.path.join(root, file)
+                    if not matcher.is_ignored(normalize_path(file_path)):
+                        valid_files.append(normalize_path(file_path))
+        elif os.path.exists(path):
+            valid_files.append(normalize_path(path))
+    # Callers then stat every file again to compare against the index
+    return [(path, os.stat(path)) for path in valid_files]
+
+
+class CountingEntry:
+    """Wraps a DirEntry to count the stat calls made through it."""
+
+    def __init__(self, entry, counts):
+        self._entry = entry
+        self._counts = counts
+
+    def stat(self, **kwargs):
+        self._counts["stat"] += 1
+        return self._entry.stat(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._entry, name)
+
+
+class CountingScandir:
+    """Wraps os.scandir to count directory scans and hand out counting entries."""
+
+    def __init__(self, scandir, counts):
+        self._scandir = scandir
+        self._counts = counts
+
+    def __call__(self, path="."):
+        self._counts["scandir"] += 1
+        scanner = self._scandir(path)
+        counts = self._counts
+
+        class Scanner:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc_info):
+                scanner.close()
+
+            def __iter__(self):
+                return self
+
+            def __next__(self):
+                return CountingEntry(next(scanner), counts)
+
+            def close(self):
+                scanner.close()
+
+        return Scanner()
+
+
+def count_syscalls(func):
+    """Runs func with instrumented os functions and returns (seconds, counts)."""
+    counts = Counter()
+    real_stat, real_lstat = os.stat, os.lstat
+
+    def counting_stat(*args, **kwargs):
+        counts["stat"] += 1
+        return real_stat(*args, **kwargs)
+
+    def counting_lstat(*args, **kwargs):
+        counts["stat"] += 1
+        return real_lstat(*args, **kwargs)
+
+    with mock.patch.object(os, "scandir", CountingScandir(os.scandir, counts)), \
+            mock.patch.object(os, "stat", counting_stat), \
+            mock.patch.object(os, "lstat", counting_lstat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+    return elapsed, counts
+
+
+def make_tree(directory, dirs, files_per_dir):
+    for d in range(dirs):
+        subdir = os.path.join(directory, f"pkg{d // 20}", f"mod{d}")
+        os.makedirs(subdir, exist_ok=True)
+        for f in range(files_per_dir):
+            with open(os.path.join(subdir, f"file{f}.py"), "w") as out:
+                out.write("x = 1\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dirs", type=int, default=200)
+    parser.add_argument("--files-per-dir", type=int, default=50)
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        make_tree(directory, options.dirs, options.files_per_dir)
+        old_dir = os.getcwd()
+        os.chdir(directory)
+        try:
+            runs = [
+                ("os.walk + stat", lambda: legacy_get_files(["."])),
+                ("scandir walker", lambda: list(walk_files(["."]))),
+            ]
+            print(f"{'implementation':>16} {'scandir':>8} {'stat':>8} {'seconds':>9}")
+            for name, func in runs:
+                elapsed, counts = count_syscalls(func)
+                print(
+                    f"{name:>16} {counts['scandir']:>8} {counts['stat']:>8} "
+                    f"{elapsed:>9.3f}"
+                )
+        finally:
+            os.chdir(old_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,28 @@
-from .add import AddCommand
-from .commit import CommitCommand
-from .diff import DiffCommand
-from .help import HelpCommand
-from .init import InitCommand
-from .log import LogCommand
-from .status import StatusCommand
+# Command classes by the submodule defining them, imported on first use
+_COMMANDS = {
+    "AddCommand": "add",
+    "CommitCommand": "commit",
+    "DaemonCommand": "daemon",
+    "DiffCommand": "diff",
+    "FsmonitorCommand": "fsmonitor",
+    "HelpCommand": "help",
+    "InitCommand": "init",
+    "LogCommand": "log",
+    "RepackCommand": "repack",
+    "StatusCommand": "status",
+}
+__all__ = sorted(_COMMANDS)
+
+
+def __getattr__(name):
+    module_name = _COMMANDS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = __import__(f"{__name__}.{module_name}", fromlist=[name])
+    command_class = getattr(module, name)
+    globals()[name] = command_class
+    return command_class
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_COMMANDS))
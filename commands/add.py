@@ -1,7 +1,7 @@
-import json
 import os
 
-from utils import get_files, hash_file
+from utils import (cached_hashes, entry_hash, lock_index, make_entry,
+                   read_index, smudge_racy_entries, walk_files, write_index)
 
 from .command import Command
 
@@ -9,8 +9,9 @@ from .command import Command
 class AddCommand(Command):
     def __init__(self, args):
         super().__init__(args)
-        # Load ignore patterns
-        self.ignore_patterns = self.load_ignore_patterns()
+        self.jobs = self.pop_jobs_option()
+        # Compile ignore patterns once for the whole command
+        self.ignore_matcher = self.load_ignore_matcher()
 
     def execute(self):
         if not os.path.exists(".gitter"):
@@ -21,35 +22,50 @@ class AddCommand(Command):
             print("Error: No files specified for adding.")
             return
 
-        # Load existing index
-        index_file = ".gitter/index.json"
-        if os.path.exists(index_file):
-            with open(index_file, "r") as f:
-                index = json.load(f)
-        else:
-            index = {}
+        # Load existing index, invalidating entries we can no longer trust
+        index, index_mtime_ns = read_index()
+        smudge_racy_entries(index, index_mtime_ns)
 
-        valid_files, missing_files = get_files(self.args, self.ignore_patterns)
-        if not valid_files:
+        missing_files = []
+        files = list(walk_files(self.args, self.ignore_matcher, missing_files))
+        if not files:
             print(
                 f"Error: No valid files found to add. Named as {', '.join(self.args)}"
             )
             return
 
-        newly_staged = []
-        for file in valid_files:
-            file_hash = hash_file(file)
-            if file_hash:
-                # Skip files that are already staged and unchanged
-                if file in index and index[file] == file_hash:
-                    continue
-                index[file] = file_hash
-                newly_staged.append(file)
-
-        # Update the index only if there are new or modified files
+        # Files whose stat data matches their index entry are not re-read; the
+        # rest are hashed and stored as blobs in the same read
+        file_hashes = cached_hashes(
+            files, (index, index_mtime_ns), jobs=self.jobs, store=True
+        )
+
+        # Hashing above ran without the lock so concurrent adds overlap; the
+        # entries are merged into the index as it is now, under its lock
+        with lock_index() as lock:
+            index, index_mtime_ns = read_index()
+            smudge_racy_entries(index, index_mtime_ns)
+            newly_staged = []
+            refreshed = False
+            for file, st in files:
+                file_hash = file_hashes.get(file)
+                if file_hash:
+                    entry = make_entry(file_hash, st)
+                    if file in index and index[file] == entry:
+                        continue
+                    refreshed = True
+                    # Skip files that are already staged and unchanged
+                    if file in index and entry_hash(index[file]) == file_hash:
+                        index[file] = entry
+                        continue
+                    index[file] = entry
+                    newly_staged.append(file)
+
+            # Update the index if there are new or modified files or refreshed stat data
+            if refreshed:
+                write_index(index, lock=lock)
+
         if newly_staged:
-            with open(index_file, "w") as f:
-                json.dump(index, f, indent=4)
             print("Files successfully added to index:", ", ".join(newly_staged))
         else:
             print("No new changes detected. Nothing to add.")
@@ -1,6 +1,15 @@
 import os
+import sys
+import time
 from abc import ABC, abstractmethod
 
+# Names are looked up on use, so commands that never hash or walk files do
+# not import those parts of utils
+import utils
+
+# Seconds to wait for a background process to start answering
+START_TIMEOUT = 5.0
+
 
 class Command(ABC):
     def __init__(self, args):
@@ -10,26 +19,23 @@ class Command(ABC):
     def execute(self):
         pass
 
-    def load_ignore_patterns(self):
-        """Load ignore patterns from .gitterignore or use defaults."""
-        default_patterns = [
-            "*.pyc",
-            "*.pyo",
-            "*.pyd",
-            "__pycache__/*",
-            "__pycache__/**",
-            "*.so",
-            "*.o",
-            "*.a",
-            "*.dll",
-            ".git/*",
-            ".git/**",
-            ".git",  # Ignore .git directory completely
-            ".gitter/*",
-            ".gitter/**",
-            ".gitter",  # Ignore .gitter directory completely
-        ]
+    def pop_jobs_option(self):
+        """Removes '--jobs N', '--jobs=N' or '-j N' from the args and returns N."""
+        jobs = None
+        remaining = []
+        args = iter(self.args)
+        for arg in args:
+            if arg in ("--jobs", "-j"):
+                jobs = utils.parse_jobs(next(args, None))
+            elif arg.startswith("--jobs="):
+                jobs = utils.parse_jobs(arg.split("=", 1)[1])
+            else:
+                remaining.append(arg)
+        self.args = remaining
+        return jobs
 
+    def load_ignore_patterns(self):
+        """Load ignore patterns from .gitterignore on top of the defaults."""
         ignore_file = ".gitterignore"
         if os.path.exists(ignore_file):
             with open(ignore_file, "r") as f:
@@ -38,6 +44,32 @@ class Command(ABC):
                     for line in f
                     if line.strip() and not line.startswith("#")
                 ]
-            return custom_patterns + default_patterns
+            # Later patterns win, so custom rules can override the defaults
+            return utils.DEFAULT_IGNORE_PATTERNS + custom_patterns
+
+        return list(utils.DEFAULT_IGNORE_PATTERNS)
+
+    def load_ignore_matcher(self):
+        """Compile the ignore patterns into a single matcher."""
+        return utils.compile_ignore(self.load_ignore_patterns())
+
+    def start_background(self, command, is_running):
+        """
+        Starts 'gitter <command> run' detached from the terminal and waits
+        until is_running() sees it answer. Returns whether it did in time.
+        """
+        import subprocess
 
-        return default_patterns
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(sys.argv[0]), command, "run"],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        deadline = time.monotonic() + START_TIMEOUT
+        while time.monotonic() < deadline:
+            if is_running():
+                return True
+            time.sleep(0.05)
+        return False
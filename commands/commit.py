@@ -1,10 +1,14 @@
-import hashlib
-import json
 import os
 import sys
 import time
 
-from utils import get_files, hash_file, read_file_content, should_ignore
+from utils import (append_commit, cached_hashes, commit_tree, entry_hash,
+                   hash_and_store_file, load_head_files, lock_index,
+                   make_entry, object_exists, read_commit, read_index,
+                   record_commit_paths, resolve_head, smudge_racy_entries,
+                   update_head, update_tree, walk_working_tree,
+                   write_commit, write_index, write_stat_cache,
+                   write_tree_object)
 
 from .command import Command
 
@@ -12,17 +16,19 @@ from .command import Command
 class CommitCommand(Command):
     def __init__(self, args):
         super().__init__(args)
+        self.jobs = self.pop_jobs_option()
         self.args = self._split_combined_flags(self.args)  # Ensure -am works
         self.auto_stage = "-a" in self.args
         self.message = self._parse_commit_message()
-        # Load ignore patterns
-        self.ignore_patterns = self.load_ignore_patterns()
+        # Compile ignore patterns once for the whole command
+        self.ignore_matcher = self.load_ignore_matcher()
 
     def _split_combined_flags(self, args):
         """Splits combined flags like '-am' into ['-a', '-m']."""
         split_args = []
         for arg in args:
-            if arg.startswith("-") and len(arg) > 2:  # Detect combined flags
+            # Detect combined flags, leaving long options alone
+            if arg.startswith("-") and not arg.startswith("--") and len(arg) > 2:
                 split_args.extend([f"-{char}" for char in arg[1:]])  # Split each flag
             else:
                 split_args.append(arg)
@@ -49,93 +55,131 @@ class CommitCommand(Command):
         return "\n".join(messages)
 
     def load_index(self):
-        """Loads the indexed file hashes from .gitter/index.json"""
-        index_file = ".gitter/index.json"
-        if os.path.exists(index_file):
-            with open(index_file, "r") as f:
-                return json.load(f)
-        return {}
-
-    def load_commits(self):
-        """Loads existing commits from .gitter/commits.json"""
-        commits_file = ".gitter/commits.json"
-        if os.path.exists(commits_file):
-            with open(commits_file, "r") as f:
-                return json.load(f)
-        return []
-
-    def save_commit(self, index):
-        """Saves the commit metadata and stores committed file versions in a Git-like object store."""
-        commits = self.load_commits()
-        commit_hash = self._generate_commit_hash(index)
-
-        commit_data = {
-            "hash": commit_hash,
-            "message": self.message,
-            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-            "files": index,
-        }
-        commits.append(commit_data)
-
-        with open(".gitter/commits.json", "w") as f:
-            json.dump(commits, f, indent=4)
-
-        # Store committed file contents in .gitter/objects using SHA-1 hash filenames
-        for file_path, file_hash in index.items():
-            file_content = read_file_content(file_path)
-
-            # Convert list to string before writing
-            if isinstance(file_content, list):
-                file_content = "\n".join(file_content)
-
-            self.store_object(file_hash, file_content)
-
-    def store_object(self, file_hash, content):
+        """Loads the indexed file entries and the index mtime"""
+        return read_index()
+
+    def load_last_commit_files(self):
+        """Loads the file entries of the HEAD commit and the branch ref mtime"""
+        return load_head_files()
+
+    def save_commit(self, index, head_files, deleted):
+        """
+        Stores committed file versions, applies the staged changes to the HEAD
+        tree and records a commit object linked to its parent, then moves the
+        branch ref to it. Returns None if the tree did not change.
+        """
+        # Blobs are stored when files are staged; only entries staged before
+        # that was the case still need their content written
+        for file_path, entry in index.items():
+            if not object_exists(entry_hash(entry)):
+                self.store_object(index, file_path)
+
+        # Only directories containing changes get new tree objects; all other
+        # subtrees are shared with the parent commit by hash
+        parent = resolve_head()
+        base_tree = commit_tree(read_commit(parent)) if parent else None
+        changes = dict(index)
+        changes.update((file_path, None) for file_path in deleted)
+        tree = update_tree(base_tree, changes) or write_tree_object({})
+        if tree == base_tree:
+            return None
+
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+        commit_hash = write_commit(
+            {
+                "parent": parent,
+                "message": self.message,
+                "timestamp": timestamp,
+                "tree": tree,
+            }
+        )
+
+        # Keep the stat data of the committed files for the next status
+        files = dict(head_files)
+        files.update(index)
+        for file_path in deleted:
+            files.pop(file_path, None)
+        write_stat_cache(commit_hash, files)
+        update_head(commit_hash)
+
+        # Append the metadata record log reads; earlier records are never rewritten
+        append_commit(
+            {
+                "hash": commit_hash,
+                "parent": parent,
+                "message": self.message,
+                "timestamp": timestamp,
+            }
+        )
+        # Path history gets the new commit's changed paths appended
+        record_commit_paths(commit_hash, parent, base_tree, tree)
+        return commit_hash
+
+    def store_object(self, index, file_path):
         """Stores file content in a Git-like object format (.gitter/objects/<hash-prefix>/<hash>)"""
-        object_dir = f".gitter/objects/{file_hash[:2]}"  # First 2 chars as folder
-        object_path = f"{object_dir}/{file_hash[2:]}"
-
-        os.makedirs(object_dir, exist_ok=True)
-
-        with open(object_path, "w") as f:
-            f.write(content)  # Fix: Ensure content is always a string
-
-    def _generate_commit_hash(self, index):
-        """Generates a unique commit hash including file contents."""
-        hasher = hashlib.sha1()
-        hasher.update(self.message.encode())
-        hasher.update(time.strftime("%Y-%m-%d %H:%M:%S").encode())
-
-        for file, file_hash in sorted(index.items()):
-            hasher.update(file.encode())
-            hasher.update(file_hash.encode())
-
-        return hasher.hexdigest()
+        # The file is hashed as it is stored, so the entry always names the
+        # content that was actually written
+        file_hash = hash_and_store_file(file_path)
+        if file_hash is None:
+            sys.exit(1)
+        if file_hash != entry_hash(index[file_path]):
+            index[file_path] = make_entry(file_hash, os.stat(file_path))
 
     def execute(self):
         if not os.path.exists(".gitter"):
             print("Error: Gitter repository not initialized. Run 'gitter init'.")
             return
 
-        index = self.load_index()
+        # The index is locked from reading it until it is cleared, so files
+        # staged by a concurrent add are neither lost nor committed half-way
+        with lock_index() as lock:
+            self.commit_index(lock)
+
+    def commit_index(self, lock):
+        """Commits the staged changes and clears the index through its lock."""
+        index, index_mtime_ns = self.load_index()
+        # Staged stat data is carried into the commit; drop what is not trustworthy
+        smudge_racy_entries(index, index_mtime_ns)
+
+        # The new commit is the HEAD tree with the staged changes applied
+        head_files, head_mtime_ns = self.load_last_commit_files()
+        smudge_racy_entries(head_files, head_mtime_ns)
+        deleted = []
 
         if self.auto_stage:
-            # Auto-stage all modified & deleted files before commit
-            all_files, _ = get_files(["."], self.ignore_patterns)
-            for file in all_files:
-                if not should_ignore(file, self.ignore_patterns):
-                    file_hash = hash_file(file)
-                    if file_hash:
-                        index[file] = file_hash
-
-        if not index:
+            # Auto-stage all modified & deleted files before commit, reusing
+            # hashes whose stat data still matches the index or the last commit
+            files = list(walk_working_tree(self.ignore_matcher))
+            file_hashes = cached_hashes(
+                files,
+                (index, index_mtime_ns),
+                (head_files, head_mtime_ns),
+                jobs=self.jobs,
+                store=True,
+            )
+            for file, st in files:
+                if file in file_hashes:
+                    index[file] = make_entry(file_hashes[file], st)
+
+            walked = {file for file, _ in files}
+            deleted = [
+                file
+                for file in head_files
+                if file not in walked
+                and file not in index
+                and not os.path.exists(file)
+            ]
+
+        if not index and not deleted:
             print("No changes to commit.")
             return
 
-        self.save_commit(index)
+        commit_hash = self.save_commit(index, head_files, deleted)
+        if commit_hash is None:
+            print("No changes to commit.")
+            return
 
         # Clear index after commit
-        with open(".gitter/index.json", "w") as f:
-            json.dump({}, f)
+        write_index({}, lock=lock)
 
-        print(f"Committed successfully with hash: {self._generate_commit_hash(index)}")
+        print(f"Committed successfully with hash: {commit_hash}")
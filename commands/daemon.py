@@ -0,0 +1,51 @@
+import os
+import sys
+
+from core.daemon import daemon_status, serve_daemon, stop_daemon
+
+from .command import Command
+
+
+class DaemonCommand(Command):
+    SUBCOMMANDS = ("start", "stop", "status", "run")
+
+    def execute(self):
+        if not os.path.exists(".gitter"):
+            print("Error: Gitter repository not initialized. Run 'gitter init'.")
+            return
+
+        action = self.args[0] if self.args else "status"
+        if action not in self.SUBCOMMANDS:
+            print(f"Error: unknown daemon action '{action}'")
+            sys.exit(1)
+        getattr(self, action)()
+
+    def start(self):
+        """Starts the daemon in the background and waits until it answers."""
+        if daemon_status() is not None:
+            print("Gitter daemon is already running.")
+            return
+        if not self.start_background("daemon", lambda: daemon_status() is not None):
+            print("Error: the gitter daemon did not start")
+            sys.exit(1)
+        print("Gitter daemon started.")
+
+    def stop(self):
+        if stop_daemon():
+            print("Gitter daemon stopped.")
+        else:
+            print("Gitter daemon is not running.")
+
+    def status(self):
+        status = daemon_status()
+        if status is None:
+            print("Gitter daemon is not running.")
+        else:
+            print(
+                f"Gitter daemon is running (pid {status.get('pid')}, "
+                f"{status.get('served', 0)} commands served)."
+            )
+
+    def run(self):
+        """Serves commands in the foreground until the daemon is stopped."""
+        serve_daemon()
@@ -1,14 +1,29 @@
-import difflib
-import json
+import glob
 import os
+import re
+import sys
+from fnmatch import fnmatch
 
-from utils import (get_files, hash_file, read_committed_file,
-                   read_file_content, should_ignore)
+from utils import (ALGORITHMS, DEFAULT_ALGORITHM, MIN_ABBREV, cached_hash,
+                   cached_hashes, commit_tree, diff_files, diff_trees,
+                   entry_hash, flatten_tree, load_head_files, normalize_path,
+                   read_commit, read_index, resolve_head, resolve_revision,
+                   should_ignore, walk_files, walk_working_tree)
 
 from .command import Command
 
 
+# Columns a --stat line may take, like git's default
+STAT_WIDTH = 80
+
+# Arguments that can only be meant as revisions, so failing to resolve
+# them is an error rather than a path that matches nothing
+_REVISION_LIKE = re.compile(rf"(HEAD|@|[0-9a-fA-F]{{{MIN_ABBREV},40}})?(~\d*|\^)*")
+
+
 class DiffCommand(Command):
+    OUTPUT_MODES = ("--stat", "--name-only", "--name-status", "--quiet")
+
     def __init__(self, args):
         super().__init__(args)
         # Add option to ignore whitespace changes
@@ -17,142 +32,279 @@ class DiffCommand(Command):
         self.args = [
             arg for arg in self.args if arg not in ["-w", "--ignore-whitespace"]
         ]
-        # Load ignore patterns
-        self.ignore_patterns = self.load_ignore_patterns()
+        self.algorithm = self._parse_algorithm()
+        self.jobs = self.pop_jobs_option()
+        self.output_mode = self._parse_output_mode()
+        # Compile ignore patterns once for the whole command
+        self.ignore_matcher = self.load_ignore_matcher()
 
-    def load_commit_hashes(self):
-        """Loads the latest committed file hashes from .gitter/commits.json"""
-        commits_file = ".gitter/commits.json"
-        if os.path.exists(commits_file):
-            try:
-                with open(commits_file, "r") as f:
-                    commits = json.load(f)
-                if commits:
-                    return commits[-1]["files"]  # Latest commit file hashes
-            except (FileNotFoundError, json.JSONDecodeError):
-                pass
-        return {}
+    def load_commit_hashes(self, commit_hash=None):
+        """
+        Loads the file entries of a commit, the latest one by default, and
+        the reference mtime for their stat data
+        """
+        if commit_hash is None or commit_hash == resolve_head():
+            return load_head_files()
+        return flatten_tree(commit_tree(read_commit(commit_hash))), None
 
     def load_index(self):
-        """Loads the indexed (staged) file hashes from .gitter/index.json"""
-        index_file = ".gitter/index.json"
-        if os.path.exists(index_file):
-            with open(index_file, "r") as f:
-                return json.load(f)
-        return {}
-
-    def show_diff(self, file_path, old_content, new_content):
-        """Displays the diff output in a Git-style format."""
-        # Make sure both old_content and new_content are lists of strings without line endings
-        if isinstance(old_content, str):
-            old_lines = old_content.splitlines()
-        else:
-            old_lines = [
-                line.rstrip("\n") if isinstance(line, str) else str(line).rstrip("\n")
-                for line in old_content
-            ]
+        """Loads the indexed (staged) file entries and the index mtime"""
+        return read_index()
 
-        if isinstance(new_content, str):
-            new_lines = new_content.splitlines()
+    def _parse_algorithm(self):
+        """Reads '--diff-algorithm=<name>' and the git shorthands for it."""
+        algorithm = DEFAULT_ALGORITHM
+        remaining = []
+        args = iter(self.args)
+        for arg in args:
+            if arg == "--diff-algorithm":
+                algorithm = next(args, "")
+            elif arg.startswith("--diff-algorithm="):
+                algorithm = arg.split("=", 1)[1]
+            elif arg in ("--patience", "--histogram", "--minimal"):
+                algorithm = arg[2:]
+            else:
+                remaining.append(arg)
+        if algorithm not in ALGORITHMS:
+            print(f"Error: unknown diff algorithm '{algorithm}'")
+            sys.exit(1)
+        self.args = remaining
+        return algorithm
+
+    def parse_revisions(self):
+        """
+        Splits the arguments into the commits to compare and the paths to
+        limit the diff to. Leading arguments that are not files are read as
+        revisions: one commit is compared with the working tree, two commits
+        or an A..B range with each other. Everything after '--' is a path.
+        """
+        if "--" in self.args:
+            split = self.args.index("--")
+            candidates, paths = self.args[:split], self.args[split + 1 :]
+            explicit = True
         else:
-            new_lines = [
-                line.rstrip("\n") if isinstance(line, str) else str(line).rstrip("\n")
-                for line in new_content
-            ]
-
-        # If ignoring whitespace, normalize whitespace in both versions
-        if self.ignore_whitespace:
-            old_lines = [" ".join(line.split()) for line in old_lines]
-            new_lines = [" ".join(line.split()) for line in new_lines]
-
-            # Also remove empty lines if ignoring whitespace
-            old_lines = [line for line in old_lines if line.strip()]
-            new_lines = [line for line in new_lines if line.strip()]
-
-        # Check if files are identical
-        if old_lines == new_lines:
+            candidates, paths = self.args, []
+            explicit = False
+
+        revisions = []
+        for position, arg in enumerate(candidates):
+            if not explicit and (os.path.exists(arg) or glob.glob(arg)):
+                paths = candidates[position:] + paths
+                break
+            try:
+                if ".." in arg and not os.path.exists(arg):
+                    old, new = arg.split("..", 1)
+                    revisions += [
+                        resolve_revision(old or "HEAD"),
+                        resolve_revision(new or "HEAD"),
+                    ]
+                else:
+                    revisions.append(resolve_revision(arg))
+            except ValueError as e:
+                if explicit or "ambiguous" in str(e) or _REVISION_LIKE.fullmatch(arg):
+                    print(f"Error: {str(e)}")
+                    sys.exit(1)
+                # Not a revision after all; the rest are paths
+                paths = candidates[position:] + paths
+                break
+
+        if len(revisions) > 2:
+            print("Error: diff compares at most two commits")
+            sys.exit(1)
+        return revisions, paths
+
+    def _matches_paths(self, file_path, paths):
+        for path in paths:
+            path = normalize_path(path)
+            if path in (".", "", file_path) or file_path.startswith(path + "/"):
+                return True
+            if fnmatch(file_path, path):
+                return True
+        return False
+
+    def commit_changes(self, old_commit, new_commit, paths):
+        """
+        Yields (file_path, old_hash, new_hash) for the files that differ
+        between two commits, in path order, limited to paths when given.
+        Only the subtrees that differ are read.
+        """
+        old_tree = commit_tree(read_commit(old_commit))
+        new_tree = commit_tree(read_commit(new_commit))
+        for change in diff_trees(old_tree, new_tree):
+            if not paths or self._matches_paths(change[0], paths):
+                yield change
+
+    def show_diff(self, file_path, hunks, tofile=None, fromfile=None):
+        """Displays the diff output in a Git-style format."""
+        # Only show diff if there are changes
+        if not hunks:
             return False
+        print(f"diff --git a/{file_path} b/{file_path}")
+        print(f"--- {fromfile or f'a/{file_path}'}")
+        print(f"+++ {tofile or f'b/{file_path}'}")
+        for line in hunks:
+            print(line)
+        return True
 
-        # Generate unified diff
-        diff = list(
-            difflib.unified_diff(
-                old_lines,
-                new_lines,
-                fromfile=f"a/{file_path}",
-                tofile=f"b/{file_path}",
-                n=3,  # Show 3 lines of context
-                lineterm="",
-            )
+    def _parse_output_mode(self):
+        """Picks the output format: full patches or one of the summary modes."""
+        mode = "patch"
+        remaining = []
+        for arg in self.args:
+            if arg in self.OUTPUT_MODES:
+                mode = arg[2:]
+            else:
+                remaining.append(arg)
+        self.args = remaining
+        return mode
+
+    def iter_changes(self, files, lazy=False):
+        """
+        Yields (file_path, committed_hash, current_hash) for every tracked file
+        that differs from the last commit, in path order, with None as the
+        current hash of deleted files. Files whose stat data matches are never
+        read. Hashing is done up front in parallel, or file by file with lazy,
+        so a consumer that stops at the first change reads nothing more.
+        """
+        sources = (
+            (self.index_hashes, self.index_mtime_ns),
+            (self.committed_hashes, self.commits_mtime_ns),
         )
+        tracked = sorted(path for path in files if path in self.committed_hashes)
+        current_hashes = None
+        if not lazy:
+            current_hashes = cached_hashes(
+                [(path, files[path]) for path in tracked if files[path] is not None],
+                *sources,
+                jobs=self.jobs,
+            )
 
-        # Only show diff if there are changes
-        if diff:
-            print(f"diff --git a/{file_path} b/{file_path}")
-            # Print only the modified chunks, skipping unnecessary empty lines
-            for line in diff:
-                if (
-                    line.strip()
-                    or line.startswith("+")
-                    or line.startswith("-")
-                    or line.startswith("@")
-                ):
-                    print(line)
-            return True
-        return False
+        for file_path in tracked:
+            committed_hash = entry_hash(self.committed_hashes[file_path])
+            st = files[file_path]
+            if st is None:
+                current_hash = None
+            elif current_hashes is None:
+                # Unchanged stat data means unchanged content; skip reading
+                current_hash = cached_hash(file_path, st, *sources)
+            else:
+                current_hash = current_hashes.get(file_path)
+
+            # File deleted from working directory
+            if not current_hash and os.path.exists(file_path) is False:
+                yield file_path, committed_hash, None
+
+            # File exists and has been modified
+            elif current_hash and current_hash != committed_hash:
+                yield file_path, committed_hash, current_hash
+
+    def show_stat(self, changes, working_tree=True):
+        """Prints a diffstat: changed line counts per file and a summary line."""
+        rows = [
+            (file_path, insertions, deletions)
+            for (file_path, _, _), (insertions, deletions) in diff_files(
+                changes,
+                self.algorithm,
+                self.ignore_whitespace,
+                jobs=self.jobs,
+                stat=True,
+                working_tree=working_tree,
+            )
+            if insertions or deletions
+        ]
+        if not rows:
+            return
+
+        name_width = max(len(file_path) for file_path, _, _ in rows)
+        count_width = max(len(str(i + d)) for _, i, d in rows)
+        most = max(i + d for _, i, d in rows)
+        # Scale the +/- graph down when it would not fit in 80 columns
+        graph_width = max(10, STAT_WIDTH - name_width - count_width - 4)
+        scale = min(1.0, graph_width / most)
+        for file_path, insertions, deletions in rows:
+            plus = max(1, round(insertions * scale)) if insertions else 0
+            minus = max(1, round(deletions * scale)) if deletions else 0
+            print(
+                f" {file_path:<{name_width}} | {insertions + deletions:>{count_width}} "
+                f"{'+' * plus}{'-' * minus}"
+            )
+
+        total_insertions = sum(i for _, i, _ in rows)
+        total_deletions = sum(d for _, _, d in rows)
+        summary = f" {len(rows)} file{'s' if len(rows) != 1 else ''} changed"
+        if total_insertions:
+            summary += f", {total_insertions} insertion{'s' if total_insertions != 1 else ''}(+)"
+        if total_deletions:
+            summary += f", {total_deletions} deletion{'s' if total_deletions != 1 else ''}(-)"
+        print(summary)
 
     def execute(self):
         if not os.path.exists(".gitter"):
             print("Error: Gitter repository not initialized. Run 'gitter init'.")
             return
 
-        committed_hashes = self.load_commit_hashes()  # Last committed state
-        index_hashes = self.load_index()  # Staged files
-        changes_found = False
+        revisions, paths = self.parse_revisions()
+        if len(revisions) == 2:
+            # Two commits: the changes come from their trees, not the disk
+            self.show_changes(self.commit_changes(*revisions, paths), working_tree=False)
+            return
+
+        # The given commit, or the last one
+        self.committed_hashes, self.commits_mtime_ns = self.load_commit_hashes(
+            revisions[0] if revisions else None
+        )
+        # Staged files
+        self.index_hashes, self.index_mtime_ns = self.load_index()
 
-        if self.args:
-            valid_files, _ = get_files(self.args, self.ignore_patterns)
+        # Stat results come straight from the walk; nothing is stat'ed twice
+        if paths:
+            files = dict(walk_files(paths, self.ignore_matcher))
         else:
             # Get all existing files in the working directory
-            all_files, _ = get_files(["."], self.ignore_patterns)
+            files = dict(walk_working_tree(self.ignore_matcher))
             # Combine with files that might be in commits but removed from filesystem
-            valid_files = (
-                set(all_files) | set(committed_hashes.keys()) | set(index_hashes.keys())
-            )
-            # Filter out ignored files from valid_files
-            valid_files = [
-                f for f in valid_files if not should_ignore(f, self.ignore_patterns)
-            ]
-
-        for file_path in valid_files:
-            # Skip ignored files
-            if should_ignore(file_path, self.ignore_patterns):
-                continue
+            for file_path in set(self.committed_hashes) | set(self.index_hashes):
+                if file_path not in files and not should_ignore(
+                    file_path, self.ignore_matcher
+                ):
+                    files[file_path] = None
 
-            # Skip files that are not in the commit history
-            if file_path not in committed_hashes:
-                continue
+        # Quiet mode stops at the first change, so hashing is done lazily
+        lazy = self.output_mode == "quiet"
+        self.show_changes(self.iter_changes(files, lazy=lazy))
 
-            current_hash = hash_file(file_path)
-            committed_hash = committed_hashes[file_path]
+    def show_changes(self, changes, working_tree=True):
+        """Prints (file_path, old_hash, new_hash) changes in the chosen output mode."""
+        # Summary modes only need the hash comparison, never the contents
+        if self.output_mode == "quiet":
+            for _ in changes:
+                sys.exit(1)
+            return
+        if self.output_mode in ("name-only", "name-status"):
+            for file_path, old_hash, new_hash in changes:
+                if self.output_mode == "name-only":
+                    print(file_path)
+                else:
+                    status = "A" if old_hash is None else "D" if new_hash is None else "M"
+                    print(f"{status}\t{file_path}")
+            return
+        if self.output_mode == "stat":
+            self.show_stat(list(changes), working_tree=working_tree)
+            return
 
-            # File deleted from working directory
-            if not current_hash and os.path.exists(file_path) is False:
-                old_content = read_committed_file(committed_hash)
-                print(f"diff --git a/{file_path} b/{file_path}")
-                print(f"--- a/{file_path}")
-                print(f"+++ /dev/null")
-                # Only print non-empty lines
-                for line in old_content:
-                    if isinstance(line, str) and line.strip():
-                        print(f"-{line.rstrip()}")
+        # Diffs are computed in parallel but printed in path order as they finish
+        changes_found = False
+        for (file_path, old_hash, new_hash), hunks in diff_files(
+            changes,
+            self.algorithm,
+            self.ignore_whitespace,
+            jobs=self.jobs,
+            working_tree=working_tree,
+        ):
+            fromfile = None if old_hash else "/dev/null"
+            tofile = None if new_hash else "/dev/null"
+            if self.show_diff(file_path, hunks, tofile=tofile, fromfile=fromfile):
                 changes_found = True
 
-            # File exists and has been modified
-            elif current_hash and current_hash != committed_hash:
-                old_content = read_committed_file(committed_hash)
-                new_content = read_file_content(file_path)
-                if self.show_diff(file_path, old_content, new_content):
-                    changes_found = True
-
         if not changes_found:
             print("No differences found.")
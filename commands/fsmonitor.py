@@ -0,0 +1,55 @@
+import os
+import sys
+
+from utils import FsMonitor, query_fsmonitor, stop_fsmonitor
+
+from .command import Command
+
+
+class FsmonitorCommand(Command):
+    SUBCOMMANDS = ("start", "stop", "status", "run")
+
+    def execute(self):
+        if not os.path.exists(".gitter"):
+            print("Error: Gitter repository not initialized. Run 'gitter init'.")
+            return
+
+        action = self.args[0] if self.args else "status"
+        if action not in self.SUBCOMMANDS:
+            print(f"Error: unknown fsmonitor action '{action}'")
+            sys.exit(1)
+        getattr(self, action)()
+
+    def start(self):
+        """Starts a monitor in the background and waits until it answers."""
+        if query_fsmonitor() is not None:
+            print("File system monitor is already running.")
+            return
+        if not sys.platform.startswith("linux"):
+            print("Error: the file system monitor requires Linux (inotify)")
+            sys.exit(1)
+        if not self.start_background("fsmonitor", lambda: query_fsmonitor() is not None):
+            print("Error: the file system monitor did not start")
+            sys.exit(1)
+        print("File system monitor started.")
+
+    def stop(self):
+        if stop_fsmonitor():
+            print("File system monitor stopped.")
+        else:
+            print("File system monitor is not running.")
+
+    def status(self):
+        if query_fsmonitor() is not None:
+            print("File system monitor is running.")
+        else:
+            print("File system monitor is not running.")
+
+    def run(self):
+        """Runs the monitor in the foreground until it is stopped."""
+        try:
+            monitor = FsMonitor()
+        except OSError as e:
+            print(f"Error: cannot watch the working tree: {str(e)}")
+            sys.exit(1)
+        monitor.serve()
@@ -10,6 +10,9 @@ class HelpCommand(Command):
         "commit": "Record changes to the repository",
         "log": "Show commit logs",
         "diff": "Show changes between commits, commit and working tree",
+        "repack": "Pack loose objects into a single packfile",
+        "fsmonitor": "Watch the working tree for changes (Linux)",
+        "daemon": "Keep the repository loaded in a background process",
         "help": "Display help information",
     }
 
@@ -30,6 +33,8 @@ class HelpCommand(Command):
         gitter add .
     DESCRIPTION:
         Adds file contents to the index for tracking. Use '.' to add all modified files.
+    OPTIONS:
+        -j, --jobs <n>: Hash files using <n> threads (defaults to $GITTER_JOBS or the CPU count).
             """,
         "status": """
     NAME:
@@ -38,6 +43,8 @@ class HelpCommand(Command):
         gitter status
     DESCRIPTION:
         Displays which files are staged for commit, unstaged changes, and untracked files.
+    OPTIONS:
+        -j, --jobs <n>: Hash files using <n> threads (defaults to $GITTER_JOBS or the CPU count).
             """,
         "commit": """
     NAME:
@@ -49,14 +56,27 @@ class HelpCommand(Command):
     OPTIONS:
         -a: Automatically stage files that have been modified and deleted.
         -m: Use the given <msg> as the commit message. If multiple -m options are given, their values are concatenated.
+        -j, --jobs <n>: Hash files using <n> threads (defaults to $GITTER_JOBS or the CPU count).
             """,
         "log": """
     NAME:
         log - Show commit logs
     SYNOPSIS:
-        gitter log
+        gitter log [-n <n>] [--skip <n>] [--since <date>] [--until <date>] [--name-status] [--] [<path>...]
     DESCRIPTION:
-        Displays the commit history in reverse chronological order.
+        Displays the commit history in reverse chronological order. History is read from the
+        newest commit backwards and reading stops as soon as the limits are met. When stdout is
+        a terminal the output goes through $GITTER_PAGER or $PAGER (default: less).
+        With paths, only commits that changed those files or directories are shown; they are
+        looked up in a per-path change index kept in .gitter/path-index.
+    OPTIONS:
+        -n <n>, -<n>, --max-count=<n>: Show at most <n> commits.
+        --skip=<n>: Skip the first <n> commits that would be shown.
+        --since=<date>, --after=<date>: Show commits made at or after <date>.
+        --until=<date>, --before=<date>: Show commits made at or before <date>.
+            Dates are YYYY-MM-DD [HH:MM[:SS]] or relative, such as "2 weeks ago".
+        --name-status: Show the files each commit added (A), modified (M) or deleted (D).
+        --no-pager: Write to stdout even when it is a terminal.
             """,
         "diff": """
     NAME:
@@ -65,8 +85,65 @@ class HelpCommand(Command):
         gitter diff
         gitter diff <file>
         gitter diff <directory>
+        gitter diff <commit> [--] [<path>...]
+        gitter diff <commit> <commit> [--] [<path>...]
+        gitter diff <commit>..<commit> [--] [<path>...]
+    DESCRIPTION:
+        Displays differences between the working directory and the last committed version,
+        between the working directory and a commit, or between two commits. Commits may be
+        HEAD, a branch, or a full or abbreviated hash (at least 4 digits), optionally followed
+        by ~<n> or ^. An omitted side of A..B means HEAD.
+    OPTIONS:
+        -w, --ignore-whitespace: Ignore whitespace changes.
+        --diff-algorithm=<name>: Use the myers (default), minimal, patience or histogram algorithm.
+        --patience, --histogram, --minimal: Shorthands for --diff-algorithm.
+        -j, --jobs <n>: Hash and diff files using <n> workers (defaults to $GITTER_JOBS or the CPU count).
+        --stat: Show the number of changed lines per file instead of the patch.
+        --name-only: Show only the names of changed files.
+        --name-status: Show the names of changed files with A (added), M (modified) or D (deleted).
+        --quiet: Print nothing; exit with status 1 if there are differences.
+            """,
+        "repack": """
+    NAME:
+        repack - Pack loose objects into a single packfile
+    SYNOPSIS:
+        gitter repack [--depth <n>]
+    DESCRIPTION:
+        Consolidates all loose objects and existing packs into one packfile with a sorted
+        index under .gitter/objects/pack, then removes the objects it replaced. Older
+        versions of a file are stored as deltas against the next newer version. Also writes
+        .gitter/commit-graph, a memory-mapped table of commit metadata that log and
+        abbreviated hash lookups use instead of reading commit objects.
+    OPTIONS:
+        --depth <n>: Limit delta chains to <n> deltas (default 50, 0 stores every object whole).
+            """,
+        "fsmonitor": """
+    NAME:
+        fsmonitor - Watch the working tree for changes (Linux)
+    SYNOPSIS:
+        gitter fsmonitor start
+        gitter fsmonitor stop
+        gitter fsmonitor status
+    DESCRIPTION:
+        Starts, stops or checks a background process that watches the working tree with
+        inotify and answers on .gitter/fsmonitor.sock. While it runs, status, diff and
+        commit -a only look at the paths changed since their last walk and take everything
+        else from the snapshot in .gitter/fsmonitor-state.json. Without a monitor, or when
+        it has lost track of changes, they walk the whole tree.
+            """,
+        "daemon": """
+    NAME:
+        daemon - Keep the repository loaded in a background process
+    SYNOPSIS:
+        gitter daemon start
+        gitter daemon stop
+        gitter daemon status
     DESCRIPTION:
-        Displays differences between the working directory and the last committed version.
+        Starts, stops or checks a background process that runs gitter commands sent to
+        .gitter/daemon.sock. While it runs, every other command (except init, daemon and
+        fsmonitor) is forwarded to it, so the interpreter, the command modules and the
+        loaded index and stat cache are reused. Files changed on disk by other processes
+        are reloaded. Set GITTER_NO_DAEMON=1 to run a command locally.
             """,
     }
 
@@ -1,5 +1,7 @@
 import os
 
+from utils import write_index
+
 from .command import Command
 
 
@@ -9,10 +11,11 @@ class InitCommand(Command):
             print("Gitter repository already initialized.")
         else:
             os.makedirs(".gitter")
-            with open(".gitter/index.json", "w") as f:
-                f.write("{}")
-            with open(".gitter/commits.json", "w") as f:
-                f.write("[]")
+            write_index({})
+            # Commit history is an append-only journal of JSON lines
+            open(".gitter/commits.jsonl", "w").close()
+            # HEAD resolves through the branch ref, created by the first commit
+            os.makedirs(".gitter/refs/heads")
             with open(".gitter/HEAD", "w") as f:
                 f.write("ref: refs/heads/main\n")
             print(f"Initialized empty Gitter repository in {os.getcwd()}/.gitter/")
@@ -1,37 +1,197 @@
-import json
 import os
+import re
+import sys
+import time
+
+from utils import (diff_trees, iter_ancestry, iter_commits_reversed,
+                   load_commit_graph, lookup_commit, normalize_path,
+                   open_pager, path_commits, resolve_head)
 
 from .command import Command
 
+# Seconds in each unit accepted by relative dates such as '2 weeks ago'
+_UNITS = {
+    "second": 1,
+    "minute": 60,
+    "hour": 3600,
+    "day": 86400,
+    "week": 7 * 86400,
+    "month": 30 * 86400,
+    "year": 365 * 86400,
+}
+_RELATIVE_DATE = re.compile(r"(\d+)[ .]?(second|minute|hour|day|week|month|year)s?[ .]?ago")
+_DATE_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d")
+# Commit timestamps are local times in this format, so they compare as strings
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def parse_date(value):
+    """Parses an absolute or relative ('3 days ago') date into a commit timestamp."""
+    value = value.strip().lower()
+    match = _RELATIVE_DATE.fullmatch(value)
+    if match:
+        seconds = int(match.group(1)) * _UNITS[match.group(2)]
+        return time.strftime(TIMESTAMP_FORMAT, time.localtime(time.time() - seconds))
+    if value in ("now", "today"):
+        return time.strftime(TIMESTAMP_FORMAT)
+    for date_format in _DATE_FORMATS:
+        try:
+            return time.strftime(TIMESTAMP_FORMAT, time.strptime(value, date_format))
+        except ValueError:
+            continue
+    raise ValueError(f"invalid date '{value}'")
+
+
+def _parse_count(value, option):
+    try:
+        count = int(value)
+    except (TypeError, ValueError):
+        count = -1
+    if count < 0:
+        raise ValueError(f"invalid value for {option}: '{value}'")
+    return count
+
 
 class LogCommand(Command):
+    # Options taking a value, as '--opt value' or '--opt=value'
+    VALUE_OPTIONS = {
+        "-n": "max_count",
+        "--max-count": "max_count",
+        "--skip": "skip",
+        "--since": "since",
+        "--after": "since",
+        "--until": "until",
+        "--before": "until",
+    }
+
     def __init__(self, args):
         super().__init__(args)
+        self.max_count = None
+        self.skip = 0
+        self.since = None
+        self.until = None
+        self.name_status = False
+        self.use_pager = True
+        self.paths = []
+        try:
+            self._parse_options()
+        except ValueError as e:
+            print(f"Error: {str(e)}")
+            sys.exit(1)
 
-    def execute(self):
-        if not os.path.exists(".gitter"):
-            print("Error: Gitter repository not initialized. Run 'gitter init'.")
-            return
+    def _parse_options(self):
+        """Reads the limiting and output options; other arguments are paths."""
+        args = iter(self.args)
+        for arg in args:
+            if arg == "--":
+                self.paths.extend(args)
+                break
+            name, _, value = arg.partition("=")
+            if name in self.VALUE_OPTIONS and (value or "=" not in arg):
+                option = self.VALUE_OPTIONS[name]
+                if "=" not in arg:
+                    value = next(args, None)
+                    if value is None:
+                        raise ValueError(f"option {name} requires a value")
+            elif re.fullmatch(r"-n\d+", arg):
+                option, value = "max_count", arg[2:]
+            elif re.fullmatch(r"-\d+", arg):
+                option, value = "max_count", arg[1:]
+            elif arg == "--name-status":
+                self.name_status = True
+                continue
+            elif arg == "--no-pager":
+                self.use_pager = False
+                continue
+            elif arg.startswith("-"):
+                raise ValueError(f"unknown option '{arg}'")
+            else:
+                self.paths.append(arg)
+                continue
 
-        commits_file = ".gitter/commits.json"
-        if not os.path.exists(commits_file):
-            print("No commits found.")
-            return
+            if option in ("since", "until"):
+                setattr(self, option, parse_date(value))
+            else:
+                setattr(self, option, _parse_count(value, name))
 
-        try:
-            with open(commits_file, "r") as f:
-                commits = json.load(f)
+    def iter_history(self):
+        """
+        Yields commit records newest first: all of them, walked through the
+        commit graph when there is one and from the journal otherwise, or
+        with paths only the commits the path index lists for them.
+        """
+        paths = [normalize_path(path) for path in self.paths]
+        if paths and "." not in paths:
+            for commit_hash in path_commits(paths):
+                commit = lookup_commit(commit_hash)
+                if commit is not None:
+                    yield commit
+        elif load_commit_graph() is not None:
+            yield from iter_ancestry(resolve_head())
+        else:
+            yield from iter_commits_reversed()
+
+    def iter_selected(self):
+        """
+        Yields the commit records the options select, newest first. History
+        is read backwards and the walk stops as soon as the count is reached
+        or commits get older than --since.
+        """
+        if self.max_count == 0:
+            return
+        skipped = shown = 0
+        for commit in self.iter_history():
+            timestamp = commit.get("timestamp", "")
+            if self.since is not None and timestamp < self.since:
+                break
+            if self.until is not None and timestamp > self.until:
+                continue
+            if skipped < self.skip:
+                skipped += 1
+                continue
+            yield commit
+            shown += 1
+            if self.max_count is not None and shown >= self.max_count:
+                break
 
-            if not commits:
-                print("No commits found.")
-                return
+    def changed_files(self, commit):
+        """
+        Returns (status, path) for the files a commit changed, from its
+        trees, limited to the given paths.
+        """
+        paths = [normalize_path(path) for path in self.paths if normalize_path(path) != "."]
+        # Journal records carry no tree; graph records and objects do
+        if "tree" not in commit:
+            commit = lookup_commit(commit["hash"]) or {}
+        parent = lookup_commit(commit["parent"]) if commit.get("parent") else None
+        old_tree = parent["tree"] if parent else None
+        return [
+            ("A" if old_hash is None else "D" if new_hash is None else "M", path)
+            for path, old_hash, new_hash in diff_trees(old_tree, commit.get("tree"))
+            if not paths
+            or any(path == limit or path.startswith(limit + "/") for limit in paths)
+        ]
 
-        except (FileNotFoundError, json.JSONDecodeError):
-            print("Error: Commit log is corrupted.")
+    def execute(self):
+        if not os.path.exists(".gitter"):
+            print("Error: Gitter repository not initialized. Run 'gitter init'.")
             return
 
-        for commit in reversed(commits):
-            print(f"commit {commit['hash']}")
-            print(f"Author: user")
-            print(f"Date: {commit['timestamp']}")
-            print(f"\n  {commit['message']}\n")
+        # Records are printed as they are read, so the pager shows the
+        # newest commits while older ones are still being found
+        found = False
+        with open_pager(self.use_pager) as out:
+            for commit in self.iter_selected():
+                found = True
+                out.write(f"commit {commit['hash']}\n")
+                out.write("Author: user\n")
+                out.write(f"Date: {commit['timestamp']}\n")
+                out.write(f"\n  {commit['message']}\n\n")
+                # File maps are only read when asked for
+                if self.name_status:
+                    for status, path in self.changed_files(commit):
+                        out.write(f"{status}\t{path}\n")
+                    out.write("\n")
+
+            if not found:
+                out.write("No commits found.\n")
@@ -0,0 +1,44 @@
+import os
+import sys
+
+from utils import DEFAULT_DEPTH, repack, write_commit_graph
+
+from .command import Command
+
+
+class RepackCommand(Command):
+    def __init__(self, args):
+        super().__init__(args)
+        self.depth = self._parse_depth()
+
+    def _parse_depth(self):
+        """Reads '--depth N' or '--depth=N', the longest delta chain to build."""
+        value = None
+        for i, arg in enumerate(self.args):
+            if arg == "--depth":
+                value = self.args[i + 1] if i + 1 < len(self.args) else ""
+            elif arg.startswith("--depth="):
+                value = arg.split("=", 1)[1]
+        if value is None:
+            return DEFAULT_DEPTH
+        if not value.isdigit():
+            print(f"Error: invalid delta depth '{value}'")
+            sys.exit(1)
+        return int(value)
+
+    def execute(self):
+        if not os.path.exists(".gitter"):
+            print("Error: Gitter repository not initialized. Run 'gitter init'.")
+            return
+
+        result = repack(self.depth)
+        if result is None:
+            print("Nothing to pack.")
+        else:
+            pack_path, count = result
+            print(f"Packed {count} objects into {os.path.basename(pack_path)}")
+
+        # Commits made since the last repack are added to the commit graph
+        commits = write_commit_graph()
+        if commits:
+            print(f"Wrote commit graph of {commits} commits")
@@ -1,7 +1,7 @@
-import json
 import os
 
-from utils import get_files, hash_file, should_ignore
+from utils import (cached_hashes, entry_hash, load_head_files, read_index,
+                   walk_working_tree)
 
 from .command import Command
 
@@ -9,51 +9,49 @@ from .command import Command
 class StatusCommand(Command):
     def __init__(self, args):
         super().__init__(args)
-        # Load ignore patterns
-        self.ignore_patterns = self.load_ignore_patterns()
+        self.jobs = self.pop_jobs_option()
+        # Compile ignore patterns once for the whole command
+        self.ignore_matcher = self.load_ignore_matcher()
 
     def load_index(self):
-        """Loads the indexed (staged) file hashes from .gitter/index.json"""
-        index_file = ".gitter/index.json"
-        if os.path.exists(index_file):
-            with open(index_file, "r") as f:
-                return json.load(f)
-        return {}
+        """Loads the indexed (staged) file entries and the index mtime"""
+        return read_index()
 
     def load_commit_hashes(self):
-        """Loads the latest committed file hashes from .gitter/commits.json"""
-        commits_file = ".gitter/commits.json"
-        if os.path.exists(commits_file):
-            try:
-                with open(commits_file, "r") as f:
-                    commits = json.load(f)
-                if commits:
-                    return commits[-1]["files"]  # Latest commit file hashes
-            except (FileNotFoundError, json.JSONDecodeError):
-                pass
-        return {}
+        """Loads the latest committed file entries and the commit journal mtime"""
+        return load_head_files()
+
+    def walk_working_tree(self, all_files):
+        """
+        Yields (path, stat) records for the working tree, collecting the
+        paths. A running fsmonitor limits the walk to the paths that changed.
+        """
+        for file, st in walk_working_tree(self.ignore_matcher):
+            all_files.append(file)
+            yield file, st
 
     def execute(self):
         if not os.path.exists(".gitter"):
             print("Error: Gitter repository not initialized. Run 'gitter init'.")
             return
 
-        # Get all files in the working directory
-        all_files, _ = get_files(["."], self.ignore_patterns)
-
-        # Filter out files that should be ignored
-        all_files = [f for f in all_files if not should_ignore(f, self.ignore_patterns)]
-
         # Get current index and last commit
-        index = self.load_index()
-        commit_hashes = self.load_commit_hashes()
-
-        # Calculate current file hashes for comparison
-        current_hashes = {}
-        for file in all_files:
-            file_hash = hash_file(file)
-            if file_hash:
-                current_hashes[file] = file_hash
+        index, index_mtime_ns = self.load_index()
+        commit_entries, commits_mtime_ns = self.load_commit_hashes()
+        commit_hashes = {
+            file: entry_hash(entry) for file, entry in commit_entries.items()
+        }
+
+        # Walk the working directory (ignored directories are never entered)
+        # and hash files as they are found, only reading files whose stat
+        # data no longer matches the index or the last commit
+        all_files = []
+        current_hashes = cached_hashes(
+            self.walk_working_tree(all_files),
+            (index, index_mtime_ns),
+            (commit_entries, commits_mtime_ns),
+            jobs=self.jobs,
+        )
 
         # Track different file states
         staged_new = []
@@ -63,7 +61,8 @@ class StatusCommand(Command):
         untracked = []
 
         # Check each file in index
-        for file, hash_val in index.items():
+        for file, entry in index.items():
+            hash_val = entry_hash(entry)
             # File in index but not on disk (deleted)
             if file not in current_hashes:
                 unstaged_deleted.append(file)
@@ -1,17 +1,45 @@
-from commands import (AddCommand, CommitCommand, DiffCommand, HelpCommand,
-                      InitCommand, LogCommand, StatusCommand)
-
-
 class CommandFactory:
+    # Command name -> (module, class). A command's module, and the parts of
+    # utils it uses, are only imported when that command is dispatched
+    COMMANDS = {
+        "init": ("commands.init", "InitCommand"),
+        "add": ("commands.add", "AddCommand"),
+        "status": ("commands.status", "StatusCommand"),
+        "commit": ("commands.commit", "CommitCommand"),
+        "log": ("commands.log", "LogCommand"),
+        "diff": ("commands.diff", "DiffCommand"),
+        "repack": ("commands.repack", "RepackCommand"),
+        "fsmonitor": ("commands.fsmonitor", "FsmonitorCommand"),
+        "daemon": ("commands.daemon", "DaemonCommand"),
+        "help": ("commands.help", "HelpCommand"),
+    }
+
     @staticmethod
     def get_command(command_name):
-        commands = {
-            "init": InitCommand,
-            "add": AddCommand,
-            "status": StatusCommand,
-            "commit": CommitCommand,
-            "log": LogCommand,
-            "diff": DiffCommand,
-            "help": HelpCommand,
-        }
-        return commands.get(command_name, None)
+        entry = CommandFactory.COMMANDS.get(command_name)
+        if entry is None:
+            return None
+        module_name, class_name = entry
+        # Unlike importlib.import_module, __import__ shows in -X importtime
+        return getattr(__import__(module_name, fromlist=[class_name]), class_name)
+
+    @staticmethod
+    def run(command_name, args):
+        """Runs a command, printing errors as the CLI does, and returns its exit status."""
+        command_class = CommandFactory.get_command(command_name)
+        if command_class is None:
+            print(
+                "gitter: {} is not a gitter command. \n See 'gitter --help'".format(
+                    command_name
+                )
+            )
+            return 1
+        try:
+            command_instance = command_class(args)
+            command_instance.execute()
+        except SystemExit as e:
+            return e.code if isinstance(e.code, int) else 0 if e.code is None else 1
+        except Exception as e:
+            print(f"Error executing command {command_name}: {e} \n See 'gitter --help'")
+            return 1
+        return 0
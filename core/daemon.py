@@ -0,0 +1,154 @@
+import os
+import sys
+
+# Every invocation goes through forward_command before anything else is
+# imported, so the modules only needed to talk to or be the daemon are
+# imported where they are used
+
+DAEMON_SOCKET = ".gitter/daemon.sock"
+
+# Commands that manage processes or create the repository always run locally
+LOCAL_COMMANDS = ("init", "daemon", "fsmonitor")
+# Environment variables that change what a command does, passed to the daemon
+FORWARDED_ENV_PREFIX = "GITTER_"
+# Seconds between checks that the repository still exists
+IDLE_CHECK_INTERVAL = 5.0
+
+
+def _client_env():
+    return {
+        name: value
+        for name, value in os.environ.items()
+        if name.startswith(FORWARDED_ENV_PREFIX)
+    }
+
+
+def forward_command(command_name, args):
+    """
+    Runs a command in the repository's daemon and prints its output.
+    Returns the exit status, or None when the command should run in this
+    process: it is one of LOCAL_COMMANDS, log would start a pager,
+    GITTER_NO_DAEMON is set, or no daemon is listening.
+    """
+    if command_name in LOCAL_COMMANDS or os.environ.get("GITTER_NO_DAEMON"):
+        return None
+    if command_name == "log" and sys.stdout.isatty():
+        return None  # The pager needs this process's terminal
+    if not os.path.exists(DAEMON_SOCKET):
+        return None
+    from utils import connect, exchange
+
+    try:
+        client = connect(DAEMON_SOCKET)
+    except OSError:
+        return None
+
+    # Once the request is sent the command may have run, so it is never retried here
+    message = {"action": "run", "command": command_name, "args": args, "env": _client_env()}
+    try:
+        reply = exchange(client, message)
+    except (OSError, ValueError) as e:
+        print(f"Error: lost the connection to the gitter daemon: {str(e)}")
+        print("Error: the gitter daemon did not finish the command")
+        return 1
+    sys.stdout.write(reply.get("output", ""))
+    return reply.get("status", 1)
+
+
+def daemon_status():
+    """Returns the running daemon's status reply, or None when none answers."""
+    from utils import send_request
+
+    try:
+        return send_request(DAEMON_SOCKET, {"action": "status"}, timeout=1.0)
+    except (OSError, ValueError):
+        return None
+
+
+def stop_daemon():
+    """Asks the running daemon to exit; returns whether one answered."""
+    from utils import send_request
+
+    try:
+        send_request(DAEMON_SOCKET, {"action": "stop"}, timeout=5.0)
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def _run_captured(command_name, args, env):
+    """Runs a command with the client's GITTER_* environment, returning (status, output)."""
+    import io
+    from contextlib import redirect_stdout
+
+    from .command_factory import CommandFactory
+
+    saved = _client_env()
+    for name in saved:
+        del os.environ[name]
+    os.environ.update(env)
+    output = io.StringIO()
+    try:
+        with redirect_stdout(output):
+            status = CommandFactory.run(command_name, list(args))
+    finally:
+        for name in _client_env():
+            del os.environ[name]
+        os.environ.update(saved)
+    return status, output.getvalue()
+
+
+def serve_daemon():
+    """
+    Runs commands sent to DAEMON_SOCKET one at a time, in this process,
+    until stopped or the repository goes away. Loaded repository files stay
+    in memory between commands and are reloaded when they change on disk.
+    """
+    import select
+
+    from utils import enable_file_cache, listen, read_message, write_message
+
+    enable_file_cache()
+    served = 0
+    server = listen(DAEMON_SOCKET)
+    try:
+        while True:
+            readable, _, _ = select.select([server], [], [], IDLE_CHECK_INTERVAL)
+            if not os.path.isdir(".gitter"):
+                break
+            if not readable:
+                continue
+            connection, _ = server.accept()
+            with connection, connection.makefile("rwb") as stream:
+                try:
+                    request = read_message(stream)
+                except (OSError, ValueError):
+                    continue
+                if not isinstance(request, dict):
+                    continue
+                action = request.get("action")
+                if action == "stop":
+                    reply = {"stopped": True}
+                elif action == "status":
+                    reply = {"pid": os.getpid(), "served": served}
+                elif action == "run":
+                    status, output = _run_captured(
+                        request.get("command"), request.get("args", []), request.get("env", {})
+                    )
+                    served += 1
+                    reply = {"status": status, "output": output}
+                else:
+                    reply = {"error": f"unknown action '{action}'"}
+                try:
+                    write_message(stream, reply)
+                except OSError:
+                    pass  # The client went away
+            if action == "stop":
+                break
+    finally:
+        server.close()
+        try:
+            os.remove(DAEMON_SOCKET)
+        except OSError:
+            pass
+        enable_file_cache(False)
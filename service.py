@@ -1,6 +1,6 @@
 import sys
 
-from core.command_factory import CommandFactory
+from core.daemon import forward_command
 
 
 def main():
@@ -11,19 +11,14 @@ def main():
         sys.exit(1)
     command = sys.argv[1]
     args = sys.argv[2:]
-    command_class = CommandFactory.get_command(command)
-    if command_class:
-        try:
-            command_instance = command_class(args)
-            command_instance.execute()
-        except Exception as e:
-            print(f"Error executing command {command}: {e} \n See 'gitter --help'")
-            sys.exit(1)
-    else:
-        print(
-            "gitter: {} is not a gitter command. \n See 'gitter --help'".format(command)
-        )
-        sys.exit(1)
+    # A running daemon has the repository loaded already
+    status = forward_command(command, args)
+    if status is None:
+        # Loading the commands is most of the startup time, so it waits until here
+        from core.command_factory import CommandFactory
+
+        status = CommandFactory.run(command, args)
+    sys.exit(status)
 
 
 if __name__ == "__main__":
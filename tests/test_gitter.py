@@ -1,3 +1,4 @@
+import hashlib
 import json
 import os
 import shutil
@@ -5,6 +6,10 @@ import subprocess
 import sys
 import tempfile
 import unittest
+from unittest import mock
+
+# Make the gitter packages importable for the in-process tests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
 class GitterTestCase(unittest.TestCase):
@@ -60,6 +65,19 @@ class GitterTestCase(unittest.TestCase):
 
         return result
 
+    def load_commits(self):
+        """Helper to read the commits listed in the journal with their files, oldest first"""
+        from utils import commit_tree, flatten_tree, read_commit
+
+        with open(".gitter/commits.jsonl", "r") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        commits = []
+        for record in records:
+            commit = read_commit(record["hash"])
+            files = flatten_tree(commit_tree(commit))
+            commits.append(dict(commit, hash=record["hash"], files=files))
+        return commits
+
 
 class TestInitCommand(GitterTestCase):
     """Test the init command"""
@@ -73,16 +91,17 @@ class TestInitCommand(GitterTestCase):
 
         # Check repository structure
         self.assertTrue(os.path.exists(".gitter"))
-        self.assertTrue(os.path.exists(".gitter/index.json"))
-        self.assertTrue(os.path.exists(".gitter/commits.json"))
+        self.assertTrue(os.path.exists(".gitter/index"))
+        self.assertTrue(os.path.exists(".gitter/commits.jsonl"))
         self.assertTrue(os.path.exists(".gitter/HEAD"))
 
         # Check file contents
-        with open(".gitter/index.json", "r") as f:
-            self.assertEqual("{}", f.read())
+        from utils import read_index
 
-        with open(".gitter/commits.json", "r") as f:
-            self.assertEqual("[]", f.read())
+        self.assertEqual({}, dict(read_index()[0]))
+
+        with open(".gitter/commits.jsonl", "r") as f:
+            self.assertEqual("", f.read())
 
         with open(".gitter/HEAD", "r") as f:
             self.assertEqual("ref: refs/heads/main\n", f.read())
@@ -116,9 +135,10 @@ class TestAddCommand(GitterTestCase):
         self.assertIn("test_file1.txt", result.stdout)
 
         # Check index contents
-        with open(".gitter/index.json", "r") as f:
-            index = json.load(f)
-            self.assertIn("test_file1.txt", index)
+        from utils import read_index
+
+        index, _ = read_index()
+        self.assertIn("test_file1.txt", index)
 
     def test_add_all_files(self):
         """Test adding all files with the dot notation"""
@@ -127,11 +147,12 @@ class TestAddCommand(GitterTestCase):
         self.assertIn("Files successfully added to index", result.stdout)
 
         # Check that our test files are in the index
-        with open(".gitter/index.json", "r") as f:
-            index = json.load(f)
-            self.assertIn("./test_file1.txt", index)
-            self.assertIn("./test_file2.txt", index)
-            self.assertIn("./subdir/test_file3.txt", index)
+        from utils import read_index
+
+        index, _ = read_index()
+        self.assertIn("test_file1.txt", index)
+        self.assertIn("test_file2.txt", index)
+        self.assertIn("subdir/test_file3.txt", index)
 
     def test_add_nonexistent_file(self):
         """Test adding a file that doesn't exist"""
@@ -229,17 +250,16 @@ class TestCommitCommand(GitterTestCase):
 
         self.assertIn("Committed successfully", result.stdout)
 
-        # Check commits file
-        with open(".gitter/commits.json", "r") as f:
-            commits = json.load(f)
-            self.assertEqual(1, len(commits))
-            self.assertEqual("Initial commit", commits[0]["message"])
-            self.assertIn("test_file1.txt", commits[0]["files"])
+        # Check commit history
+        commits = self.load_commits()
+        self.assertEqual(1, len(commits))
+        self.assertEqual("Initial commit", commits[0]["message"])
+        self.assertIn("test_file1.txt", commits[0]["files"])
 
         # Check that the index was cleared
-        with open(".gitter/index.json", "r") as f:
-            index = json.load(f)
-            self.assertEqual({}, index)
+        from utils import read_index
+
+        self.assertEqual({}, dict(read_index()[0]))
 
     def test_commit_auto_stage(self):
         """Test committing with auto-staging option"""
@@ -256,11 +276,10 @@ class TestCommitCommand(GitterTestCase):
 
         self.assertIn("Committed successfully", result.stdout)
 
-        # Check commits file
-        with open(".gitter/commits.json", "r") as f:
-            commits = json.load(f)
-            self.assertEqual(2, len(commits))
-            self.assertEqual("Auto-staged commit", commits[1]["message"])
+        # Check commit history
+        commits = self.load_commits()
+        self.assertEqual(2, len(commits))
+        self.assertEqual("Auto-staged commit", commits[1]["message"])
 
     def test_commit_multiple_messages(self):
         """Test committing with multiple -m arguments"""
@@ -269,10 +288,9 @@ class TestCommitCommand(GitterTestCase):
 
         self.assertIn("Committed successfully", result.stdout)
 
-        # Check commits file
-        with open(".gitter/commits.json", "r") as f:
-            commits = json.load(f)
-            self.assertEqual("First line\nSecond line", commits[0]["message"])
+        # Check commit history
+        commits = self.load_commits()
+        self.assertEqual("First line\nSecond line", commits[0]["message"])
 
     def test_commit_no_changes(self):
         """Test committing with no changes staged"""
@@ -281,9 +299,7 @@ class TestCommitCommand(GitterTestCase):
         self.assertIn("No changes to commit", result.stdout)
 
         # Check that no commit was created
-        with open(".gitter/commits.json", "r") as f:
-            commits = json.load(f)
-            self.assertEqual(0, len(commits))
+        self.assertEqual([], self.load_commits())
 
 
 class TestLogCommand(GitterTestCase):
@@ -319,6 +335,157 @@ class TestLogCommand(GitterTestCase):
         second_commit_pos = result.stdout.find("Second commit")
         self.assertTrue(second_commit_pos < first_commit_pos)
 
+    def commit_messages(self, options):
+        result = self.run_command(f"log {options}")
+        return [line.strip() for line in result.stdout.splitlines() if line.startswith("  ")]
+
+    def make_commits(self, count):
+        for i in range(count):
+            with open("test_file1.txt", "w") as f:
+                f.write(str(i))
+            self.run_command(f"commit -am 'Commit {i}'")
+
+    def test_log_count_and_skip(self):
+        """Test -n, -<n>, --max-count and --skip"""
+        self.run_command("add test_file1.txt")
+        self.make_commits(4)
+        self.assertEqual(["Commit 3"], self.commit_messages("-n 1"))
+        self.assertEqual(["Commit 3", "Commit 2"], self.commit_messages("-2"))
+        self.assertEqual(["Commit 2", "Commit 1"], self.commit_messages("--max-count=2 --skip 1"))
+        self.assertEqual(["Commit 0"], self.commit_messages("--skip=3"))
+
+    def test_log_date_limits(self):
+        """Test --since and --until against commit timestamps"""
+        self.run_command("add test_file1.txt")
+        self.make_commits(2)
+        self.assertEqual(["Commit 1", "Commit 0"], self.commit_messages("--since '1 hour ago'"))
+        self.assertEqual([], self.commit_messages("--since 2999-01-01"))
+        self.assertEqual([], self.commit_messages("--until=2000-01-01"))
+
+        result = self.run_command("log --since=yesterdayish")
+        self.assertIn("invalid date", result.stdout)
+        self.assertEqual(1, result.returncode)
+
+    def test_log_stops_reading_at_limit(self):
+        """Test that log -n stops reading history once enough commits are shown"""
+        from commands import log as log_module
+
+        consumed = []
+
+        def fake_history():
+            for i in range(1000):
+                consumed.append(i)
+                yield {"hash": str(i), "message": str(i), "timestamp": "2024-01-01 00:00:00"}
+
+        original = log_module.iter_commits_reversed
+        log_module.iter_commits_reversed = fake_history
+        try:
+            command = log_module.LogCommand(["-n", "3"])
+            self.assertEqual(3, len(list(command.iter_selected())))
+        finally:
+            log_module.iter_commits_reversed = original
+        self.assertEqual([0, 1, 2], consumed)
+
+    def test_log_name_status(self):
+        """Test that --name-status lists the files each commit changed"""
+        self.run_command("add test_file1.txt")
+        self.run_command("commit -m 'First commit'")
+        with open("test_file1.txt", "w") as f:
+            f.write("changed")
+        self.run_command("add test_file2.txt")
+        self.run_command("commit -am 'Second commit'")
+
+        result = self.run_command("log --name-status")
+        self.assertIn("M\ttest_file1.txt\nA\ttest_file2.txt", result.stdout)
+        self.assertIn("A\ttest_file1.txt", result.stdout)
+        # Without the option no file lists are shown
+        self.assertNotIn("test_file1.txt", self.run_command("log").stdout)
+
+    def test_log_paths(self):
+        """Test that log -- <path> shows only commits that changed the path"""
+        os.makedirs("config", exist_ok=True)
+        for i in range(3):
+            with open("config/prod.yaml", "w") as f:
+                f.write(str(i))
+            self.run_command("add .")
+            self.run_command(f"commit -m 'Config {i}'")
+            with open("test_file1.txt", "w") as f:
+                f.write(str(i))
+            self.run_command(f"commit -am 'File {i}'")
+
+        self.assertEqual(
+            ["Config 2", "Config 1", "Config 0"], self.commit_messages("-- config/prod.yaml")
+        )
+        self.assertEqual(["Config 2", "Config 1"], self.commit_messages("-n 2 config"))
+        self.assertEqual(
+            ["File 2", "File 1", "File 0", "Config 0"],
+            self.commit_messages("-- test_file1.txt"),
+        )
+        self.assertEqual([], self.commit_messages("-- nothing.txt"))
+
+    def test_path_index_rebuilt_when_missing(self):
+        """Test that a missing or stale path index is rebuilt from history"""
+        self.run_command("add .")
+        self.run_command("commit -m 'First commit'")
+        with open("test_file2.txt", "w") as f:
+            f.write("changed")
+        self.run_command("commit -am 'Second commit'")
+        expected = self.commit_messages("-- test_file2.txt")
+        self.assertEqual(["Second commit", "First commit"], expected)
+
+        shutil.rmtree(".gitter/path-index")
+        self.assertEqual(expected, self.commit_messages("-- test_file2.txt"))
+        self.assertEqual(["First commit"], self.commit_messages("-- test_file1.txt"))
+
+    def test_path_commits_skip_unrelated_commits(self):
+        """Test that path history only reads the commits that touched the path"""
+        self.run_command("add .")
+        self.run_command("commit -m 'First commit'")
+        for i in range(5):
+            with open("test_file1.txt", "w") as f:
+                f.write(str(i))
+            self.run_command(f"commit -am 'Commit {i}'")
+
+        from utils import path_commits, update_path_index
+        from utils import path_index as path_index_module
+
+        update_path_index()
+        read = []
+        original = path_index_module.lookup_commit
+        path_index_module.lookup_commit = lambda commit_hash: read.append(commit_hash)
+        try:
+            self.assertEqual(1, len(list(path_commits(["test_file2.txt"]))))
+        finally:
+            path_index_module.lookup_commit = original
+        self.assertEqual([], read)
+
+    def test_pager_only_on_terminals(self):
+        """Test that the pager is only used when stdout is a terminal"""
+        from utils import pager
+
+        class Terminal:
+            def isatty(self):
+                return True
+
+        original_stdout = sys.stdout
+        original_env = {name: os.environ.get(name) for name in ("GITTER_PAGER", "PAGER")}
+        try:
+            os.environ.pop("GITTER_PAGER", None)
+            os.environ["PAGER"] = "more"
+            self.assertIsNone(pager.pager_command())
+
+            sys.stdout = Terminal()
+            self.assertEqual("more", pager.pager_command())
+            os.environ["GITTER_PAGER"] = "cat"
+            self.assertIsNone(pager.pager_command())
+        finally:
+            sys.stdout = original_stdout
+            for name, value in original_env.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
 
 class TestDiffCommand(GitterTestCase):
     """Test the diff command"""
@@ -376,6 +543,1717 @@ class TestDiffCommand(GitterTestCase):
         # No differences should be found
         self.assertIn("No differences found", result.stdout)
 
+    def test_ignore_whitespace_keeps_line_numbers(self):
+        """Test that -w numbers hunks by the real lines, blank ones included"""
+        lines = [f"line {i}\n" if i % 2 else "\n" for i in range(20)]
+        with open("spaced.txt", "w") as f:
+            f.writelines(lines)
+        self.run_command("add spaced.txt")
+        self.run_command("commit -m 'Spaced'")
+        lines[9] = "changed\n"
+        lines[3] = "  line   3\n"
+        with open("spaced.txt", "w") as f:
+            f.writelines(lines)
+
+        result = self.run_command("diff -w spaced.txt")
+        self.assertIn("@@ -7,7 +7,7 @@", result.stdout)
+        self.assertIn("-line 9", result.stdout)
+        self.assertNotIn("-line 3", result.stdout)
+
+    def test_diff_algorithm_option(self):
+        """Test that every diff algorithm can be selected and unknown ones are rejected"""
+        with open("test_file1.txt", "w") as f:
+            f.write("Modified content")
+
+        for algorithm in ("myers", "patience", "histogram"):
+            result = self.run_command(f"diff --diff-algorithm={algorithm}")
+            self.assertIn("@@ -1 +1 @@", result.stdout)
+            self.assertIn("+Modified content", result.stdout)
+
+        result = self.run_command("diff --diff-algorithm=fastest")
+        self.assertIn("unknown diff algorithm 'fastest'", result.stdout)
+        self.assertNotEqual(0, result.returncode)
+
+    def test_diff_deleted_file(self):
+        """Test that a deleted file diffs against /dev/null"""
+        os.remove("test_file1.txt")
+        result = self.run_command("diff")
+        self.assertIn("+++ /dev/null", result.stdout)
+        self.assertIn("@@ -1 +0,0 @@", result.stdout)
+        self.assertIn("-Test content 1", result.stdout)
+
+    def test_carriage_return_is_not_a_line_break(self):
+        """Test that a lone carriage return does not end a line or get the marker"""
+        with open("cr.txt", "wb") as f:
+            f.write(b"x\ry\nZ\n")
+        self.run_command("add cr.txt")
+        self.run_command("commit -m 'Carriage return'")
+        with open("cr.txt", "wb") as f:
+            f.write(b"x\ry\nW")
+
+        result = self.run_command("diff cr.txt")
+        self.assertIn("@@ -1,2 +1,2 @@", result.stdout)
+        lines = result.stdout.splitlines()
+        marker = lines.index("\\ No newline at end of file")
+        self.assertEqual("+W", lines[marker - 1])
+        self.assertEqual(1, result.stdout.count("No newline"))
+
+
+class TestDiffSummaryModes(GitterTestCase):
+    """Test diff --stat, --name-only, --name-status and --quiet"""
+
+    def setUp(self):
+        super().setUp()
+        self.run_command("init")
+        with open("test_file1.txt", "w") as f:
+            f.write("one\ntwo\nthree\n")
+        self.run_command("add .")
+        self.run_command("commit -m 'Initial commit'")
+        with open("test_file1.txt", "w") as f:
+            f.write("one\n2\nthree\nfour\n")
+        os.remove("test_file2.txt")
+
+    def test_name_only(self):
+        """Test that --name-only lists changed paths without hunks"""
+        result = self.run_command("diff --name-only")
+        self.assertEqual(["test_file1.txt", "test_file2.txt"], result.stdout.splitlines())
+
+    def test_name_status(self):
+        """Test that --name-status marks modified and deleted files"""
+        result = self.run_command("diff --name-status")
+        self.assertEqual(["M\ttest_file1.txt", "D\ttest_file2.txt"], result.stdout.splitlines())
+
+    def test_stat(self):
+        """Test that --stat counts inserted and deleted lines"""
+        result = self.run_command("diff --stat")
+        lines = result.stdout.splitlines()
+        self.assertEqual(" test_file1.txt | 3 ++-", lines[0])
+        self.assertEqual(" test_file2.txt | 1 -", lines[1])
+        self.assertEqual(" 2 files changed, 2 insertions(+), 2 deletions(-)", lines[2])
+
+    def test_quiet_exit_status(self):
+        """Test that --quiet prints nothing and exits non-zero only on differences"""
+        result = self.run_command("diff --quiet")
+        self.assertEqual("", result.stdout)
+        self.assertEqual(1, result.returncode)
+
+        result = self.run_command("diff --quiet subdir")
+        self.assertEqual("", result.stdout)
+        self.assertEqual(0, result.returncode)
+
+
+class TestDiffRevisions(GitterTestCase):
+    """Test diffs against a given commit and between two commits"""
+
+    def setUp(self):
+        super().setUp()
+        self.run_command("init")
+        with open("test_file1.txt", "w") as f:
+            f.write("one\ntwo\n")
+        self.run_command("add .")
+        self.run_command("commit -m 'First'")
+        with open("test_file1.txt", "w") as f:
+            f.write("one\n2\n")
+        os.makedirs("subdir", exist_ok=True)
+        with open("subdir/new.txt", "w") as f:
+            f.write("new\n")
+        self.run_command("add .")
+        self.run_command("commit -m 'Second'")
+
+        from utils import read_commit, resolve_head
+
+        self.second = resolve_head()
+        self.first = read_commit(self.second)["parent"]
+
+    def test_two_commits(self):
+        """Test that two commits are compared through their trees"""
+        # The working tree must not take part
+        with open("test_file1.txt", "w") as f:
+            f.write("unrelated\n")
+        result = self.run_command(f"diff {self.first} {self.second}")
+        self.assertIn("-two", result.stdout)
+        self.assertIn("+2", result.stdout)
+        self.assertNotIn("unrelated", result.stdout)
+        self.assertIn("--- /dev/null\n+++ b/subdir/new.txt", result.stdout)
+        self.assertIn("+new", result.stdout)
+
+    def test_range_and_abbreviated_hashes(self):
+        """Test A..B ranges with abbreviated hashes and an implied HEAD"""
+        full = self.run_command(f"diff {self.first} {self.second}").stdout
+        self.assertEqual(full, self.run_command(f"diff {self.first[:7]}..{self.second[:7]}").stdout)
+        self.assertEqual(full, self.run_command(f"diff {self.first[:7]}..").stdout)
+        self.assertEqual(full, self.run_command("diff HEAD~1 HEAD").stdout)
+
+    def test_paths_and_name_status(self):
+        """Test that paths after -- limit the diff and added files are marked A"""
+        result = self.run_command(f"diff --name-status {self.first} {self.second} -- subdir")
+        self.assertEqual(["A\tsubdir/new.txt"], result.stdout.splitlines())
+
+    def test_commit_against_working_tree(self):
+        """Test that a single commit is compared with the working tree"""
+        with open("test_file1.txt", "w") as f:
+            f.write("one\n2\nthree\n")
+        result = self.run_command(f"diff {self.first[:8]} -- test_file1.txt")
+        self.assertIn("-two", result.stdout)
+        self.assertIn("+three", result.stdout)
+
+    def test_unknown_and_ambiguous_revisions(self):
+        """Test that revisions that resolve to nothing or several commits fail"""
+        result = self.run_command("diff HEAD~5")
+        self.assertIn("unknown revision 'HEAD~5'", result.stdout)
+        self.assertEqual(1, result.returncode)
+
+        from utils import write_commit
+
+        # Write commits until two share a four-digit prefix
+        seen = {}
+        for i in range(100000):
+            commit_hash = write_commit({"parent": None, "message": str(i), "timestamp": ""})
+            if commit_hash[:4] in seen:
+                break
+            seen[commit_hash[:4]] = commit_hash
+        result = self.run_command(f"diff {commit_hash[:4]}")
+        self.assertIn(f"ambiguous revision '{commit_hash[:4]}'", result.stdout)
+        self.assertEqual(1, result.returncode)
+
+    def test_revisions_in_packs(self):
+        """Test that abbreviated hashes are found in packs"""
+        self.run_command("repack")
+        result = self.run_command(f"diff --name-only {self.first[:6]} {self.second[:6]}")
+        self.assertEqual(["subdir/new.txt", "test_file1.txt"], result.stdout.splitlines())
+
+
+class TestBinaryIndex(GitterTestCase):
+    """Test the binary index format and the upgrade from JSON"""
+
+    def make_entries(self, count):
+        return {
+            f"dir{i // 40}/sub/file{i}.txt": {
+                "hash": hashlib.sha1(str(i).encode()).hexdigest(),
+                "size": i,
+                "mtime_ns": 10**18 + i,
+                "ctime_ns": 10**18 + i,
+                "ino": i,
+                "mode": 0o100644,
+            }
+            for i in range(count)
+        }
+
+    def test_round_trip_and_lookups(self):
+        """Test that entries survive a round trip and are found by binary search"""
+        from utils import IndexFile, read_index, write_index
+
+        os.makedirs(".gitter")
+        entries = self.make_entries(1000)
+        write_index(entries)
+        index_file = IndexFile(".gitter/index")
+        self.assertEqual(1000, len(index_file))
+        for path in ["dir0/sub/file0.txt", "dir12/sub/file499.txt", "dir24/sub/file999.txt"]:
+            self.assertEqual(entries[path], index_file.get(path))
+        for path in ["a", "dir12/sub/file499", "dir12/sub/file499.txtx", "zzz"]:
+            self.assertIsNone(index_file.get(path))
+        self.assertEqual(sorted(entries), list(index_file.paths()))
+        self.assertEqual(entries, dict(read_index()[0].items()))
+
+        # Raw hashes and shared path prefixes make it a fraction of the JSON index
+        self.assertLess(os.path.getsize(".gitter/index"), len(json.dumps(entries, indent=4)) / 3)
+
+    def test_index_mapping_changes(self):
+        """Test that changes to an Index overlay the file until written"""
+        from utils import read_index, write_index
+
+        os.makedirs(".gitter")
+        write_index(self.make_entries(100))
+        index, _ = read_index()
+        index["dir0/sub/file1.txt"]["size"] = -1
+        del index["dir0/sub/file2.txt"]
+        index["new.txt"] = "0" * 40
+        self.assertNotIn("dir0/sub/file2.txt", index)
+        self.assertEqual(100, len(index))
+        write_index(index)
+
+        index, _ = read_index()
+        self.assertEqual(-1, index["dir0/sub/file1.txt"]["size"])
+        self.assertNotIn("dir0/sub/file2.txt", index)
+        # Bare-hash entries come back without trustworthy stat data
+        self.assertEqual({"hash": "0" * 40, "size": -1}, {
+            key: index["new.txt"][key] for key in ("hash", "size")
+        })
+
+    def test_json_index_upgraded(self):
+        """Test that a JSON index is converted on first use"""
+        self.run_command("init")
+        self.run_command("add test_file1.txt")
+        from utils import read_index
+
+        entry = read_index()[0]["test_file1.txt"]
+        os.remove(".gitter/index")
+        with open(".gitter/index.json", "w") as f:
+            json.dump({"test_file1.txt": entry}, f, indent=4)
+
+        result = self.run_command("status")
+        self.assertIn("test_file1.txt", result.stdout)
+        self.assertFalse(os.path.exists(".gitter/index.json"))
+        self.assertEqual(entry["hash"], read_index()[0]["test_file1.txt"]["hash"])
+        self.run_command("commit -m 'Upgraded'")
+        self.assertIn("Upgraded", self.run_command("log").stdout)
+
+    def test_corrupt_index_detected(self):
+        """Test that a damaged index fails its checksum"""
+        self.run_command("init")
+        self.run_command("add .")
+        with open(".gitter/index", "r+b") as f:
+            f.seek(30)
+            byte = f.read(1)
+            f.seek(30)
+            f.write(bytes([byte[0] ^ 0xFF]))
+        result = self.run_command("status")
+        self.assertIn("bad checksum", result.stdout)
+        self.assertEqual(1, result.returncode)
+
+
+class TestConcurrency(GitterTestCase):
+    """Test lock files and concurrent gitter invocations"""
+
+    PROCESSES = 8
+
+    def setUp(self):
+        super().setUp()
+        self.run_command("init")
+
+    def gitter(self, command):
+        """Returns the shell command line running a gitter command"""
+        gitter_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return f"{sys.executable} {os.path.join(gitter_path, 'service.py')} {command}"
+
+    def start_command(self, command):
+        """Starts a gitter command without waiting for it"""
+        return subprocess.Popen(
+            self.gitter(command),
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            cwd=self.test_dir,
+        )
+
+    def run_concurrently(self, commands):
+        processes = [self.start_command(command) for command in commands]
+        for process in processes:
+            stdout, stderr = process.communicate(timeout=120)
+            self.assertEqual(0, process.returncode, stdout + stderr)
+
+    def test_concurrent_adds_keep_all_entries(self):
+        """Test that adds of different directories run at once lose no entries"""
+        expected = set()
+        for i in range(self.PROCESSES):
+            os.makedirs(f"part{i}")
+            for j in range(20):
+                with open(f"part{i}/file{j}.txt", "w") as f:
+                    f.write(f"{i} {j}")
+                expected.add(f"part{i}/file{j}.txt")
+
+        self.run_concurrently([f"add part{i}" for i in range(self.PROCESSES)])
+
+        from utils import read_index
+
+        self.assertEqual(expected, set(read_index()[0]))
+        self.assertFalse(os.path.exists(".gitter/index.lock"))
+
+    def test_concurrent_add_and_commit(self):
+        """Test that racing add-and-commit runs leave a linear history with every file"""
+        for i in range(self.PROCESSES):
+            with open(f"file{i}.txt", "w") as f:
+                f.write(str(i))
+        self.run_concurrently(
+            [
+                f"add file{i}.txt && " + self.gitter(f"commit -m 'Commit {i}'")
+                for i in range(self.PROCESSES)
+            ]
+        )
+
+        commits = self.load_commits()
+        # Every commit builds on the one before it
+        for previous, commit in zip(commits, commits[1:]):
+            self.assertEqual(previous["hash"], commit["parent"])
+        self.assertEqual(commits[-1]["hash"], open(".gitter/refs/heads/main").read().strip())
+        files = commits[-1]["files"]
+        for i in range(self.PROCESSES):
+            self.assertIn(f"file{i}.txt", files)
+
+        from utils import read_index
+
+        self.assertEqual({}, dict(read_index()[0]))
+
+    def test_held_lock_times_out(self):
+        """Test that a lock held by someone else fails the command after the timeout"""
+        with open(".gitter/index.lock", "w"):
+            pass
+        os.environ["GITTER_LOCK_TIMEOUT"] = "0.2"
+        try:
+            result = self.run_command("add test_file1.txt")
+        finally:
+            del os.environ["GITTER_LOCK_TIMEOUT"]
+        self.assertIn("Unable to create '.gitter/index.lock'", result.stdout)
+        self.assertEqual(1, result.returncode)
+        # The lock belongs to someone else and stays in place
+        self.assertTrue(os.path.exists(".gitter/index.lock"))
+
+    def test_lock_rollback_leaves_target(self):
+        """Test that an uncommitted lock leaves the target file untouched"""
+        from utils import LockFile
+
+        with open("target.txt", "w") as f:
+            f.write("original")
+        with self.assertRaises(RuntimeError):
+            with LockFile("target.txt") as lock:
+                lock.write(b"partial")
+                raise RuntimeError("interrupted")
+        with open("target.txt") as f:
+            self.assertEqual("original", f.read())
+        self.assertFalse(os.path.exists("target.txt.lock"))
+
+        with LockFile("target.txt") as lock:
+            lock.write(b"replaced")
+            lock.commit()
+        with open("target.txt") as f:
+            self.assertEqual("replaced", f.read())
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "fsmonitor uses inotify")
+class TestFsmonitor(GitterTestCase):
+    """Test the inotify file system monitor and the walks it narrows"""
+
+    def setUp(self):
+        super().setUp()
+        self.run_command("init")
+        os.makedirs("src/pkg")
+        for path in ("README.txt", "src/main.txt", "src/pkg/util.txt"):
+            with open(path, "w") as f:
+                f.write(f"{path}\n")
+        self.run_command("add .")
+        result = self.run_command("fsmonitor start")
+        self.assertIn("File system monitor started", result.stdout)
+
+    def tearDown(self):
+        self.run_command("fsmonitor stop")
+        super().tearDown()
+
+    def change_tree(self):
+        with open("src/main.txt", "a") as f:
+            f.write("more\n")
+        os.remove("src/pkg/util.txt")
+        os.makedirs("docs/api")
+        with open("docs/api/index.txt", "w") as f:
+            f.write("docs\n")
+        os.rename("src/pkg", "src/lib")
+        with open("src/lib/new.txt", "w") as f:
+            f.write("new\n")
+
+    def test_status_matches_full_walk(self):
+        """Test that status with the monitor reports what a full walk reports"""
+        self.assertIn("new file: src/pkg/util.txt", self.run_command("status").stdout)
+        self.change_tree()
+
+        monitored = self.run_command("status").stdout
+        self.assertIn("modified: src/main.txt", monitored)
+        self.assertIn("deleted: src/pkg/util.txt", monitored)
+        self.assertIn("docs/api/index.txt", monitored)
+        self.assertIn("src/lib/new.txt", monitored)
+
+        self.run_command("fsmonitor stop")
+        self.assertEqual(monitored, self.run_command("status").stdout)
+
+    def test_walk_reads_only_changed_paths(self):
+        """Test that only the paths the monitor reports are walked again"""
+        import utils.fsmonitor
+        from utils import walk_files, walk_working_tree
+
+        first = list(walk_working_tree())
+        self.assertEqual(list(walk_files(["."])), first)
+
+        self.change_tree()
+        with mock.patch.object(
+            utils.fsmonitor, "walk_files", wraps=utils.fsmonitor.walk_files
+        ) as walk:
+            records = list(walk_working_tree())
+        walked = sorted(call.args[0][0] for call in walk.call_args_list)
+        self.assertEqual(["docs", "src/lib", "src/main.txt"], walked)
+        self.assertEqual(
+            [(path, st.st_size) for path, st in walk_files(["."])],
+            [(path, st.st_size) for path, st in records],
+        )
+
+        # Nothing changed since: the snapshot answers without any walk
+        with mock.patch.object(utils.fsmonitor, "walk_files") as walk:
+            self.assertEqual(
+                [path for path, _ in records], [path for path, _ in walk_working_tree()]
+            )
+        walk.assert_not_called()
+
+    def test_stale_token_falls_back(self):
+        """Test that a token the monitor does not know leads to a full walk"""
+        import utils.fsmonitor
+        from utils import walk_working_tree
+
+        list(walk_working_tree())
+        with open(".gitter/fsmonitor-state.json") as f:
+            state = json.load(f)
+        state["token"] = "0" * 32 + ":0"
+        with open(".gitter/fsmonitor-state.json", "w") as f:
+            json.dump(state, f)
+
+        with mock.patch.object(
+            utils.fsmonitor, "walk_files", wraps=utils.fsmonitor.walk_files
+        ) as walk:
+            list(walk_working_tree())
+        self.assertEqual([["."]], [call.args[0] for call in walk.call_args_list])
+
+    def test_commit_all_and_diff(self):
+        """Test that commit -a and diff see changes through the monitor"""
+        self.run_command("commit -m 'Initial commit'")
+        self.run_command("status")
+        with open("README.txt", "w") as f:
+            f.write("changed\n")
+
+        self.assertIn("+changed", self.run_command("diff").stdout)
+        self.run_command("commit -a -m 'Update README'")
+        self.assertEqual("No differences found.\n", self.run_command("diff").stdout)
+
+    def test_stop(self):
+        """Test that stopping the monitor removes its socket"""
+        self.assertIn("is running", self.run_command("fsmonitor status").stdout)
+        self.assertIn("stopped", self.run_command("fsmonitor stop").stdout)
+        self.assertFalse(os.path.exists(".gitter/fsmonitor.sock"))
+        self.assertIn("not running", self.run_command("fsmonitor status").stdout)
+        self.assertIn("new file: README.txt", self.run_command("status").stdout)
+
+
+class TestDaemon(GitterTestCase):
+    """Test running commands through the resident daemon"""
+
+    def setUp(self):
+        super().setUp()
+        self.run_command("init")
+        with open("a.txt", "w") as f:
+            f.write("a\n")
+        self.assertIn("Gitter daemon started", self.run_command("daemon start").stdout)
+
+    def tearDown(self):
+        self.run_command("daemon stop")
+        super().tearDown()
+
+    def served(self):
+        status = self.run_command("daemon status").stdout
+        return int(status.split(", ")[1].split()[0])
+
+    def test_commands_run_in_daemon(self):
+        """Test that commands are served by the daemon with their output and status"""
+        self.assertEqual(0, self.served())
+        self.assertIn("a.txt", self.run_command("add a.txt").stdout)
+        self.assertIn("new file: a.txt", self.run_command("status").stdout)
+        self.assertIn("Committed successfully", self.run_command("commit -m 'First'").stdout)
+        self.assertIn("First", self.run_command("log").stdout)
+        with open("a.txt", "a") as f:
+            f.write("b\n")
+        self.assertIn("+b", self.run_command("diff").stdout)
+        self.assertEqual(1, self.run_command("diff --quiet").returncode)
+        self.assertEqual(6, self.served())
+
+        result = self.run_command("log -n x")
+        self.assertEqual(1, result.returncode)
+        self.assertIn("Error: invalid value for -n: 'x'", result.stdout)
+
+    def test_sees_changes_made_by_other_processes(self):
+        """Test that the daemon reloads the index and HEAD after they change on disk"""
+        self.run_command("add a.txt")
+        self.assertIn("new file: a.txt", self.run_command("status").stdout)
+
+        with open("b.txt", "w") as f:
+            f.write("b\n")
+        with mock.patch.dict(os.environ, {"GITTER_NO_DAEMON": "1"}):
+            self.run_command("add b.txt")
+        status = self.run_command("status").stdout
+        self.assertIn("new file: a.txt", status)
+        self.assertIn("new file: b.txt", status)
+
+        with mock.patch.dict(os.environ, {"GITTER_NO_DAEMON": "1"}):
+            self.run_command("commit -m 'Outside the daemon'")
+        self.assertNotIn("Changes to be committed", self.run_command("status").stdout)
+        self.assertIn("Outside the daemon", self.run_command("log").stdout)
+        self.assertEqual(5, self.served())
+
+    def test_stop(self):
+        """Test that commands run locally again once the daemon is stopped"""
+        self.assertIn("Gitter daemon stopped", self.run_command("daemon stop").stdout)
+        self.assertFalse(os.path.exists(".gitter/daemon.sock"))
+        self.assertIn("not running", self.run_command("daemon status").stdout)
+        self.assertIn("a.txt", self.run_command("status").stdout)
+
+    def test_file_cache(self):
+        """Test that cached loads are reused until the file is replaced"""
+        from utils import enable_file_cache, load_cached, write_file_atomic
+
+        loads = []
+
+        def loader(path):
+            loads.append(path)
+            with open(path) as f:
+                return {"data": f.read()}
+
+        enable_file_cache()
+        try:
+            first = load_cached("a.txt", loader, copy=dict)
+            first["data"] = "modified by the caller"
+            self.assertEqual({"data": "a\n"}, load_cached("a.txt", loader, copy=dict))
+            self.assertEqual(1, len(loads))
+
+            write_file_atomic("a.txt", b"a\n")
+            self.assertEqual({"data": "a\n"}, load_cached("a.txt", loader, copy=dict))
+            self.assertEqual(2, len(loads))
+        finally:
+            enable_file_cache(False)
+
+        load_cached("a.txt", loader)
+        load_cached("a.txt", loader)
+        self.assertEqual(4, len(loads))
+
+
+class TestStartupTime(GitterTestCase):
+    """Test that commands only import what they use"""
+
+    # Microseconds 'gitter help' may spend importing modules, interpreter
+    # startup included; loading every command took well over twice this
+    HELP_IMPORT_BUDGET_US = 50000
+    # Modules only commands that hash, walk or diff files should load
+    HEAVY_MODULES = (
+        "concurrent.futures",
+        "difflib",
+        "fnmatch",
+        "glob",
+        "multiprocessing",
+        "socket",
+        "subprocess",
+        "tempfile",
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.run_command("init")
+        self.run_command("add .")
+        self.run_command("commit -m 'Initial commit'")
+
+    def import_times(self, command):
+        """Returns {module: self import time in microseconds} from -X importtime"""
+        gitter_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", os.path.join(gitter_path, "service.py")]
+            + command.split(),
+            capture_output=True,
+            text=True,
+            cwd=self.test_dir,
+        )
+        self.assertEqual(0, result.returncode, result.stdout + result.stderr)
+        times = {}
+        for line in result.stderr.splitlines():
+            if line.startswith("import time:") and "self [us]" not in line:
+                self_us, _, name = line[len("import time:"):].split("|")
+                times[name.strip()] = int(self_us)
+        return times
+
+    def test_help_import_budget(self):
+        """Test that help loads no other command and stays within its import budget"""
+        times = self.import_times("help")
+        self.assertEqual([], [name for name in self.HEAVY_MODULES + ("hashlib", "json") if name in times])
+        self.assertEqual(
+            ["commands.command", "commands.help"],
+            sorted(name for name in times if name.startswith("commands.")),
+        )
+        self.assertLess(sum(times.values()), self.HELP_IMPORT_BUDGET_US)
+
+    def test_log_imports(self):
+        """Test that log does not load the diff, walk and hashing machinery"""
+        times = self.import_times("log --no-pager")
+        self.assertIn("utils.commit_graph", times)
+        self.assertEqual([], [name for name in self.HEAVY_MODULES if name in times])
+        self.assertEqual(
+            ["commands.command", "commands.log"],
+            sorted(name for name in times if name.startswith("commands.")),
+        )
+
+    def test_registry(self):
+        """Test that every registered command resolves to its class"""
+        import commands
+        from core.command_factory import CommandFactory
+
+        for name, (module_name, class_name) in CommandFactory.COMMANDS.items():
+            command_class = CommandFactory.get_command(name)
+            self.assertEqual(class_name, command_class.__name__)
+            self.assertEqual(module_name, command_class.__module__)
+            self.assertIs(command_class, getattr(commands, class_name))
+        self.assertIsNone(CommandFactory.get_command("unknown"))
+
+
+class TestStatCache(GitterTestCase):
+    """Test the stat data recorded in the index and committed file map"""
+
+    def setUp(self):
+        super().setUp()
+        self.run_command("init")
+
+    def test_index_records_stat_data(self):
+        """Test that index entries record the file hash and stat data"""
+        self.run_command("add test_file1.txt")
+
+        from utils import read_index
+
+        entry = read_index()[0]["test_file1.txt"]
+
+        st = os.stat("test_file1.txt")
+        self.assertEqual(st.st_size, entry["size"])
+        self.assertEqual(st.st_mtime_ns, entry["mtime_ns"])
+        self.assertEqual(st.st_ctime_ns, entry["ctime_ns"])
+        self.assertEqual(st.st_ino, entry["ino"])
+        self.assertEqual(st.st_mode, entry["mode"])
+        self.assertEqual(40, len(entry["hash"]))
+
+    def test_commit_records_stat_data(self):
+        """Test that stat data is kept for the files of the HEAD commit"""
+        self.run_command("add test_file1.txt")
+        self.run_command("commit -m 'Initial commit'")
+
+        with open(".gitter/stat-cache.json", "r") as f:
+            cache = json.load(f)
+        with open(".gitter/refs/heads/main", "r") as f:
+            self.assertEqual(f.read().strip(), cache["commit"])
+        entry = cache["files"]["test_file1.txt"]
+        self.assertEqual(os.stat("test_file1.txt").st_size, entry["size"])
+
+    def test_same_size_modification_detected(self):
+        """Test that a same-size edit right after staging is still detected"""
+        self.run_command("add test_file1.txt")
+        with open("test_file1.txt", "w") as f:
+            f.write("Test content X")
+
+        result = self.run_command("status")
+        self.assertIn("Changes not staged for commit", result.stdout)
+
+    def test_matching_stat_skips_hashing(self):
+        """Test that files with matching stat data are not read"""
+        from utils import index as index_module
+
+        st = os.stat("test_file1.txt")
+        entry = index_module.make_entry("a" * 40, st)
+        with mock.patch.object(index_module, "hash_file") as hash_file:
+            file_hash = index_module.cached_hash(
+                "test_file1.txt", st, ({"test_file1.txt": entry}, st.st_mtime_ns + 1)
+            )
+        self.assertEqual("a" * 40, file_hash)
+        hash_file.assert_not_called()
+
+    def test_racily_clean_entry_is_rehashed(self):
+        """Test that entries as new as the index file are not trusted"""
+        from utils import index as index_module
+
+        st = os.stat("test_file1.txt")
+        entry = index_module.make_entry("a" * 40, st)
+        with mock.patch.object(index_module, "hash_file", return_value="b" * 40):
+            file_hash = index_module.cached_hash(
+                "test_file1.txt", st, ({"test_file1.txt": entry}, st.st_mtime_ns)
+            )
+        self.assertEqual("b" * 40, file_hash)
+
+
+class TestFileOperations(GitterTestCase):
+    """Test the streaming file helpers"""
+
+    def test_hash_file_spanning_multiple_chunks(self):
+        """Test that streamed hashing matches hashing the whole content"""
+        from utils import file_operations
+
+        content = os.urandom(file_operations.CHUNK_SIZE * 2 + 123)
+        with open("large.bin", "wb") as f:
+            f.write(content)
+
+        self.assertEqual(
+            hashlib.sha1(content).hexdigest(), file_operations.hash_file("large.bin")
+        )
+
+    def test_read_file_content_keeps_line_endings(self):
+        """Test that lines are returned with their original endings"""
+        from utils import read_file_content
+
+        with open("lines.txt", "wb") as f:
+            f.write(b"one\r\ntwo\nthree")
+
+        self.assertEqual(["one\r\n", "two\n", "three"], read_file_content("lines.txt"))
+
+    def test_read_file_content_binary(self):
+        """Test that undecodable files are reported as binary"""
+        from utils import read_file_content
+
+        with open("binary.bin", "wb") as f:
+            f.write(b"\xff\xfe\x00\x01")
+
+        self.assertEqual(
+            ["[BINARY FILE - CANNOT DISPLAY CONTENT]\n"], read_file_content("binary.bin")
+        )
+
+
+class TestParallelHashing(GitterTestCase):
+    """Test the shared parallel hashing stage"""
+
+    def test_hash_files_preserves_order(self):
+        """Test that hashes come back in the order the files were given"""
+        from utils import hash_file, hash_files
+
+        paths = []
+        for i in range(20):
+            path = f"file{i}.txt"
+            with open(path, "w") as f:
+                f.write(f"content {i}")
+            paths.append(path)
+
+        self.assertEqual([hash_file(p) for p in paths], hash_files(paths, jobs=4))
+
+    def test_add_with_jobs_option(self):
+        """Test that add accepts --jobs and stages every file"""
+        self.run_command("init")
+        result = self.run_command("add --jobs 4 .")
+
+        self.assertIn("Files successfully added to index", result.stdout)
+        from utils import read_index
+
+        self.assertIn("subdir/test_file3.txt", read_index()[0])
+
+    def test_invalid_jobs(self):
+        """Test that a non-positive job count is rejected"""
+        self.run_command("init")
+        result = self.run_command("status --jobs=0")
+        self.assertIn("invalid number of jobs", result.stdout)
+
+
+class TestIgnoreMatcher(GitterTestCase):
+    """Test the compiled ignore matcher and directory pruning"""
+
+    def test_negation_and_directory_rules(self):
+        """Test negated, directory-only and anchored patterns"""
+        from utils import IgnoreMatcher
+
+        matcher = IgnoreMatcher(["*.log", "!keep.log", "build/", "/root.txt"])
+
+        self.assertTrue(matcher.is_ignored("logs/debug.log"))
+        self.assertFalse(matcher.is_ignored("logs/keep.log"))
+        self.assertTrue(matcher.is_ignored("src/build/out.txt"))
+        self.assertFalse(matcher.is_ignored("build"))  # A file named build
+        self.assertTrue(matcher.is_ignored("root.txt"))
+        self.assertFalse(matcher.is_ignored("sub/root.txt"))
+        self.assertTrue(matcher.is_ignored(".gitter/index.json"))
+
+    def test_cannot_reinclude_inside_ignored_directory(self):
+        """Test that negation does not re-include files of an ignored directory"""
+        from utils import IgnoreMatcher
+
+        matcher = IgnoreMatcher(["vendor/", "!vendor/keep.txt"])
+        self.assertTrue(matcher.is_ignored("vendor/keep.txt"))
+
+    def test_ignored_directories_are_not_walked(self):
+        """Test that get_files prunes ignored directories before descending"""
+        from utils import get_files
+
+        os.makedirs("node_modules/pkg")
+        with open("node_modules/pkg/index.js", "w") as f:
+            f.write("module.exports = 1")
+
+        scanned = []
+        real_scandir = os.scandir
+
+        def tracking_scandir(path="."):
+            scanned.append(os.path.normpath(path))
+            return real_scandir(path)
+
+        with mock.patch.object(os, "scandir", tracking_scandir):
+            files, _ = get_files(["."], ["node_modules/"])
+
+        self.assertIn("test_file1.txt", files)
+        self.assertNotIn("node_modules/pkg/index.js", files)
+        self.assertIn(".", scanned)
+        self.assertFalse(any(p.startswith("node_modules") for p in scanned))
+
+    def test_status_respects_gitterignore_negation(self):
+        """Test that status applies .gitterignore rules including negation"""
+        self.run_command("init")
+        with open(".gitterignore", "w") as f:
+            f.write("*.txt\n!test_file2.txt\n")
+
+        result = self.run_command("status")
+        self.assertIn("test_file2.txt", result.stdout)
+        self.assertNotIn("test_file1.txt", result.stdout)
+
+
+class TestTreeWalker(GitterTestCase):
+    """Test the scandir based tree walker"""
+
+    def test_walk_yields_paths_with_stat(self):
+        """Test that records carry normalized paths and their stat results"""
+        from utils import walk_files
+
+        records = dict(walk_files(["."]))
+
+        self.assertEqual(
+            ["subdir/test_file3.txt", "test_file1.txt", "test_file2.txt"],
+            sorted(records),
+        )
+        st = os.stat("subdir/test_file3.txt")
+        self.assertEqual(st.st_ino, records["subdir/test_file3.txt"].st_ino)
+        self.assertEqual(st.st_size, records["subdir/test_file3.txt"].st_size)
+
+    def test_walk_is_lazy(self):
+        """Test that the walker produces records before the walk finishes"""
+        from utils import walk_files
+
+        walker = walk_files(["."])
+        first_path, _ = next(walker)
+        self.assertIn(first_path, ["subdir/test_file3.txt", "test_file1.txt"])
+        walker.close()
+
+    def test_walk_files_globs_and_missing(self):
+        """Test explicit files, glob patterns and missing paths"""
+        from utils import walk_files
+
+        missing = []
+        records = list(walk_files(["./test_file1.txt", "*2.txt", "nope"], None, missing))
+
+        self.assertEqual(
+            ["test_file1.txt", "test_file2.txt"], [path for path, _ in records]
+        )
+        self.assertEqual(["nope"], missing)
+
+
+class TestCommitJournal(GitterTestCase):
+    """Test the append-only commit journal"""
+
+    def setUp(self):
+        super().setUp()
+        self.run_command("init")
+
+    def test_commit_appends_without_rewriting(self):
+        """Test that a commit only appends to the journal"""
+        self.run_command("add test_file1.txt")
+        self.run_command("commit -m 'First commit'")
+        with open(".gitter/commits.jsonl", "rb") as f:
+            first_record = f.read()
+
+        self.run_command("add test_file2.txt")
+        self.run_command("commit -m 'Second commit'")
+        with open(".gitter/commits.jsonl", "rb") as f:
+            journal = f.read()
+
+        self.assertTrue(journal.startswith(first_record))
+        self.assertEqual(2, journal.count(b"\n"))
+
+    def test_migrates_legacy_commits_json(self):
+        """Test that an existing commits.json is converted on first use"""
+        os.remove(".gitter/commits.jsonl")
+        legacy = [
+            {"hash": "a" * 40, "message": "Old one", "timestamp": "t1", "files": {}},
+            {"hash": "b" * 40, "message": "Old two", "timestamp": "t2", "files": {}},
+        ]
+        with open(".gitter/commits.json", "w") as f:
+            json.dump(legacy, f, indent=4)
+
+        result = self.run_command("log")
+
+        self.assertLess(result.stdout.find("Old two"), result.stdout.find("Old one"))
+        self.assertFalse(os.path.exists(".gitter/commits.json"))
+        commits = self.load_commits()
+        self.assertEqual(["Old one", "Old two"], [c["message"] for c in commits])
+        self.assertEqual(commits[0]["hash"], commits[1]["parent"])
+
+    def test_upgrades_old_layout_paths(self):
+        """Test that './' paths from the old layout are normalized on upgrade"""
+        import hashlib
+
+        os.remove(".gitter/commits.jsonl")
+        os.remove(".gitter/index")
+        files = {}
+        for path in ("test_file1.txt", "subdir/test_file3.txt"):
+            with open(path, "rb") as f:
+                data = f.read()
+            file_hash = hashlib.sha1(data).hexdigest()
+            os.makedirs(f".gitter/objects/{file_hash[:2]}", exist_ok=True)
+            with open(f".gitter/objects/{file_hash[:2]}/{file_hash[2:]}", "wb") as f:
+                f.write(data)
+            files[f"./{path}"] = file_hash
+        legacy = [{"hash": "a" * 40, "message": "Old one", "timestamp": "t1", "files": files}]
+        with open(".gitter/commits.json", "w") as f:
+            json.dump(legacy, f, indent=4)
+        with open(".gitter/index.json", "w") as f:
+            json.dump(files, f, indent=4)
+
+        status = self.run_command("status").stdout
+        self.assertNotIn("./", status)
+        self.assertNotIn("deleted", status)
+        self.assertNotIn("test_file1.txt", status)
+
+        self.run_command("add test_file2.txt")
+        self.run_command("commit -m 'New one'")
+        log = self.run_command("log --name-status").stdout
+        self.assertNotIn("./", log)
+        self.assertIn("A\ttest_file2.txt", log)
+        self.assertNotIn("test_file1.txt", log.split("Old one")[0])
+
+    def test_reads_newest_record_backwards(self):
+        """Test that the newest record is found across read blocks"""
+        from utils import history
+
+        records = [{"hash": str(i), "message": "m" * 50} for i in range(200)]
+        with open(".gitter/commits.jsonl", "w") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+            f.write('{"hash": "torn')  # Interrupted append
+
+        with mock.patch.object(history, "READ_BLOCK_SIZE", 100):
+            self.assertEqual("199", history.read_last_commit()["hash"])
+            hashes = [c["hash"] for c in history.iter_commits_reversed()]
+        self.assertEqual([str(i) for i in reversed(range(200))], hashes)
+
+
+class TestCommitObjects(GitterTestCase):
+    """Test commit objects, parent links and HEAD resolution"""
+
+    def setUp(self):
+        super().setUp()
+        self.run_command("init")
+
+    def read_ref(self):
+        with open(".gitter/refs/heads/main", "r") as f:
+            return f.read().strip()
+
+    def test_branch_ref_holds_tip(self):
+        """Test that refs/heads/main points at the newest commit object"""
+        self.run_command("add test_file1.txt")
+        result = self.run_command("commit -m 'First commit'")
+
+        tip = self.read_ref()
+        self.assertIn(tip, result.stdout)
+        self.assertTrue(os.path.exists(f".gitter/objects/{tip[:2]}/{tip[2:]}"))
+
+    def test_commits_link_to_parent(self):
+        """Test that each commit object records its parent"""
+        from utils import read_commit
+
+        self.run_command("add test_file1.txt")
+        self.run_command("commit -m 'First commit'")
+        first = self.read_ref()
+        self.run_command("add test_file2.txt")
+        self.run_command("commit -m 'Second commit'")
+        second = self.read_ref()
+
+        self.assertEqual(first, read_commit(second)["parent"])
+        self.assertIsNone(read_commit(first)["parent"])
+
+    def test_status_reads_head_commit(self):
+        """Test that status compares against the commit HEAD resolves to"""
+        self.run_command("add test_file1.txt")
+        self.run_command("commit -m 'First commit'")
+        # The journal is only used by log; HEAD alone determines the last commit
+        os.remove(".gitter/commits.jsonl")
+
+        os.remove("test_file1.txt")
+        result = self.run_command("status")
+        self.assertIn("deleted: test_file1.txt", result.stdout)
+
+
+class TestTreeObjects(GitterTestCase):
+    """Test hierarchical tree objects"""
+
+    def setUp(self):
+        super().setUp()
+        self.run_command("init")
+
+    def head_commit(self):
+        from utils import read_commit, resolve_head
+
+        return read_commit(resolve_head())
+
+    def test_commit_builds_on_parent_tree(self):
+        """Test that a commit keeps the files of its parent"""
+        self.run_command("add test_file1.txt")
+        self.run_command("commit -m 'First commit'")
+        self.run_command("add test_file2.txt")
+        self.run_command("commit -m 'Second commit'")
+
+        files = self.load_commits()[-1]["files"]
+        self.assertEqual(["test_file1.txt", "test_file2.txt"], sorted(files))
+
+    def test_unchanged_subtrees_are_shared(self):
+        """Test that directories without changes keep their tree hash"""
+        from utils import read_tree
+
+        self.run_command("add .")
+        self.run_command("commit -m 'First commit'")
+        first_tree = read_tree(self.head_commit()["tree"])
+
+        with open("test_file1.txt", "w") as f:
+            f.write("Changed")
+        self.run_command("add test_file1.txt")
+        self.run_command("commit -m 'Second commit'")
+        second_tree = read_tree(self.head_commit()["tree"])
+
+        self.assertEqual(first_tree["subdir"], second_tree["subdir"])
+        self.assertNotEqual(
+            first_tree["test_file1.txt"]["hash"], second_tree["test_file1.txt"]["hash"]
+        )
+
+    def test_diff_trees_skips_equal_subtrees(self):
+        """Test that tree comparison never reads subtrees with equal hashes"""
+        from utils import build_tree, diff_trees, trees
+
+        old = build_tree({"a/x.txt": "1" * 40, "b/y.txt": "2" * 40, "c.txt": "3" * 40})
+        new = build_tree({"a/x.txt": "1" * 40, "b/y.txt": "4" * 40, "d.txt": "5" * 40})
+        unchanged_subtree = trees.read_tree(old)["a"]["hash"]
+
+        read = []
+        real_read_tree = trees.read_tree
+
+        def tracking_read_tree(tree_hash):
+            read.append(tree_hash)
+            return real_read_tree(tree_hash)
+
+        with mock.patch.object(trees, "read_tree", tracking_read_tree):
+            changes = list(diff_trees(old, new))
+
+        self.assertEqual(
+            [
+                ("b/y.txt", "2" * 40, "4" * 40),
+                ("c.txt", "3" * 40, None),
+                ("d.txt", None, "5" * 40),
+            ],
+            changes,
+        )
+        self.assertNotIn(unchanged_subtree, read)
+
+    def test_commit_all_records_deletions(self):
+        """Test that commit -a removes deleted files from the tree"""
+        self.run_command("add .")
+        self.run_command("commit -m 'First commit'")
+        os.remove("subdir/test_file3.txt")
+
+        result = self.run_command("commit -am 'Remove file'")
+
+        self.assertIn("Committed successfully", result.stdout)
+        files = self.load_commits()[-1]["files"]
+        self.assertNotIn("subdir/test_file3.txt", files)
+        from utils import read_tree
+
+        self.assertNotIn("subdir", read_tree(self.head_commit()["tree"]))
+
+    def test_commit_all_without_changes(self):
+        """Test that commit -a refuses to record an identical tree"""
+        self.run_command("commit -am 'First commit'")
+        result = self.run_command("commit -am 'Nothing changed'")
+
+        self.assertIn("No changes to commit", result.stdout)
+        self.assertEqual(1, len(self.load_commits()))
+
 
 if __name__ == "__main__":
     unittest.main()
+
+
+class TestObjectStore(GitterTestCase):
+    """Test the zlib-compressed loose object store"""
+
+    def setUp(self):
+        super().setUp()
+        self.run_command("init")
+
+    def commit_file(self, name, data):
+        with open(name, "wb") as f:
+            f.write(data)
+        self.run_command(f"add {name}")
+        self.run_command("commit -m 'Store file'")
+        return hashlib.sha1(data).hexdigest()
+
+    def test_binary_content_round_trips(self):
+        """Test that binary files are stored byte for byte"""
+        from utils import read_object
+
+        data = bytes(range(256)) * 16
+        blob = self.commit_file("image.bin", data)
+        self.assertEqual(data, read_object(blob))
+
+    def test_objects_are_compressed_with_header(self):
+        """Test that stored objects are zlib streams with a type and size header"""
+        import zlib
+
+        from utils import object_path
+
+        data = b"line\n" * 1000
+        blob = self.commit_file("repeat.txt", data)
+        with open(object_path(blob), "rb") as f:
+            stored = f.read()
+
+        self.assertLess(len(stored), len(data))
+        self.assertEqual(b"blob 5000\0" + data, zlib.decompress(stored))
+
+    def test_committed_lines_keep_newlines(self):
+        """Test that committed text reads back without doubled newlines"""
+        from utils import read_committed_file
+
+        blob = self.commit_file("lines.txt", b"one\ntwo\r\nthree")
+        self.assertEqual(["one\n", "two\r\n", "three"], read_committed_file(blob))
+
+    def test_legacy_uncompressed_objects_are_readable(self):
+        """Test that objects written before compression still read back"""
+        from utils import object_path, read_committed_file
+
+        path = object_path("ab" * 20)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write("old\ncontent\n")
+        self.assertEqual(["old\n", "content\n"], read_committed_file("ab" * 20))
+
+    def test_invalid_compression_level(self):
+        """Test that an invalid GITTER_COMPRESSION level is rejected"""
+        from utils import write_object
+
+        with mock.patch.dict(os.environ, {"GITTER_COMPRESSION": "12"}):
+            with self.assertRaises(ValueError):
+                write_object(b"data")
+
+    def test_add_stores_blobs(self):
+        """Test that add hashes and stores a file in the same pass"""
+        from utils import object_exists, read_object
+
+        self.run_command("add test_file1.txt")
+        blob = hashlib.sha1(b"Test content 1").hexdigest()
+        self.assertTrue(object_exists(blob))
+        self.assertEqual(b"Test content 1", read_object(blob))
+
+    def test_existing_objects_are_not_rewritten(self):
+        """Test that committing again leaves unchanged blobs untouched"""
+        from utils import object_path
+
+        self.run_command("add .")
+        self.run_command("commit -m 'First commit'")
+        blob_path = object_path(hashlib.sha1(b"Test content 2").hexdigest())
+        before = os.stat(blob_path)
+
+        with open("test_file1.txt", "w") as f:
+            f.write("Changed")
+        self.run_command("commit -am 'Second commit'")
+
+        after = os.stat(blob_path)
+        self.assertEqual((before.st_ino, before.st_mtime_ns), (after.st_ino, after.st_mtime_ns))
+
+    def test_hash_and_store_file(self):
+        """Test that storing returns the content hash and leaves no temp files"""
+        from utils import hash_and_store_file, hash_file, object_path, objects
+
+        blob = hash_and_store_file("subdir/test_file3.txt")
+        self.assertEqual(hash_file("subdir/test_file3.txt"), blob)
+        self.assertTrue(os.path.exists(object_path(blob)))
+        self.assertEqual(blob, hash_and_store_file("subdir/test_file3.txt"))
+        self.assertEqual(
+            [], [name for name in os.listdir(objects.OBJECTS_DIR) if name.startswith("tmp_")]
+        )
+
+
+class TestPackfiles(GitterTestCase):
+    """Test packing objects into packfiles"""
+
+    def setUp(self):
+        super().setUp()
+        self.run_command("init")
+        self.run_command("add .")
+        self.run_command("commit -m 'First commit'")
+
+    def test_repack_removes_loose_objects(self):
+        """Test that repack moves every loose object into a single pack"""
+        from utils import iter_loose_objects, load_packs
+
+        loose = list(iter_loose_objects())
+        result = self.run_command("repack")
+
+        self.assertIn(f"Packed {len(loose)} objects", result.stdout)
+        self.assertEqual([], list(iter_loose_objects()))
+        packs = load_packs(refresh=True)
+        self.assertEqual(1, len(packs))
+        self.assertEqual(sorted(loose), list(packs[0].hashes()))
+
+    def test_commands_read_packed_objects(self):
+        """Test that status, diff and log work from packed objects"""
+        self.run_command("repack")
+        with open("test_file1.txt", "w") as f:
+            f.write("Changed content")
+
+        diff = self.run_command("diff test_file1.txt")
+        self.assertIn("-Test content 1", diff.stdout)
+        self.assertIn("+Changed content", diff.stdout)
+
+        self.run_command("commit -am 'Second commit'")
+        self.assertIn("Second commit", self.run_command("log").stdout)
+
+    def test_packs_of_another_repository_are_not_used(self):
+        """Test that objects packed in one repository are written again in another"""
+        from utils import find_packed, object_path, write_object
+
+        self.run_command("repack")
+        blob = hashlib.sha1(b"Test content 1").hexdigest()
+        self.assertIsNotNone(find_packed(blob))
+
+        os.mkdir("other")
+        os.chdir("other")
+        self.run_command("init")
+        self.assertEqual(blob, write_object(b"Test content 1"))
+        self.assertTrue(os.path.exists(object_path(blob)))
+
+    def test_damaged_pack_warning_goes_to_stderr(self):
+        """Test that a skipped pack is reported on stderr, not in command output"""
+        from utils.packs import PACK_DIR
+
+        self.run_command("repack")
+        with open("test_file1.txt", "w") as f:
+            f.write("Changed content")
+        for name in os.listdir(PACK_DIR):
+            if name.endswith(".idx"):
+                with open(f"{PACK_DIR}/{name}", "r+b") as f:
+                    f.truncate(10)
+        result = self.run_command("diff")
+        self.assertIn("Warning: ignoring pack", result.stderr)
+        self.assertNotIn("Warning", result.stdout)
+
+    def test_repack_merges_packs(self):
+        """Test that repacking again folds the old pack and new objects into one pack"""
+        from utils import load_packs, read_object
+
+        self.run_command("repack")
+        with open("new_file.txt", "w") as f:
+            f.write("New content")
+        self.run_command("add new_file.txt")
+        self.run_command("commit -m 'Second commit'")
+        self.run_command("repack")
+
+        self.assertEqual(1, len(load_packs(refresh=True)))
+        self.assertEqual(b"Test content 1", read_object(hashlib.sha1(b"Test content 1").hexdigest()))
+        self.assertEqual(b"New content", read_object(hashlib.sha1(b"New content").hexdigest()))
+        self.assertIn("Nothing to pack.", self.run_command("repack").stdout)
+
+    def test_pack_lookup(self):
+        """Test that pack lookups find every object and reject unknown hashes"""
+        from utils import Pack, write_pack
+
+        hashes = [hashlib.sha1(str(i).encode()).hexdigest() for i in range(300)]
+        pack_path = write_pack((h, b"\0" + h.encode()) for h in hashes)
+        pack = Pack(pack_path[: -len(".pack")] + ".idx")
+
+        for h in hashes:
+            kind, base, window = pack.entry(pack.find(h))
+            self.assertEqual(h.encode(), window.read(40))
+        self.assertIsNone(pack.find("0" * 40))
+
+
+class TestCommitGraph(GitterTestCase):
+    """Test the binary commit graph written by repack"""
+
+    def setUp(self):
+        super().setUp()
+        self.run_command("init")
+        self.run_command("add .")
+        for i in range(5):
+            with open("test_file1.txt", "w") as f:
+                f.write(str(i))
+            self.run_command(f"commit -am 'Commit {i}'")
+
+    def test_repack_writes_graph(self):
+        """Test that repack writes a graph holding every commit"""
+        log_before = self.run_command("log").stdout
+        result = self.run_command("repack")
+        self.assertIn("Wrote commit graph of 5 commits", result.stdout)
+        self.assertTrue(os.path.exists(".gitter/commit-graph"))
+        # The same history comes out of the graph walk
+        self.assertEqual(log_before, self.run_command("log").stdout)
+
+    def test_graph_records(self):
+        """Test lookups, prefix matches and records served from the mapping"""
+        from utils import (CommitGraph, lookup_commit, read_commit,
+                           resolve_head, write_commit_graph)
+
+        self.assertEqual(5, write_commit_graph())
+        graph = CommitGraph()
+        head = resolve_head()
+        position = graph.find(head)
+        record = graph.record(position)
+        commit = read_commit(head)
+        self.assertEqual(commit["message"], record["message"])
+        self.assertEqual(commit["timestamp"], record["timestamp"])
+        self.assertEqual(commit["tree"], record["tree"])
+        self.assertEqual(commit["parent"], record["parent"])
+        self.assertEqual(commit["parent"], graph.hash(graph.parent(position)))
+        self.assertEqual([head], graph.match_prefix(head[:7]))
+        self.assertIsNone(graph.find("0" * 40))
+        self.assertEqual(record, lookup_commit(head))
+
+    def test_ancestry_walk_reads_no_objects(self):
+        """Test that walking commits the graph holds never reads an object"""
+        from utils import commit_graph, resolve_head, write_commit_graph
+
+        write_commit_graph()
+        # One more commit that the graph does not cover yet
+        with open("test_file2.txt", "w") as f:
+            f.write("newer")
+        self.run_command("commit -am 'Newer'")
+
+        read = []
+        original = commit_graph.read_commit
+
+        def counting_read(commit_hash):
+            read.append(commit_hash)
+            return original(commit_hash)
+
+        commit_graph.read_commit = counting_read
+        try:
+            messages = [record["message"] for record in commit_graph.iter_ancestry(resolve_head())]
+        finally:
+            commit_graph.read_commit = original
+        self.assertEqual(["Newer"] + [f"Commit {i}" for i in range(4, -1, -1)], messages)
+        self.assertEqual([resolve_head()], read)
+
+    def test_abbreviated_hashes_through_graph(self):
+        """Test that abbreviated hashes and ~N resolve with the graph"""
+        self.run_command("repack")
+        from utils import read_commit, resolve_head, resolve_revision
+
+        head = resolve_head()
+        self.assertEqual(head, resolve_revision(head[:7]))
+        self.assertEqual(read_commit(head)["parent"], resolve_revision(head[:7] + "~1"))
+        result = self.run_command("log -n 1 --name-status")
+        self.assertIn("M\ttest_file1.txt", result.stdout)
+
+    def test_damaged_graph_ignored(self):
+        """Test that a damaged graph is ignored in favour of the objects"""
+        log_before = self.run_command("log").stdout
+        self.run_command("repack")
+        with open(".gitter/commit-graph", "r+b") as f:
+            f.truncate(100)
+        result = self.run_command("log")
+        self.assertEqual(1, result.stderr.count("Warning: ignoring commit graph"))
+        self.assertNotIn("Warning", result.stdout)
+        self.assertIn("Commit 4", result.stdout)
+        self.assertIn(log_before, result.stdout)
+
+
+    def test_corrupt_parent_position_ignored(self):
+        """Test that a parent position outside the graph is not followed"""
+        log_before = self.run_command("log").stdout
+        self.run_command("repack")
+        from utils import commit_graph
+
+        graph = commit_graph.CommitGraph()
+        offset = graph._records
+        graph._data.close()
+        with open(".gitter/commit-graph", "r+b") as f:
+            f.seek(offset)
+            f.write(b"\x7f\xff\xff\xff")
+        result = self.run_command("log")
+        self.assertEqual(0, result.returncode)
+        self.assertEqual(1, result.stderr.count("bad parent position"))
+        self.assertIn(log_before, result.stdout)
+
+    def test_repack_verifies_graph_checksum(self):
+        """Test that a graph failing its checksum is rebuilt from the commit objects"""
+        self.run_command("repack")
+        with open(".gitter/commit-graph", "rb") as f:
+            data = bytearray(f.read())
+        # Damage the newest message, which a header check cannot notice
+        position = data.rindex(b"Commit 4")
+        data[position : position + 8] = b"Commit X"
+        with open(".gitter/commit-graph", "wb") as f:
+            f.write(data)
+        self.assertIn("Commit X", self.run_command("log -n 1").stdout)
+
+        result = self.run_command("repack")
+        self.assertIn("bad checksum", result.stderr)
+        self.assertIn("Commit 4", self.run_command("log -n 1").stdout)
+
+class TestDeltaCompression(GitterTestCase):
+    """Test delta compression between file versions in packs"""
+
+    def setUp(self):
+        super().setUp()
+        self.run_command("init")
+        self.versions = []
+        lines = [f"setting_{i} = {i}\n" for i in range(200)]
+        for version in range(4):
+            lines[version * 10] = f"setting_{version * 10} = changed\n"
+            content = "".join(lines)
+            with open("config.py", "w") as f:
+                f.write(content)
+            self.versions.append(content.encode())
+            self.run_command("add config.py")
+            self.run_command(f"commit -m 'Version {version}'")
+
+    def test_delta_round_trip(self):
+        """Test that applying a delta rebuilds the target"""
+        from utils import apply_delta, create_delta
+
+        base, target = self.versions[0], self.versions[3]
+        delta = create_delta(base, target)
+        self.assertLess(len(delta), len(target) // 4)
+        self.assertEqual(target, apply_delta(base, delta))
+        self.assertEqual(b"", apply_delta(base, create_delta(base, b"")))
+
+    def test_older_versions_stored_as_deltas(self):
+        """Test that repack stores older versions as deltas against newer ones"""
+        from utils import load_packs, path_history, read_committed_file
+        from utils.packs import ENTRY_DELTA, ENTRY_FULL
+
+        self.run_command("repack")
+        pack = load_packs(refresh=True)[0]
+        history = path_history()["config.py"]
+        self.assertEqual(4, len(history))
+
+        kinds = [pack.entry(pack.find(h))[:2] for h in history]
+        self.assertEqual((ENTRY_FULL, None), kinds[0])
+        for (kind, base), newer in zip(kinds[1:], history):
+            self.assertEqual((ENTRY_DELTA, newer), (kind, base))
+
+        for blob, content in zip(history, reversed(self.versions)):
+            self.assertEqual(content.decode().splitlines(True), read_committed_file(blob))
+
+    def test_depth_limits_chains(self):
+        """Test that --depth cuts delta chains"""
+        from utils import load_packs, path_history
+        from utils.packs import ENTRY_FULL
+
+        self.run_command("repack --depth 1")
+        pack = load_packs(refresh=True)[0]
+        kinds = [pack.entry(pack.find(h))[0] for h in path_history()["config.py"]]
+        self.assertEqual(ENTRY_FULL, kinds[0])
+        self.assertEqual(ENTRY_FULL, kinds[2])
+        self.assertNotEqual(ENTRY_FULL, kinds[1])
+
+    def test_delta_base_cache_reuses_bases(self):
+        """Test that reading a chain again applies its delta to the cached base"""
+        from utils import load_packs, objects, path_history, read_object
+        from utils.packs import DeltaBaseCache
+
+        self.run_command("repack")
+        load_packs(refresh=True)
+        oldest = path_history()["config.py"][-1]
+
+        with mock.patch.object(objects, "delta_base_cache", DeltaBaseCache()), \
+                mock.patch.object(objects, "_read_packed", wraps=objects._read_packed) as read_packed:
+            self.assertEqual(self.versions[0], read_object(oldest))
+            self.assertEqual(4, read_packed.call_count)
+            read_packed.reset_mock()
+            self.assertEqual(self.versions[0], read_object(oldest))
+            self.assertEqual(1, read_packed.call_count)
+
+
+class TestDiffEngine(unittest.TestCase):
+    """Test the Myers, patience and histogram diff algorithms"""
+
+    def test_blocks_match_across_algorithms(self):
+        """Test that all algorithms return valid, ordered matching blocks"""
+        import random
+
+        from utils import ALGORITHMS, diff_blocks
+
+        rng = random.Random(7)
+        for _ in range(200):
+            a = [rng.choice("abcdef") for _ in range(rng.randint(0, 30))]
+            b = [rng.choice("abcdef") for _ in range(rng.randint(0, 30))]
+            for algorithm in ALGORITHMS:
+                blocks = diff_blocks(a, b, algorithm)
+                self.assertEqual((len(a), len(b), 0), blocks[-1])
+                position = (0, 0)
+                for i, j, n in blocks:
+                    self.assertEqual(a[i : i + n], b[j : j + n])
+                    self.assertGreaterEqual((i, j), position)
+                    position = (i + n, j + n)
+
+    def test_myers_is_minimal(self):
+        """Test that Myers finds a longest common subsequence"""
+        import difflib
+
+        from utils import diff_blocks
+
+        a = list("abcabba" * 20)
+        b = list("cbabac" * 20)
+        matched = sum(n for _, _, n in diff_blocks(a, b, "myers"))
+        reference = difflib.SequenceMatcher(None, a, b, autojunk=False)
+        self.assertGreaterEqual(matched, sum(n for _, _, n in reference.get_matching_blocks()))
+
+    def test_unified_hunks_match_git_format(self):
+        """Test hunk headers, context and the missing-newline marker"""
+        import difflib
+
+        from utils import unified_diff
+
+        old = [f"line {i}\n" for i in range(40)]
+        new = list(old)
+        new[2] = "changed\n"
+        del new[30]
+        expected = [line.rstrip("\n") for line in difflib.unified_diff(old, new, "a/f", "b/f")]
+        for algorithm in ("myers", "patience", "histogram"):
+            self.assertEqual(expected, list(unified_diff(old, new, "a/f", "b/f", algorithm=algorithm)))
+
+        self.assertEqual(
+            ["--- a/f", "+++ b/f", "@@ -1 +1 @@", "-x", "\\ No newline at end of file", "+x"],
+            list(unified_diff(["x"], ["x\n"], "a/f", "b/f")),
+        )
+        self.assertEqual([], list(unified_diff(old, old, "a/f", "b/f")))
+
+    def test_patience_anchors_on_unique_lines(self):
+        """Test that patience diff aligns functions on their unique lines"""
+        from utils import diff_blocks
+
+        a = ["def a():\n", "    return 1\n", "\n", "def b():\n", "    return 2\n"]
+        b = ["def b():\n", "    return 2\n", "\n", "def a():\n", "    return 1\n"]
+        blocks = diff_blocks(a, b, "patience")
+        self.assertIn((3, 0, 2), blocks)
+
+
+class TestDiffCache(GitterTestCase):
+    """Test line interning and the on-disk diff cache"""
+
+    def setUp(self):
+        super().setUp()
+        self.run_command("init")
+        self.run_command("add test_file1.txt")
+        self.run_command("commit -m 'Initial commit'")
+        with open("test_file1.txt", "w") as f:
+            f.write("Modified content")
+
+    def cache_entries(self):
+        return [name for name in os.listdir(".gitter/diff-cache") if not name.startswith("tmp_")]
+
+    def cache_path(self, old_hash):
+        from utils import diff_cache
+
+        return diff_cache._entry_path(old_hash, "new", "myers")
+
+    def test_repeated_diff_uses_cache(self):
+        """Test that a pair diffed before is served from the cache"""
+        first = self.run_command("diff")
+        entries = self.cache_entries()
+        self.assertEqual(1, len(entries))
+
+        # Doctor the cached hunks to prove they are what gets printed
+        with open(f".gitter/diff-cache/{entries[0]}", "w") as f:
+            f.write("@@ -1 +1 @@\n-cached\n+hunk\n")
+        second = self.run_command("diff")
+        self.assertIn("+Modified content", first.stdout)
+        self.assertIn("+hunk", second.stdout)
+
+    def test_options_are_part_of_the_key(self):
+        """Test that different diff options get their own cache entries"""
+        self.run_command("diff")
+        self.run_command("diff -w")
+        self.run_command("diff --histogram")
+        self.assertEqual(3, len(self.cache_entries()))
+
+    def test_cache_can_be_disabled(self):
+        """Test that GITTER_DIFF_CACHE_SIZE=0 turns the cache off"""
+        with mock.patch.dict(os.environ, {"GITTER_DIFF_CACHE_SIZE": "0"}):
+            self.run_command("diff")
+        self.assertFalse(os.path.exists(".gitter/diff-cache"))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        """Test that the cache stays under its size cap, dropping the oldest entries"""
+        from utils import read_cached_diff, write_cached_diff
+
+        hunks = ["@@ -1 +1 @@", "-" + "x" * 100, "+" + "y" * 100]
+        with mock.patch.dict(os.environ, {"GITTER_DIFF_CACHE_SIZE": "700"}):
+            for i in range(3):
+                write_cached_diff(f"old{i}", "new", "myers", hunks)
+                # Distinct mtimes even on coarse-grained filesystems
+                os.utime(self.cache_path(f"old{i}"), ns=(i * 10**9, i * 10**9))
+            self.assertIsNotNone(read_cached_diff("old0", "new", "myers"))
+            write_cached_diff("old3", "new", "myers", hunks)
+
+            self.assertEqual(hunks, read_cached_diff("old0", "new", "myers"))
+            self.assertIsNone(read_cached_diff("old1", "new", "myers"))
+            self.assertEqual(hunks, read_cached_diff("old3", "new", "myers"))
+
+    def test_writes_under_the_cap_do_not_list_the_cache(self):
+        """Test that the cache directory is only counted again near the cap"""
+        from utils import diff_cache, write_cached_diff
+
+        hunks = ["@@ -1 +1 @@", "-old", "+new"]
+        with mock.patch.object(diff_cache, "_evict", wraps=diff_cache._evict) as evict:
+            for i in range(50):
+                write_cached_diff(f"old{i}", "new", "myers", hunks)
+        self.assertEqual(1, evict.call_count)
+        self.assertEqual(50, len(self.cache_entries()))
+
+    def test_file_changed_after_hashing_is_not_cached(self):
+        """Test that hunks are only cached under the hash of the bytes diffed"""
+        import hashlib
+
+        from utils import FileDiffer, hash_file
+
+        old_hash = hashlib.sha1(b"Test content 1").hexdigest()
+        hunks = FileDiffer().hunks("test_file1.txt", old_hash, "0" * 40)
+        self.assertIn("+Modified content", hunks)
+        self.assertFalse(os.path.exists(".gitter/diff-cache"))
+
+        FileDiffer().hunks("test_file1.txt", old_hash, hash_file("test_file1.txt"))
+        self.assertEqual(1, len(self.cache_entries()))
+
+    def test_line_interner(self):
+        """Test that equal lines get equal ids across interned lists"""
+        from utils import LineInterner
+
+        interner = LineInterner()
+        self.assertEqual([0, 1, 0], interner.intern(["a\n", "b\n", "a\n"]))
+        self.assertEqual([1, 2], interner.intern(["b\n", "c\n"]))
+
+
+class TestParallelDiff(GitterTestCase):
+    """Test multi-file diffs computed by a process pool"""
+
+    def test_output_in_path_order(self):
+        """Test that diffs from worker processes are printed in path order"""
+        self.run_command("init")
+        names = [f"file{i:02d}.txt" for i in range(20)]
+        for name in names:
+            with open(name, "w") as f:
+                f.write(f"{name} original\n")
+        self.run_command("add .")
+        self.run_command("commit -m 'Initial commit'")
+        for name in names:
+            with open(name, "w") as f:
+                f.write(f"{name} changed\n")
+
+        result = self.run_command("diff -j 4")
+        headers = [line for line in result.stdout.splitlines() if line.startswith("diff --git")]
+        self.assertEqual([f"diff --git a/{name} b/{name}" for name in names], headers)
+        for name in names:
+            self.assertIn(f"+{name} changed", result.stdout)
+        self.assertEqual(result.stdout, self.run_command("diff -j 1").stdout)
+
+    def test_reorder_buffer(self):
+        """Test that results come out in order with a bounded number in flight"""
+        from concurrent.futures import Future
+
+        from utils import ordered_results
+
+        submitted = []
+
+        def futures():
+            for i in range(10):
+                future = Future()
+                future.set_result(i)
+                submitted.append(i)
+                yield future
+
+        consumed = []
+        for result in ordered_results(futures(), window=3):
+            # Never more than the window submitted ahead of what was consumed
+            self.assertLessEqual(len(submitted) - len(consumed), 3)
+            consumed.append(result)
+        self.assertEqual(list(range(10)), consumed)
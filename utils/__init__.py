@@ -1,3 +1,74 @@
-from .file_operations import (get_files, hash_file, read_committed_file,
-                              read_file_content, should_ignore,
-                              write_committed_file)
+# The public names of each submodule. Submodules are imported when one of
+# their names is first used, so a command only loads the parts it needs
+_EXPORTS = {
+    "commit_graph": (
+        "CommitGraph", "iter_ancestry", "load_commit_graph", "lookup_commit",
+        "write_commit_graph",
+    ),
+    "delta": ("apply_delta", "create_delta"),
+    "diff": (
+        "ALGORITHMS", "DEFAULT_ALGORITHM", "LineInterner", "diff_blocks", "diff_hunks",
+        "iter_hunks", "unified_diff",
+    ),
+    "diff_cache": ("read_cached_diff", "write_cached_diff"),
+    "file_cache": ("enable_file_cache", "load_cached"),
+    "file_diff": ("FileDiffer", "diff_files", "ordered_results"),
+    "file_operations": (
+        "hash_file", "iter_file_chunks", "normalize_path", "read_file_content",
+        "should_ignore", "write_committed_file",
+    ),
+    "fsmonitor": (
+        "FSMONITOR_SOCKET", "FsMonitor", "query_fsmonitor", "stop_fsmonitor",
+        "walk_working_tree",
+    ),
+    "hashing": ("hash_files", "parse_jobs", "resolve_jobs"),
+    "history": (
+        "append_commit", "commit_tree", "iter_commits_reversed", "load_head_files",
+        "read_last_commit",
+    ),
+    "ignore": ("DEFAULT_IGNORE_PATTERNS", "IgnoreMatcher", "compile_ignore"),
+    "index": (
+        "INDEX_FILE", "LEGACY_INDEX_FILE", "cached_hash", "cached_hashes", "entry_hash",
+        "file_mtime_ns", "lock_index", "make_entry", "read_index", "read_stat_cache",
+        "smudge_racy_entries", "stat_matches", "write_index", "write_stat_cache",
+    ),
+    "index_file": ("Index", "IndexFile"),
+    "ipc": ("connect", "exchange", "listen", "read_message", "send_request", "write_message"),
+    "lockfile": ("LockError", "LockFile", "append_lines", "write_file_atomic"),
+    "objects": (
+        "find_objects_by_prefix", "hash_and_store_file", "iter_loose_objects",
+        "object_exists", "object_path", "object_type", "open_object", "read_commit",
+        "read_committed_file", "read_object", "write_commit", "write_object",
+    ),
+    "packs": ("Pack", "find_packed", "load_packs", "write_pack"),
+    "pager": ("open_pager", "pager_command"),
+    "path_index": ("path_commits", "record_commit_paths", "update_path_index"),
+    "refs": ("head_path", "resolve_head", "update_head"),
+    "repack": ("DEFAULT_DEPTH", "path_history", "repack"),
+    "revisions": ("MIN_ABBREV", "resolve_revision"),
+    "trees": (
+        "build_tree", "diff_trees", "flatten_tree", "read_tree", "update_tree",
+        "write_tree_object",
+    ),
+    "walk": ("get_files", "walk_files"),
+}
+_MODULES = {name: module for module, names in _EXPORTS.items() for name in names}
+__all__ = sorted(_MODULES)
+
+
+def __getattr__(name):
+    module_name = _MODULES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # __import__ rather than importlib.import_module, so -X importtime reports it
+    module = __import__(f"{__name__}.{module_name}", fromlist=[name])
+    # Bind every name of the module at once; this also puts repack() back
+    # in place of the utils.repack submodule the import just bound
+    for export in _EXPORTS[module_name]:
+        globals()[export] = getattr(module, export)
+    return globals()[name]
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_MODULES))
+
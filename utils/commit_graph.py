@@ -0,0 +1,292 @@
+import hashlib
+import mmap
+import os
+import struct
+import sys
+
+from .history import commit_tree
+from .lockfile import write_file_atomic
+from .objects import read_commit
+from .packs import HASH_SIZE, match_sorted_prefix
+from .refs import resolve_head
+
+COMMIT_GRAPH_FILE = ".gitter/commit-graph"
+REFS_DIR = ".gitter/refs/heads"
+
+GRAPH_MAGIC = b"GCGR"
+GRAPH_VERSION = 1
+
+# Parent position of root commits
+NO_PARENT = 0xFFFFFFFF
+
+# Layout: magic, version and commit count, 256 cumulative counts by first
+# hash byte, the sorted binary hashes, one fixed-width record per hash
+# (parent position, tree hash, timestamp, message offset and length), the
+# messages, then a checksum of everything before it
+_HEADER = struct.Struct(">4sII")
+_FANOUT = struct.Struct(">256I")
+_RECORD = struct.Struct(">I20s20sQI")
+
+
+class CommitGraph:
+    """
+    Commit metadata in a memory-mapped, sorted table. Finding a commit is a
+    binary search within its fan-out range and walking ancestry follows
+    parent positions, so neither reads an object or parses JSON.
+    """
+
+    def __init__(self, path=COMMIT_GRAPH_FILE):
+        self.path = path
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            self.signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.count = _HEADER.unpack_from(self._data, 0)
+        if magic != GRAPH_MAGIC or version != GRAPH_VERSION:
+            raise ValueError(f"unsupported commit graph {path}")
+        self._fanout = _FANOUT.unpack_from(self._data, _HEADER.size)
+        if self._fanout[255] != self.count:
+            raise ValueError(f"corrupt commit graph {path}")
+        self._names = _HEADER.size + _FANOUT.size
+        self._records = self._names + self.count * HASH_SIZE
+        self._messages = self._records + self.count * _RECORD.size
+        if len(self._data) < self._messages + HASH_SIZE:
+            raise ValueError(f"truncated commit graph {path}")
+
+    def verify(self):
+        """
+        Checks the trailing checksum, raising ValueError on a mismatch. It
+        reads the whole file, so loading only checks the header and sizes.
+        """
+        body = len(self._data) - HASH_SIZE
+        if hashlib.sha1(self._data[:body]).digest() != self._data[body:]:
+            raise ValueError(f"corrupt commit graph {self.path} (bad checksum)")
+
+    def __len__(self):
+        return self.count
+
+    def _name(self, position):
+        start = self._names + position * HASH_SIZE
+        return self._data[start : start + HASH_SIZE]
+
+    def find(self, commit_hash):
+        """Returns the position of a commit, or None if the graph does not hold it."""
+        try:
+            key = bytes.fromhex(commit_hash)
+        except ValueError:
+            return None
+        if len(key) != HASH_SIZE:
+            return None
+        lo = self._fanout[key[0] - 1] if key[0] else 0
+        hi = self._fanout[key[0]]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            name = self._name(mid)
+            if name < key:
+                lo = mid + 1
+            elif name > key:
+                hi = mid
+            else:
+                return mid
+        return None
+
+    def match_prefix(self, prefix):
+        """Returns the commit hashes that start with a hex prefix, in sorted order."""
+        return match_sorted_prefix(self._name, self._fanout, prefix.lower())
+
+    def hash(self, position):
+        return self._name(position).hex()
+
+    def _check_parent(self, parent):
+        if parent == NO_PARENT:
+            return None
+        if parent >= self.count:
+            raise ValueError(f"corrupt commit graph {self.path} (bad parent position)")
+        return parent
+
+    def parent(self, position):
+        """Returns the position of a commit's parent, or None for a root commit."""
+        parent = struct.unpack_from(">I", self._data, self._records + position * _RECORD.size)[0]
+        return self._check_parent(parent)
+
+    def record(self, position):
+        """Returns the metadata of the commit at position in the shape commit objects have."""
+        parent, tree, timestamp, offset, length = _RECORD.unpack_from(
+            self._data, self._records + position * _RECORD.size
+        )
+        parent = self._check_parent(parent)
+        start = self._messages + offset
+        return {
+            "hash": self.hash(position),
+            "parent": None if parent is None else self.hash(parent),
+            "message": self._data[start : start + length].decode("utf-8"),
+            "timestamp": timestamp.rstrip(b"\0").decode("ascii"),
+            "tree": tree.hex(),
+        }
+
+
+_graph = None
+_graph_root = None
+# (root, signature) of the last graph file that failed to load, so that a
+# damaged graph is only warned about once until it is rewritten
+_graph_failure = None
+
+
+def load_commit_graph():
+    """
+    Returns the repository's commit graph, or None when there is none or it
+    is damaged. The mapping is kept for the rest of the process and
+    replaced when the file is rewritten.
+    """
+    global _graph, _graph_root, _graph_failure
+    root = os.getcwd()
+    try:
+        st = os.stat(COMMIT_GRAPH_FILE)
+    except OSError:
+        _graph = None
+        return None
+    signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+    if _graph is not None and _graph_root == root and _graph.signature == signature:
+        return _graph
+    if _graph_failure == (root, signature):
+        return None
+    try:
+        _graph, _graph_root = CommitGraph(), root
+    except (OSError, ValueError, struct.error) as e:
+        _ignore_graph(root, signature, e)
+    return _graph
+
+
+def _ignore_graph(root, signature, error):
+    """Stops using the graph file with signature, warning about it once."""
+    global _graph, _graph_failure
+    print(f"Warning: ignoring commit graph: {str(error)}", file=sys.stderr)
+    _graph = None
+    _graph_failure = (root, signature)
+
+
+def lookup_commit(commit_hash):
+    """
+    Returns {hash, parent, message, timestamp, tree} for a commit, from the
+    commit graph when it covers the commit and from the commit object
+    otherwise, or None if the commit does not exist.
+    """
+    graph = load_commit_graph()
+    if graph is not None:
+        position = graph.find(commit_hash)
+        if position is not None:
+            try:
+                return graph.record(position)
+            except (ValueError, struct.error) as e:
+                _ignore_graph(_graph_root, graph.signature, e)
+    commit = read_commit(commit_hash)
+    if commit is None:
+        return None
+    return {
+        "hash": commit_hash,
+        "parent": commit.get("parent"),
+        "message": commit.get("message", ""),
+        "timestamp": commit.get("timestamp", ""),
+        "tree": commit_tree(commit),
+    }
+
+
+def iter_ancestry(commit_hash):
+    """
+    Yields commit records from commit_hash back through its parents. Commits
+    made since the graph was written are read from their objects until the
+    walk reaches one the graph holds; from there it only follows positions.
+    """
+    graph = load_commit_graph()
+    while commit_hash is not None:
+        position = graph.find(commit_hash) if graph is not None else None
+        if position is not None:
+            try:
+                while position is not None:
+                    commit_hash = graph.hash(position)
+                    record = graph.record(position)
+                    position = graph.parent(position)
+                    yield record
+                return
+            except (ValueError, struct.error) as e:
+                # A damaged record: carry on from the commit objects
+                _ignore_graph(_graph_root, graph.signature, e)
+                graph = None
+                continue
+        record = lookup_commit(commit_hash)
+        if record is None:
+            return
+        yield record
+        commit_hash = record["parent"]
+
+
+def _ref_tips():
+    tips = []
+    head = resolve_head()
+    if head:
+        tips.append(head)
+    for directory, _, names in os.walk(REFS_DIR):
+        for name in sorted(names):
+            if name.endswith((".tmp", ".lock")):
+                continue
+            with open(os.path.join(directory, name), "r") as f:
+                commit_hash = f.read().strip()
+            if commit_hash:
+                tips.append(commit_hash)
+    return tips
+
+
+def write_commit_graph():
+    """
+    Writes a commit graph covering every commit reachable from HEAD and the
+    branches and returns the number of commits in it. Commits the current
+    graph already holds are copied from it rather than read again, once its
+    checksum has been verified. The file
+    is written through its lock file and renamed into place.
+    """
+    graph = load_commit_graph()
+    if graph is not None:
+        # Records copied from a damaged graph would outlive it
+        try:
+            graph.verify()
+        except ValueError as e:
+            _ignore_graph(_graph_root, graph.signature, e)
+    records = {}
+    for tip in _ref_tips():
+        for record in iter_ancestry(tip):
+            if record["hash"] in records:
+                break
+            records[record["hash"]] = record
+    if not records:
+        return 0
+
+    names = sorted(records)
+    positions = {commit_hash: position for position, commit_hash in enumerate(names)}
+    fanout = [0] * 256
+    for commit_hash in names:
+        fanout[int(commit_hash[:2], 16)] += 1
+    for i in range(1, 256):
+        fanout[i] += fanout[i - 1]
+
+    data = bytearray(_HEADER.pack(GRAPH_MAGIC, GRAPH_VERSION, len(names)))
+    data += _FANOUT.pack(*fanout)
+    for commit_hash in names:
+        data += bytes.fromhex(commit_hash)
+    messages = bytearray()
+    for commit_hash in names:
+        record = records[commit_hash]
+        message = record["message"].encode("utf-8")
+        data += _RECORD.pack(
+            positions.get(record["parent"], NO_PARENT),
+            bytes.fromhex(record["tree"]),
+            record["timestamp"].encode("ascii")[:20],
+            len(messages),
+            len(message),
+        )
+        messages += message
+    data += messages
+    data += hashlib.sha1(data).digest()
+
+    write_file_atomic(COMMIT_GRAPH_FILE, data)
+    return len(names)
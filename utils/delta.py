@@ -0,0 +1,174 @@
+# Binary deltas between object versions, in the copy/insert format git uses:
+# the base and target sizes as varints, then a list of instructions that
+# either copy a range of the base or insert literal bytes.
+
+# Copies shorter than this cost more to encode than inserting the bytes
+MIN_COPY = 8
+# Largest copy one instruction can describe (three size bytes)
+MAX_COPY = 0xFFFFFF
+# Largest literal run one insert instruction can carry
+MAX_INSERT = 0x7F
+# Base offsets tried per matching line; repeated lines would be quadratic
+MAX_CANDIDATES = 16
+# Size of the slices compared when extending a match
+COMPARE_BLOCK = 4096
+
+
+def encode_varint(value, out):
+    """Appends value to the bytearray out as a little-endian base-128 varint."""
+    if value < 0x80:
+        out.append(value)
+        return
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(data, position):
+    """Reads a varint written by encode_varint; returns (value, next position)."""
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, position
+
+
+def _split_lines(data):
+    """Yields (start, line) for each newline-terminated line of data."""
+    start = 0
+    length = len(data)
+    while start < length:
+        end = data.find(b"\n", start)
+        end = length if end < 0 else end + 1
+        yield start, data[start:end]
+        start = end
+
+
+def _match_length(base, base_start, target, target_start):
+    """Returns how many bytes base and target have in common from the given offsets."""
+    limit = min(len(base) - base_start, len(target) - target_start)
+    length = 0
+    # Compare whole blocks first, then narrow the mismatching block down
+    while length < limit:
+        size = min(COMPARE_BLOCK, limit - length)
+        if (
+            base[base_start + length : base_start + length + size]
+            == target[target_start + length : target_start + length + size]
+        ):
+            length += size
+            continue
+        lo, hi = 0, size
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if (
+                base[base_start + length : base_start + length + mid]
+                == target[target_start + length : target_start + length + mid]
+            ):
+                lo = mid
+            else:
+                hi = mid - 1
+        return length + lo
+    return length
+
+
+def _emit_copy(out, offset, size):
+    while size:
+        chunk = min(size, MAX_COPY)
+        op = 0x80
+        args = bytearray()
+        for i in range(4):
+            byte = (offset >> (8 * i)) & 0xFF
+            if byte:
+                op |= 1 << i
+                args.append(byte)
+        for i in range(3):
+            byte = (chunk >> (8 * i)) & 0xFF
+            if byte:
+                op |= 1 << (4 + i)
+                args.append(byte)
+        out.append(op)
+        out += args
+        offset += chunk
+        size -= chunk
+
+
+def _emit_insert(out, data):
+    for start in range(0, len(data), MAX_INSERT):
+        chunk = data[start : start + MAX_INSERT]
+        out.append(len(chunk))
+        out += chunk
+
+
+def create_delta(base, target):
+    """
+    Returns a delta that rebuilds target from base. Matches are found line by
+    line: each target line is looked up among the base lines and the longest
+    match starting there is copied, which suits the mostly-text objects
+    gitter stores while still working on arbitrary bytes.
+    """
+    lines = {}
+    for start, line in _split_lines(base):
+        candidates = lines.setdefault(line, [])
+        if len(candidates) < MAX_CANDIDATES:
+            candidates.append(start)
+
+    out = bytearray()
+    encode_varint(len(base), out)
+    encode_varint(len(target), out)
+    insert_start = position = 0
+    length = len(target)
+    while position < length:
+        end = target.find(b"\n", position)
+        end = length if end < 0 else end + 1
+        best_offset, best_length = None, 0
+        for offset in lines.get(target[position:end], ()):
+            match = _match_length(base, offset, target, position)
+            if match > best_length:
+                best_offset, best_length = offset, match
+        if best_length >= MIN_COPY:
+            _emit_insert(out, target[insert_start:position])
+            _emit_copy(out, best_offset, best_length)
+            position += best_length
+            insert_start = position
+        else:
+            position = end
+    _emit_insert(out, target[insert_start:])
+    return bytes(out)
+
+
+def apply_delta(base, delta):
+    """Rebuilds the target of a delta from its base."""
+    base_size, position = decode_varint(delta, 0)
+    target_size, position = decode_varint(delta, position)
+    if base_size != len(base):
+        raise ValueError("delta does not apply to this base")
+
+    out = bytearray()
+    length = len(delta)
+    while position < length:
+        op = delta[position]
+        position += 1
+        if op & 0x80:
+            offset = size = 0
+            for i in range(4):
+                if op & (1 << i):
+                    offset |= delta[position] << (8 * i)
+                    position += 1
+            for i in range(3):
+                if op & (1 << (4 + i)):
+                    size |= delta[position] << (8 * i)
+                    position += 1
+            out += base[offset : offset + size]
+        elif op:
+            out += delta[position : position + op]
+            position += op
+        else:
+            raise ValueError("invalid delta instruction")
+
+    if len(out) != target_size:
+        raise ValueError("delta produced the wrong size")
+    return bytes(out)
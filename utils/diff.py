@@ -0,0 +1,411 @@
+from bisect import bisect_left
+
+DEFAULT_ALGORITHM = "myers"
+
+# Lines of unchanged context shown around each change
+DEFAULT_CONTEXT = 3
+
+# Lines occurring more often than this in the old side are never used as
+# histogram anchors; like git, fall back to Myers when nothing better exists
+MAX_HISTOGRAM_CHAIN = 64
+
+NO_NEWLINE_MARKER = "\\ No newline at end of file"
+
+
+def _trim(a, alo, ahi, b, blo, bhi, blocks):
+    """
+    Records the common prefix and suffix of a range as matches and returns
+    the bounds of what is left in between.
+    """
+    start = alo
+    while alo < ahi and blo < bhi and a[alo] == b[blo]:
+        alo += 1
+        blo += 1
+    if alo > start:
+        blocks.append((start, blo - (alo - start), alo - start))
+    end = ahi
+    while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+        ahi -= 1
+        bhi -= 1
+    if ahi < end:
+        blocks.append((ahi, bhi, end - ahi))
+    return alo, ahi, blo, bhi
+
+
+def _middle_snake(a, alo, ahi, b, blo, bhi):
+    """
+    Finds the middle snake of the shortest edit script between two ranges by
+    running Myers' search from both ends at once until the paths overlap.
+    Returns the snake as (x, y, u, v): a diagonal run of matches from (x, y)
+    to (u, v). Only two arrays of O(N + M) entries are used.
+    """
+    n = ahi - alo
+    m = bhi - blo
+    delta = n - m
+    odd = delta & 1
+    max_d = (n + m + 1) // 2
+    offset = max_d + 1
+    forward = [0] * (2 * offset + 1)
+    backward = [0] * (2 * offset + 1)
+
+    for d in range(max_d + 1):
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and forward[offset + k - 1] < forward[offset + k + 1]):
+                x = forward[offset + k + 1]
+            else:
+                x = forward[offset + k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            forward[offset + k] = x
+            # The backward search has done one step less on this diagonal
+            if odd and -(d - 1) <= delta - k <= d - 1:
+                if x + backward[offset + delta - k] >= n:
+                    return alo + x0, blo + y0, alo + x, blo + y
+
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and backward[offset + k - 1] < backward[offset + k + 1]):
+                x = backward[offset + k + 1]
+            else:
+                x = backward[offset + k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a[ahi - 1 - x] == b[bhi - 1 - y]:
+                x += 1
+                y += 1
+            backward[offset + k] = x
+            if not odd and -d <= delta - k <= d:
+                if x + forward[offset + delta - k] >= n:
+                    return ahi - x, bhi - y, ahi - x0, bhi - y0
+
+    raise AssertionError("no middle snake found")
+
+
+def _myers(a, alo, ahi, b, blo, bhi, blocks):
+    """
+    Linear-space Myers diff: the middle snake splits a range in two and both
+    halves are solved the same way, using a stack instead of recursion. Runs
+    in O((N + M) D) time for D differences and O(N + M) space.
+    """
+    stack = [(alo, ahi, blo, bhi)]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+        alo, ahi, blo, bhi = _trim(a, alo, ahi, b, blo, bhi, blocks)
+        if alo == ahi or blo == bhi:
+            continue
+        x, y, u, v = _middle_snake(a, alo, ahi, b, blo, bhi)
+        if u > x:
+            blocks.append((x, y, u - x))
+        stack.append((u, ahi, v, bhi))
+        stack.append((alo, x, blo, y))
+
+
+def _unique_anchors(a, alo, ahi, b, blo, bhi):
+    """
+    Returns the (i, j) positions of lines that occur exactly once on both
+    sides, reduced to their longest increasing subsequence so that they can
+    all be matched without crossing.
+    """
+    counts = {}
+    for i in range(alo, ahi):
+        entry = counts.get(a[i])
+        if entry is None:
+            counts[a[i]] = [1, i, 0, 0]
+        else:
+            entry[0] += 1
+    for j in range(blo, bhi):
+        entry = counts.get(b[j])
+        if entry is not None:
+            entry[2] += 1
+            entry[3] = j
+    pairs = sorted(
+        (i, j) for a_count, i, b_count, j in counts.values() if a_count == b_count == 1
+    )
+
+    # Patience sorting: the top of each pile, and a link to the previous pile
+    tops = []
+    top_pairs = []
+    links = {}
+    for pair in pairs:
+        pile = bisect_left(tops, pair[1])
+        links[pair] = top_pairs[pile - 1] if pile else None
+        if pile == len(tops):
+            tops.append(pair[1])
+            top_pairs.append(pair)
+        else:
+            tops[pile] = pair[1]
+            top_pairs[pile] = pair
+    anchors = []
+    pair = top_pairs[-1] if top_pairs else None
+    while pair is not None:
+        anchors.append(pair)
+        pair = links[pair]
+    anchors.reverse()
+    return anchors
+
+
+def _patience(a, alo, ahi, b, blo, bhi, blocks):
+    """
+    Patience diff: lines unique to both sides anchor the match and the gaps
+    between anchors are diffed the same way, falling back to Myers for gaps
+    without unique lines.
+    """
+    stack = [(alo, ahi, blo, bhi)]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+        alo, ahi, blo, bhi = _trim(a, alo, ahi, b, blo, bhi, blocks)
+        if alo == ahi or blo == bhi:
+            continue
+        anchors = _unique_anchors(a, alo, ahi, b, blo, bhi)
+        if not anchors:
+            _myers(a, alo, ahi, b, blo, bhi, blocks)
+            continue
+        for i, j in anchors:
+            stack.append((alo, i, blo, j))
+            blocks.append((i, j, 1))
+            alo, blo = i + 1, j + 1
+        stack.append((alo, ahi, blo, bhi))
+
+
+def _histogram(a, alo, ahi, b, blo, bhi, blocks):
+    """
+    Histogram diff: the longest common run around the line that occurs least
+    often on the old side is matched and both sides of it are diffed the same
+    way. Lines repeated more than MAX_HISTOGRAM_CHAIN times are never
+    anchors; ranges without any other anchor fall back to Myers.
+    """
+    stack = [(alo, ahi, blo, bhi)]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+        alo, ahi, blo, bhi = _trim(a, alo, ahi, b, blo, bhi, blocks)
+        if alo == ahi or blo == bhi:
+            continue
+        positions = {}
+        for i in range(alo, ahi):
+            positions.setdefault(a[i], []).append(i)
+
+        best = None
+        j = blo
+        while j < bhi:
+            occurrences = positions.get(b[j])
+            if occurrences is None or len(occurrences) > MAX_HISTOGRAM_CHAIN:
+                j += 1
+                continue
+            next_j = j + 1
+            for i in occurrences:
+                start_i, start_j = i, j
+                while start_i > alo and start_j > blo and a[start_i - 1] == b[start_j - 1]:
+                    start_i -= 1
+                    start_j -= 1
+                end_i, end_j = i + 1, j + 1
+                while end_i < ahi and end_j < bhi and a[end_i] == b[end_j]:
+                    end_i += 1
+                    end_j += 1
+                key = (len(occurrences), start_i - end_i)
+                if best is None or key < best[0]:
+                    best = (key, start_i, start_j, end_i - start_i)
+                next_j = max(next_j, end_j)
+            # Lines inside a run just found cannot anchor a better one
+            j = next_j
+
+        if best is None:
+            _myers(a, alo, ahi, b, blo, bhi, blocks)
+            continue
+        _, i, j, length = best
+        blocks.append((i, j, length))
+        stack.append((i + length, ahi, j + length, bhi))
+        stack.append((alo, i, blo, j))
+
+
+ALGORITHMS = {
+    "myers": _myers,
+    "minimal": _myers,
+    "patience": _patience,
+    "histogram": _histogram,
+}
+
+
+def _discard_unmatched(a, b):
+    """
+    Drops the items that occur on only one side, which can never be part of
+    a match, and returns the remaining items with their original positions.
+    Edited and inserted lines are usually unique, so this shrinks both the
+    inputs and the number of differences the algorithms have to search.
+    """
+    in_a = set(a)
+    in_b = set(b)
+    a_positions = [i for i, item in enumerate(a) if item in in_b]
+    b_positions = [j for j, item in enumerate(b) if item in in_a]
+    return (
+        [a[i] for i in a_positions],
+        a_positions,
+        [b[j] for j in b_positions],
+        b_positions,
+    )
+
+
+def _restore_positions(blocks, a_positions, b_positions):
+    """Maps blocks found on the reduced inputs back, splitting them where items were dropped."""
+    for i, j, n in blocks:
+        start = 0
+        for k in range(1, n):
+            if (
+                a_positions[i + k] != a_positions[i + k - 1] + 1
+                or b_positions[j + k] != b_positions[j + k - 1] + 1
+            ):
+                yield a_positions[i + start], b_positions[j + start], k - start
+                start = k
+        if n:
+            yield a_positions[i + start], b_positions[j + start], n - start
+
+
+def diff_blocks(a, b, algorithm=DEFAULT_ALGORITHM):
+    """
+    Returns the matching blocks (i, j, n) of two sequences of hashable items,
+    meaning a[i:i + n] == b[j:j + n], in order and ending with the sentinel
+    (len(a), len(b), 0), like difflib's get_matching_blocks().
+    """
+    try:
+        solve = ALGORITHMS[algorithm]
+    except KeyError:
+        raise ValueError(f"unknown diff algorithm '{algorithm}'")
+    reduced_a, a_positions, reduced_b, b_positions = _discard_unmatched(a, b)
+    blocks = []
+    solve(reduced_a, 0, len(reduced_a), reduced_b, 0, len(reduced_b), blocks)
+    blocks = sorted(_restore_positions(blocks, a_positions, b_positions))
+    merged = []
+    for i, j, n in blocks:
+        if merged and merged[-1][0] + merged[-1][2] == i and merged[-1][1] + merged[-1][2] == j:
+            merged[-1] = (merged[-1][0], merged[-1][1], merged[-1][2] + n)
+        else:
+            merged.append((i, j, n))
+    merged.append((len(a), len(b), 0))
+    return merged
+
+
+def _opcodes(blocks):
+    """Turns matching blocks into ('equal' | 'change', i1, i2, j1, j2) ranges."""
+    i = j = 0
+    for block_i, block_j, size in blocks:
+        if i < block_i or j < block_j:
+            yield "change", i, block_i, j, block_j
+        if size:
+            yield "equal", block_i, block_i + size, block_j, block_j + size
+        i, j = block_i + size, block_j + size
+
+
+def iter_hunks(blocks, context=DEFAULT_CONTEXT):
+    """
+    Groups the ranges between matching blocks into hunks, each a list of
+    opcodes with at most context unchanged lines around its changes. Changes
+    separated by no more than twice the context share a hunk.
+    """
+    codes = list(_opcodes(blocks))
+    if not any(tag == "change" for tag, *_ in codes):
+        return
+    if codes[0][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - context), i2, max(j1, j2 - context), j2
+    if codes[-1][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)
+
+    group = []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == "equal" and i2 - i1 > 2 * context and group:
+            group.append((tag, i1, i1 + context, j1, j1 + context))
+            yield group
+            group = []
+            i1, j1 = i2 - context, j2 - context
+        group.append((tag, i1, i2, j1, j2))
+    if any(tag == "change" for tag, *_ in group):
+        yield group
+
+
+def _format_range(start, length):
+    """Formats a hunk range the way git does ('3', '3,4' or '2,0')."""
+    if length == 1:
+        return f"{start + 1}"
+    if not length:
+        return f"{start},0"
+    return f"{start + 1},{length}"
+
+
+def _render(prefix, lines, start, end):
+    """Yields lines[start:end] with prefix, marking a missing final newline."""
+    for line in lines[start:end]:
+        yield prefix + line.rstrip("\n")
+    # Only the last line of a file can lack its newline; a line ending in
+    # something else, such as a lone '\r', is not the end of the file
+    if end == len(lines) and end > start and not lines[-1].endswith("\n"):
+        yield NO_NEWLINE_MARKER
+
+
+class LineInterner:
+    """
+    Assigns each distinct line a small integer id, so the diff algorithms
+    hash and compare ints instead of full strings. Ids are only comparable
+    between lists interned by the same interner.
+    """
+
+    def __init__(self):
+        self._ids = {}
+
+    def intern(self, lines):
+        ids = self._ids
+        return [ids.setdefault(line, len(ids)) for line in lines]
+
+
+def diff_hunks(
+    old_lines,
+    new_lines,
+    context=DEFAULT_CONTEXT,
+    algorithm=DEFAULT_ALGORITHM,
+    old_keys=None,
+    new_keys=None,
+):
+    """
+    Yields the hunks of a git-style unified diff between two lists of lines
+    that keep their line endings: '@@' headers and the prefixed lines, with
+    the endings removed. When old_keys and new_keys are given they are
+    compared in place of the lines, for example to ignore whitespace, while
+    the original lines are still shown. Otherwise the lines are interned.
+    """
+    if old_keys is None or new_keys is None:
+        interner = LineInterner()
+        old_keys = interner.intern(old_lines)
+        new_keys = interner.intern(new_lines)
+    blocks = diff_blocks(old_keys, new_keys, algorithm)
+    for group in iter_hunks(blocks, context):
+        first, last = group[0], group[-1]
+        old_range = _format_range(first[1], last[2] - first[1])
+        new_range = _format_range(first[3], last[4] - first[3])
+        yield f"@@ -{old_range} +{new_range} @@"
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                yield from _render(" ", old_lines, i1, i2)
+                continue
+            yield from _render("-", old_lines, i1, i2)
+            yield from _render("+", new_lines, j1, j2)
+
+
+def unified_diff(
+    old_lines,
+    new_lines,
+    fromfile,
+    tofile,
+    context=DEFAULT_CONTEXT,
+    algorithm=DEFAULT_ALGORITHM,
+    old_keys=None,
+    new_keys=None,
+):
+    """Yields the '---'/'+++' file headers followed by the hunks from diff_hunks, if any."""
+    started = False
+    for line in diff_hunks(old_lines, new_lines, context, algorithm, old_keys, new_keys):
+        if not started:
+            yield f"--- {fromfile}"
+            yield f"+++ {tofile}"
+            started = True
+        yield line
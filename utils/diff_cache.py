@@ -0,0 +1,104 @@
+import hashlib
+import os
+import tempfile
+
+DIFF_CACHE_DIR = ".gitter/diff-cache"
+
+# Bytes the cache may hold before the least recently used entries are
+# evicted, overridable with GITTER_DIFF_CACHE_SIZE (0 disables the cache)
+DEFAULT_DIFF_CACHE_SIZE = 64 << 20
+
+# Bumped whenever the rendering of cached hunks changes
+CACHE_FORMAT = 2
+
+# Bytes in each cache directory as last counted by this process, kept up
+# to date by its own writes so the directory is only listed again when the
+# count passes the cap
+_totals = {}
+
+
+def diff_cache_size():
+    """Returns the cache size cap in bytes from GITTER_DIFF_CACHE_SIZE."""
+    value = os.environ.get("GITTER_DIFF_CACHE_SIZE")
+    if not value:
+        return DEFAULT_DIFF_CACHE_SIZE
+    if not value.isdigit():
+        raise ValueError(f"invalid diff cache size '{value}'")
+    return int(value)
+
+
+def _entry_path(old_hash, new_hash, options):
+    key = f"{CACHE_FORMAT}\0{old_hash}\0{new_hash}\0{options}".encode("utf-8")
+    return f"{DIFF_CACHE_DIR}/{hashlib.sha1(key).hexdigest()}"
+
+
+def read_cached_diff(old_hash, new_hash, options):
+    """
+    Returns the cached hunk lines for a pair of blob hashes diffed with the
+    given options, or None on a miss. A hit marks the entry as recently used.
+    """
+    if not diff_cache_size():
+        return None
+    path = _entry_path(old_hash, new_hash, options)
+    try:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            data = f.read()
+        os.utime(path)
+    except (FileNotFoundError, UnicodeDecodeError):
+        return None
+    return data.split("\n")[:-1]
+
+
+def write_cached_diff(old_hash, new_hash, options, hunks):
+    """Stores the hunk lines for a pair of blob hashes and evicts old entries over the cap."""
+    limit = diff_cache_size()
+    if not limit:
+        return
+    data = "".join(line + "\n" for line in hunks).encode("utf-8")
+    if len(data) > limit:
+        return
+    os.makedirs(DIFF_CACHE_DIR, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=DIFF_CACHE_DIR, prefix="tmp_")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, _entry_path(old_hash, new_hash, options))
+    key = os.path.abspath(DIFF_CACHE_DIR)
+    total = _totals.get(key)
+    if total is None or total + len(data) > limit:
+        # Other processes write to the cache too, so count it again
+        _totals[key] = _evict(limit)
+    else:
+        _totals[key] = total + len(data)
+
+
+def _evict(limit):
+    """
+    Removes the least recently used entries when the cache is over limit
+    bytes, down to three quarters of it so that the next eviction is many
+    writes away. Returns the bytes left in the cache.
+    """
+    entries = []
+    total = 0
+    with os.scandir(DIFF_CACHE_DIR) as it:
+        for entry in it:
+            if entry.name.startswith("tmp_"):
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, entry.path))
+            total += st.st_size
+    if total <= limit:
+        return total
+    target = limit - limit // 4
+    entries.sort()
+    for _, size, path in entries:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # Evicted by a concurrent run
+        total -= size
+        if total <= target:
+            break
+    return total
@@ -0,0 +1,39 @@
+import os
+
+_enabled = False
+_entries = {}
+
+
+def enable_file_cache(enabled=True):
+    """
+    Turns on keeping loaded repository files in memory. Only long-running
+    processes such as the daemon benefit; a single command reads each file
+    once anyway.
+    """
+    global _enabled
+    _enabled = enabled
+    _entries.clear()
+
+
+def load_cached(path, loader, copy=None):
+    """
+    Returns loader(path). While the cache is enabled the result is kept and
+    handed out again until the file's mtime, size or inode changes; every
+    writer replaces repository files by renaming a new file over them, so a
+    rewrite always shows. Results that callers modify are passed through
+    copy before they are returned.
+    """
+    if not _enabled:
+        return loader(path)
+    key = os.path.abspath(path)
+    try:
+        st = os.stat(path)
+    except OSError:
+        _entries.pop(key, None)
+        return loader(path)
+    # Stat before loading so a concurrent rewrite can only cause a reload
+    signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+    cached = _entries.get(key)
+    if cached is None or cached[0] != signature:
+        cached = _entries[key] = (signature, loader(path))
+    return cached[1] if copy is None else copy(cached[1])
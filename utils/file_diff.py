@@ -0,0 +1,173 @@
+import hashlib
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .diff import DEFAULT_ALGORITHM, LineInterner, diff_blocks, diff_hunks
+from .diff_cache import read_cached_diff, write_cached_diff
+from .file_operations import read_file_content
+from .hashing import PARALLEL_THRESHOLD, resolve_jobs
+from .objects import read_committed_file
+
+# Diffs each worker may compute ahead of the one being printed
+REORDER_WINDOW_PER_JOB = 4
+
+
+class FileDiffer:
+    """
+    Computes the hunks between committed blobs and working files, or between
+    two committed blobs when working_tree is False, with one set of options.
+    Lines are interned by a single interner, and each blob is read and
+    normalized once however many diffs it takes part in.
+    """
+
+    def __init__(
+        self, algorithm=DEFAULT_ALGORITHM, ignore_whitespace=False, working_tree=True
+    ):
+        self.algorithm = algorithm
+        self.ignore_whitespace = ignore_whitespace
+        self.working_tree = working_tree
+        # Everything that changes the hunks for a pair of blobs keys the diff cache
+        self.options = f"{algorithm}:w={int(ignore_whitespace)}"
+        self.interner = LineInterner()
+        self.blobs = {}
+
+    def _lines_and_keys(self, lines):
+        if self.ignore_whitespace:
+            # Only the keys are normalized; every line is still shown and numbered
+            return lines, self.interner.intern(" ".join(line.split()) for line in lines)
+        return lines, self.interner.intern(lines)
+
+    def blob_lines(self, blob_hash, load):
+        """
+        Returns the lines of a blob and the interned keys they are compared
+        by, loading the blob with load() the first time it is seen.
+        """
+        if blob_hash is None:
+            return [], []
+        cached = self.blobs.get(blob_hash)
+        if cached is None:
+            cached = self.blobs[blob_hash] = self._lines_and_keys(load())
+        return cached
+
+    def _new_lines(self, file_path, new_hash):
+        """
+        Returns the lines and keys of the new side and the hash of their
+        content. A working file may have changed since new_hash was taken,
+        so it is hashed as it is read and kept under the hash it really has.
+        """
+        if not self.working_tree or new_hash is None or new_hash in self.blobs:
+            lines, keys = self.blob_lines(new_hash, lambda: read_committed_file(new_hash))
+            return lines, keys, new_hash
+        hasher = hashlib.sha1()
+        lines, keys = self._lines_and_keys(read_file_content(file_path, hasher))
+        read_hash = hasher.hexdigest()
+        self.blobs.setdefault(read_hash, (lines, keys))
+        return lines, keys, read_hash
+
+    def hunks(self, file_path, old_hash, new_hash):
+        """
+        Returns the hunks between the blob old_hash and the version of
+        file_path that hashes to new_hash, with None for a side where the
+        file does not exist. Pairs diffed before with the same options come
+        from the diff cache without either side being read.
+        """
+        hunks = read_cached_diff(old_hash, new_hash, self.options)
+        if hunks is None:
+            old_lines, old_keys = self.blob_lines(
+                old_hash, lambda: read_committed_file(old_hash)
+            )
+            new_lines, new_keys, read_hash = self._new_lines(file_path, new_hash)
+            hunks = list(
+                diff_hunks(
+                    old_lines,
+                    new_lines,
+                    algorithm=self.algorithm,
+                    old_keys=old_keys,
+                    new_keys=new_keys,
+                )
+            )
+            # Hunks for a file that changed after it was hashed belong to no key
+            if read_hash == new_hash:
+                write_cached_diff(old_hash, new_hash, self.options, hunks)
+        return hunks
+
+    def line_counts(self, file_path, old_hash, new_hash):
+        """
+        Returns (insertions, deletions) between the two versions hunks()
+        would compare, counted from the matching blocks without rendering
+        any hunk text.
+        """
+        _, old_keys = self.blob_lines(old_hash, lambda: read_committed_file(old_hash))
+        _, new_keys, _ = self._new_lines(file_path, new_hash)
+        matched = sum(size for _, _, size in diff_blocks(old_keys, new_keys, self.algorithm))
+        return len(new_keys) - matched, len(old_keys) - matched
+
+
+_worker_differ = None
+
+
+def _init_worker(root, *options):
+    global _worker_differ
+    os.chdir(root)
+    _worker_differ = FileDiffer(*options)
+
+
+def _diff_in_worker(method, file_path, old_hash, new_hash):
+    return getattr(_worker_differ, method)(file_path, old_hash, new_hash)
+
+
+def ordered_results(futures, window):
+    """
+    Yields the results of an iterable of futures in their original order,
+    through a reorder buffer of at most window futures: results finished
+    early wait in the buffer until everything before them was yielded, and
+    no more work is submitted while the buffer is full.
+    """
+    pending = deque()
+    for future in futures:
+        pending.append(future)
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def diff_files(
+    changes,
+    algorithm=DEFAULT_ALGORITHM,
+    ignore_whitespace=False,
+    jobs=None,
+    stat=False,
+    working_tree=True,
+):
+    """
+    Yields (change, hunks) for (file_path, old_hash, new_hash) changes in the
+    order given, or (change, (insertions, deletions)) with stat. New versions
+    are read from the working tree, or from the object store when
+    working_tree is False. With several
+    jobs and enough files the diffs are computed by a pool of worker
+    processes, and each result is yielded as soon as it and all earlier ones
+    are done, so output starts with the first file.
+    """
+    changes = list(changes)
+    method = "line_counts" if stat else "hunks"
+    jobs = resolve_jobs(jobs)
+    if jobs <= 1 or len(changes) < PARALLEL_THRESHOLD:
+        differ = FileDiffer(algorithm, ignore_whitespace, working_tree)
+        for change in changes:
+            yield change, getattr(differ, method)(*change)
+        return
+
+    pool = ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_init_worker,
+        initargs=(os.getcwd(), algorithm, ignore_whitespace, working_tree),
+    )
+    try:
+        futures = (pool.submit(_diff_in_worker, method, *change) for change in changes)
+        results = ordered_results(futures, jobs * REORDER_WINDOW_PER_JOB)
+        yield from zip(changes, results)
+    finally:
+        # A consumer that stops early drops the work not yet started
+        pool.shutdown(cancel_futures=True)
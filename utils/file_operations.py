@@ -1,79 +1,94 @@
-import fnmatch
-import glob
 import hashlib
+import io
 import os
+import threading
 
+from .ignore import compile_ignore
 
-def get_files(paths, ignore_patterns=None):
+# Size of the reusable buffer files are streamed through when hashing
+CHUNK_SIZE = 1 << 20
+
+_buffers = threading.local()
+
+# Stands in for the lines of files that are not valid UTF-8 text
+BINARY_PLACEHOLDER = ["[BINARY FILE - CANNOT DISPLAY CONTENT]\n"]
+
+
+def normalize_path(path):
+    """Returns the repository-relative form of a path ('./a//b' -> 'a/b')."""
+    return os.path.normpath(path).replace(os.sep, "/")
+
+
+def iter_file_chunks(f):
     """
-    Get valid files from a list of paths, filtering out ignored files.
+    Yields the contents of an open binary file as memoryview chunks of a
+    per-thread buffer that is reused between chunks, so memory stays flat
+    regardless of the file size. Each chunk is only valid until the next one.
     """
-    valid_files = []
-    missing_files = []
-
-    for path in paths:
-        if os.path.isdir(path):
-            # If it's a directory, recursively add all files
-            for root, dirs, files in os.walk(path):
-                # Skip .git and .gitter directories entirely
-                dirs[:] = [d for d in dirs if d != ".git" and d != ".gitter"]
-
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    if not should_ignore(file_path, ignore_patterns):
-                        valid_files.append(file_path)
-        elif os.path.exists(path):
-            # If it's a file, add it if not ignored
-            if not should_ignore(path, ignore_patterns):
-                valid_files.append(path)
-        else:
-            # Handle glob patterns
-            glob_files = glob.glob(path)
-            if glob_files:
-                for file in glob_files:
-                    if os.path.isfile(file) and not should_ignore(
-                        file, ignore_patterns
-                    ):
-                        valid_files.append(file)
-            else:
-                missing_files.append(path)
-
-    return valid_files, missing_files
+    buffer = getattr(_buffers, "buffer", None)
+    if buffer is None:
+        buffer = _buffers.buffer = memoryview(bytearray(CHUNK_SIZE))
+    while True:
+        size = f.readinto(buffer)
+        if not size:
+            break
+        yield buffer[:size]
 
 
 def hash_file(path):
     """Returns the SHA-1 hash of the given file."""
     try:
         hasher = hashlib.sha1()
-        with open(path, "rb") as f:
-            hasher.update(f.read())
+        # Unbuffered, so readinto() fills our buffer without an extra copy
+        with open(path, "rb", buffering=0) as f:
+            for chunk in iter_file_chunks(f):
+                hasher.update(chunk)
         return hasher.hexdigest()
     except Exception as e:
         print(f"Error processing file {path}: {str(e)}")
         return None
 
 
-def read_file_content(file_path):
-    """Reads the content of a file and returns it as a list of lines. Handles both text and binary files."""
-    try:
-        with open(file_path, "rb") as f:
-            content = f.read()
-            try:
-                return content.decode("utf-8").splitlines(True)  # Try decoding as UTF-8
-            except UnicodeDecodeError:
-                return ["[BINARY FILE - CANNOT DISPLAY CONTENT]\n"]  # Mark as binary
-    except FileNotFoundError:
-        return []
+class _HashingReader(io.RawIOBase):
+    """Passes reads through from a raw file, feeding every byte read to a hasher."""
+
+    def __init__(self, f, hasher):
+        self._f = f
+        self._hasher = hasher
+
+    def readable(self):
+        return True
 
+    def readinto(self, buffer):
+        size = self._f.readinto(buffer)
+        if size:
+            self._hasher.update(memoryview(buffer)[:size])
+        return size
 
-def read_committed_file(file_hash):
-    """Reads the committed version of a file from the .gitter/objects directory using its hash."""
-    object_path = f".gitter/objects/{file_hash[:2]}/{file_hash[2:]}"
 
-    if os.path.exists(object_path):
-        with open(object_path, "r", encoding="utf-8", errors="ignore") as f:
-            return f.readlines()  # Return as list of lines for diff processing
-    return []
+def read_file_content(file_path, hasher=None):
+    """
+    Reads the content of a file and returns it as a list of lines. Handles
+    both text and binary files. With a hasher, every byte read is fed to it,
+    so the caller learns which version of the file the lines came from.
+    """
+    try:
+        with open(file_path, "rb", buffering=0) as raw:
+            reader = raw if hasher is None else _HashingReader(raw, hasher)
+            # Decode incrementally instead of holding the raw bytes, the
+            # decoded string and the split lines in memory at the same time
+            with io.TextIOWrapper(
+                io.BufferedReader(reader), encoding="utf-8", newline="\n"
+            ) as f:
+                try:
+                    return list(f)
+                except UnicodeDecodeError:
+                    if hasher is not None:
+                        for chunk in iter_file_chunks(raw):
+                            hasher.update(chunk)
+                    return list(BINARY_PLACEHOLDER)  # Mark as binary
+    except FileNotFoundError:
+        return []
 
 
 def write_committed_file(file_path, content):
@@ -91,49 +106,10 @@ def write_committed_file(file_path, content):
             f.write(content)  # Handle raw binary data
 
 
-import fnmatch
-
-
 def should_ignore(file_path, ignore_patterns=None):
     """
-    Check if a file should be ignored based on the provided patterns.
+    Check if a file should be ignored based on the provided patterns or
+    compiled IgnoreMatcher.
     """
-    # First, handle .git and .gitter directories explicitly
-    normalized_path = os.path.normpath(file_path)
-
-    # Exact directory match or subdirectory
-    if normalized_path == ".git" or normalized_path == ".gitter":
-        return True
-
-    # Check if path contains .git or .gitter as a directory component
-    path_parts = normalized_path.split(os.sep)
-    if ".git" in path_parts or ".gitter" in path_parts:
-        return True
-
-    # Default ignore patterns
-    default_patterns = [
-        "*.pyc",
-        "*.pyo",
-        "*.pyd",
-        "__pycache__/*",
-        "__pycache__",
-        "*.so",
-        "*.o",
-        "*.a",
-        "*.dll",
-        ".git/*",
-        ".git/**",
-        ".git",
-        ".gitter/*",
-        ".gitter/**",
-        ".gitter",
-    ]
-
-    patterns = ignore_patterns or default_patterns
-
-    # Check specific patterns
-    for pattern in patterns:
-        if fnmatch.fnmatch(normalized_path, pattern):
-            return True
-
-    return False
+    matcher = compile_ignore(ignore_patterns)
+    return matcher.is_ignored(normalize_path(file_path))
@@ -0,0 +1,378 @@
+import ctypes
+import ctypes.util
+import errno
+import json
+import os
+import select
+import stat
+import struct
+import sys
+import uuid
+from collections import namedtuple
+
+from .ignore import ALWAYS_IGNORED, compile_ignore
+from .ipc import listen, read_message, send_request, write_message
+from .lockfile import write_file_atomic
+from .walk import walk_files
+
+FSMONITOR_SOCKET = ".gitter/fsmonitor.sock"
+FSMONITOR_STATE = ".gitter/fsmonitor-state.json"
+
+# Seconds a client waits for the monitor before walking the tree itself
+QUERY_TIMEOUT = 1.0
+# Seconds between checks that the repository still exists
+IDLE_CHECK_INTERVAL = 5.0
+# Distinct changed paths remembered before older tokens are declared stale
+MAX_TRACKED_PATHS = 100000
+
+# inotify(7) constants
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+    | IN_ONLYDIR | IN_DONT_FOLLOW
+)
+
+# struct inotify_event: wd, mask, cookie and name length, then the name
+_EVENT = struct.Struct("iIII")
+_READ_SIZE = 64 * 1024
+
+# The stat fields the index uses, as kept in the snapshot
+CachedStat = namedtuple("CachedStat", "st_size st_mtime_ns st_ctime_ns st_ino st_mode")
+
+
+class Inotify:
+    """Thin ctypes wrapper around the Linux inotify calls."""
+
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, f"inotify_init1: {os.strerror(error)}")
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, f"inotify_add_watch {path}: {os.strerror(error)}")
+        return wd
+
+    def rm_watch(self, wd):
+        self._rm_watch(self.fd, wd)
+
+    def read_events(self):
+        """Yields (wd, mask, name) for every queued event without blocking."""
+        while True:
+            try:
+                data = os.read(self.fd, _READ_SIZE)
+            except BlockingIOError:
+                return
+            position = 0
+            while position < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, position)
+                position += _EVENT.size
+                name = data[position : position + length].rstrip(b"\0")
+                position += length
+                yield wd, mask, os.fsdecode(name)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FsMonitor:
+    """
+    Watches every directory of the working tree and remembers which paths
+    changed. Each change gets a sequence number; a token names this process
+    and a sequence number, and asking with it returns the paths changed
+    since. Tokens from another process, or from before events were lost,
+    are stale and answered with None so the caller walks the whole tree.
+    """
+
+    def __init__(self):
+        self.inotify = Inotify()
+        self.instance = uuid.uuid4().hex
+        self.watches = {}  # wd -> directory path, "" for the root
+        self.paths = {}  # directory path -> wd
+        self.changes = {}  # path -> sequence number of its last change
+        self.seq = 0
+        self.oldest = 0
+        self.running = True
+        self.watch_tree("")
+
+    def watch_tree(self, path):
+        """Watches a directory and every directory below it."""
+        try:
+            wd = self.inotify.add_watch(path or ".")
+        except OSError as e:
+            # Vanished already, or out of watches: the events for it are lost
+            if e.errno == errno.ENOSPC:
+                self.reset()
+            return
+        self.watches[wd] = path
+        self.paths[path] = wd
+        try:
+            entries = list(os.scandir(path or "."))
+        except OSError:
+            return
+        for entry in entries:
+            if entry.name in ALWAYS_IGNORED:
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    self.watch_tree(f"{path}/{entry.name}" if path else entry.name)
+            except OSError:
+                continue
+
+    def unwatch_tree(self, path):
+        """Drops the watches of a directory moved or removed from the tree."""
+        prefix = path + "/"
+        for directory in [p for p in self.paths if p == path or p.startswith(prefix)]:
+            wd = self.paths.pop(directory)
+            self.watches.pop(wd, None)
+            self.inotify.rm_watch(wd)
+
+    def reset(self):
+        """Forgets all changes; every token handed out so far becomes stale."""
+        self.changes.clear()
+        self.seq += 1
+        self.oldest = self.seq
+
+    def record(self, path):
+        self.seq += 1
+        self.changes[path] = self.seq
+        if len(self.changes) > MAX_TRACKED_PATHS:
+            self.reset()
+
+    def process_events(self):
+        for wd, mask, name in self.inotify.read_events():
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped, possibly directory creations too
+                self.reset()
+                self.watch_tree("")
+                continue
+            directory = self.watches.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                if self.paths.get(directory) == wd:
+                    del self.paths[directory]
+                continue
+            if not name:
+                if directory == "" and mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    self.running = False
+                continue
+            if name in ALWAYS_IGNORED:
+                continue
+            path = f"{directory}/{name}" if directory else name
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self.watch_tree(path)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self.unwatch_tree(path)
+            self.record(path)
+
+    def token(self):
+        return f"{self.instance}:{self.seq}"
+
+    def changed_since(self, token):
+        """Returns the sorted paths changed since token, or None if it is stale."""
+        instance, _, seq = (token or "").partition(":")
+        if instance != self.instance or not seq.isdigit() or int(seq) < self.oldest:
+            return None
+        since = int(seq)
+        return sorted(path for path, changed in self.changes.items() if changed > since)
+
+    def handle(self, connection):
+        connection.settimeout(QUERY_TIMEOUT)
+        with connection, connection.makefile("rwb") as stream:
+            try:
+                request = read_message(stream) or {}
+            except ValueError:
+                return
+            # Everything written before the query is already queued
+            self.process_events()
+            if request.get("command") == "stop":
+                self.running = False
+                response = {"stopped": True}
+            else:
+                response = {
+                    "token": self.token(),
+                    "paths": self.changed_since(request.get("token")),
+                }
+            write_message(stream, response)
+
+    def serve(self, socket_path=FSMONITOR_SOCKET):
+        """Answers queries on a unix socket until stopped or the repository goes away."""
+        server = listen(socket_path)
+        try:
+            while self.running:
+                readable, _, _ = select.select(
+                    [self.inotify.fd, server], [], [], IDLE_CHECK_INTERVAL
+                )
+                if self.inotify.fd in readable:
+                    self.process_events()
+                if server in readable:
+                    connection, _ = server.accept()
+                    try:
+                        self.handle(connection)
+                    except OSError:
+                        pass
+                if not os.path.isdir(".gitter"):
+                    break
+        finally:
+            server.close()
+            try:
+                os.remove(socket_path)
+            except OSError:
+                pass
+            self.inotify.close()
+
+
+def _request(message, timeout=QUERY_TIMEOUT):
+    if not os.path.exists(FSMONITOR_SOCKET):
+        return None
+    try:
+        return send_request(FSMONITOR_SOCKET, message, timeout)
+    except (OSError, ValueError):
+        return None
+
+
+def query_fsmonitor(token=None):
+    """
+    Asks the running monitor what changed since token. Returns (new token,
+    sorted changed paths), with None for the paths when the token is stale,
+    or None when no monitor answers.
+    """
+    response = _request({"token": token})
+    if not isinstance(response, dict) or "token" not in response:
+        return None
+    return response["token"], response.get("paths")
+
+
+def stop_fsmonitor():
+    """Asks the running monitor to exit; returns whether one answered."""
+    return _request({"command": "stop"}) is not None
+
+
+def _load_state(patterns):
+    try:
+        with open(FSMONITOR_STATE, "r") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None, None
+    # Files the snapshot left out depend on the ignore rules it was taken with
+    if state.get("ignore") != list(patterns):
+        return None, None
+    return state.get("token"), {
+        path: CachedStat(*fields) for path, fields in state.get("files", {}).items()
+    }
+
+
+def _save_state(token, patterns, records):
+    state = {
+        "token": token,
+        "ignore": list(patterns),
+        "files": {
+            path: [st.st_size, st.st_mtime_ns, st.st_ctime_ns, st.st_ino, st.st_mode]
+            for path, st in records
+        },
+    }
+    try:
+        write_file_atomic(FSMONITOR_STATE, json.dumps(state).encode("utf-8"))
+    except OSError:
+        pass  # Another command is saving a snapshot; the next walk retries
+
+
+def _in_directories(path, directories):
+    """Checks whether any parent directory of path is in directories."""
+    if directories:
+        slash = path.rfind("/")
+        while slash > 0:
+            if path[:slash] in directories:
+                return True
+            slash = path.rfind("/", 0, slash)
+    return False
+
+
+def _path_key(record):
+    # The order walk_files produces: directory by directory, by name
+    return record[0].split("/")
+
+
+def walk_working_tree(ignore_patterns=None):
+    """
+    Yields (relpath, stat) for every non-ignored file in the working tree,
+    in the same order as walk_files(["."]). With a monitor running, only the
+    paths it reports changed since the last walk are looked at; the rest
+    comes from the snapshot that walk saved. Without a monitor, or when its
+    answer cannot be trusted, the whole tree is walked.
+    """
+    matcher = compile_ignore(ignore_patterns)
+    token, snapshot = _load_state(matcher.patterns)
+    answer = query_fsmonitor(token)
+    if answer is None:
+        yield from walk_files(["."], matcher)
+        return
+
+    new_token, changed = answer
+    if changed is None or snapshot is None:
+        records = []
+        for record in walk_files(["."], matcher):
+            records.append(record)
+            yield record
+        _save_state(new_token, matcher.patterns, records)
+        return
+
+    if not changed:
+        yield from sorted(snapshot.items(), key=_path_key)
+        return
+
+    changed = set(changed)
+    # Changed paths that were not files may be directories whose contents
+    # moved or vanished with them
+    directories = changed.difference(snapshot)
+    files = {
+        path: st
+        for path, st in snapshot.items()
+        if path not in changed and not _in_directories(path, directories)
+    }
+    for path in changed:
+        # Walking a changed directory already covers the changes below it
+        if _in_directories(path, directories):
+            continue
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue  # Deleted
+        # Like the full walk, symlinked directories are not followed
+        if stat.S_ISDIR(st.st_mode) and os.path.islink(path):
+            continue
+        files.update(walk_files([path], matcher))
+
+    records = sorted(files.items(), key=_path_key)
+    yield from records
+    _save_state(new_token, matcher.patterns, records)
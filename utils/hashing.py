@@ -0,0 +1,81 @@
+import os
+
+from .file_operations import hash_file
+
+# Below this many files the thread pool costs more than it saves
+PARALLEL_THRESHOLD = 8
+
+
+def resolve_jobs(jobs=None):
+    """
+    Returns the number of hashing threads to use: an explicit --jobs value,
+    then the GITTER_JOBS environment variable, then the CPU count.
+    """
+    if jobs is None:
+        env_jobs = os.environ.get("GITTER_JOBS")
+        if env_jobs:
+            jobs = parse_jobs(env_jobs)
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    return jobs
+
+
+def parse_jobs(value):
+    """Parses a job count, rejecting anything that is not a positive integer."""
+    try:
+        jobs = int(value)
+    except (TypeError, ValueError):
+        jobs = 0
+    if jobs < 1:
+        raise ValueError(f"invalid number of jobs '{value}'")
+    return jobs
+
+
+class HashPool:
+    """
+    Hashes files on worker threads as they are submitted, so hashing can
+    overlap with a directory walk that is still producing paths. hashlib
+    releases the GIL while digesting, so threads scale with the available
+    cores and disk bandwidth. With a single job files are hashed inline.
+    A different hash function, such as one that also stores the file, can
+    be passed as hasher.
+    """
+
+    def __init__(self, jobs=None, hasher=hash_file):
+        self.jobs = resolve_jobs(jobs)
+        self.hasher = hasher
+        self._executor = None
+
+    def submit(self, path):
+        """Schedules path for hashing and returns a future for its hash."""
+        # Most commands that import the index never hash a file, and
+        # concurrent.futures is one of the slowest modules to import
+        from concurrent.futures import Future, ThreadPoolExecutor
+
+        if self.jobs <= 1:
+            future = Future()
+            future.set_result(self.hasher(path))
+            return future
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.jobs)
+        return self._executor.submit(self.hasher, path)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def hash_files(paths, jobs=None):
+    """Hashes files concurrently and returns their hashes in the same order as paths."""
+    paths = list(paths)
+    if len(paths) < PARALLEL_THRESHOLD:
+        jobs = 1
+    with HashPool(jobs) as pool:
+        futures = [pool.submit(path) for path in paths]
+    return [future.result() for future in futures]
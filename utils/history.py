@@ -0,0 +1,177 @@
+import json
+import os
+
+from .file_operations import normalize_path
+from .index import read_stat_cache
+from .lockfile import LockFile, append_lines
+from .objects import read_commit, write_commit
+from .refs import resolve_head, update_head
+from .trees import build_tree, flatten_tree
+
+# Commit metadata (hash, parent, message, timestamp) for log, newest last.
+# The commits themselves, including their files, are objects in the store.
+COMMITS_JOURNAL = ".gitter/commits.jsonl"
+LEGACY_COMMITS_FILE = ".gitter/commits.json"
+
+# Size of the blocks the journal is read backwards in
+READ_BLOCK_SIZE = 64 * 1024
+
+
+def _journal_size():
+    try:
+        return os.path.getsize(COMMITS_JOURNAL)
+    except OSError:
+        return 0
+
+
+def _legacy_commits():
+    """
+    Returns commits recorded before commit objects existed, either in a
+    .gitter/commits.json array or as journal records carrying file maps.
+    """
+    if os.path.exists(LEGACY_COMMITS_FILE):
+        try:
+            with open(LEGACY_COMMITS_FILE, "r") as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            return []
+    if resolve_head() is not None or not _journal_size():
+        return None
+    with open(COMMITS_JOURNAL, "rb") as f:
+        last = next(_parse_records(_reversed_lines(f)), None)
+        if last is None or "files" not in last:
+            return None
+        f.seek(0)
+        return list(_parse_records(f))
+
+
+def migrate_legacy_commits():
+    """
+    Converts history from older layouts into commit objects chained through
+    their parents, with the branch ref pointing at the newest one, once. The
+    journal is rewritten through its lock file and renamed into place before
+    the old commits.json is removed, so an interrupted migration is retried.
+    """
+    if _legacy_commits() is None:
+        return
+
+    with LockFile(COMMITS_JOURNAL) as lock:
+        # Another process may have migrated while we waited for the lock
+        commits = _legacy_commits()
+        if commits is None:
+            return
+        parent = None
+        for commit in commits:
+            # Early versions stored paths as walked, e.g. './a.txt'
+            files = {
+                normalize_path(path): entry for path, entry in commit.get("files", {}).items()
+            }
+            commit_hash = write_commit(
+                {
+                    "parent": parent,
+                    "message": commit["message"],
+                    "timestamp": commit["timestamp"],
+                    "tree": build_tree(files),
+                }
+            )
+            record = {
+                "hash": commit_hash,
+                "parent": parent,
+                "message": commit["message"],
+                "timestamp": commit["timestamp"],
+            }
+            lock.write((json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8"))
+            parent = commit_hash
+        if parent is not None:
+            update_head(parent)
+        lock.commit()
+    if os.path.exists(LEGACY_COMMITS_FILE):
+        os.remove(LEGACY_COMMITS_FILE)
+
+
+def append_commit(commit):
+    """
+    Appends one commit record to the journal without rewriting earlier ones.
+    The journal's lock is held, without being committed, so an append never
+    races a migration that replaces the file.
+    """
+    migrate_legacy_commits()
+    line = (json.dumps(commit, separators=(",", ":")) + "\n").encode("utf-8")
+    with LockFile(COMMITS_JOURNAL):
+        append_lines(COMMITS_JOURNAL, line, sync=True)
+
+
+def _reversed_lines(f):
+    """Yields the complete lines of a binary file from last to first."""
+    f.seek(0, os.SEEK_END)
+    position = f.tell()
+    tail = b""
+    complete = False  # A trailing line without newline is a torn append
+    while position > 0:
+        read_size = min(READ_BLOCK_SIZE, position)
+        position -= read_size
+        f.seek(position)
+        block = f.read(read_size) + tail
+        lines = block.split(b"\n")
+        tail = lines.pop(0)
+        for line in reversed(lines):
+            if complete and line:
+                yield line
+            complete = True
+    if complete and tail:
+        yield tail
+
+
+def _parse_records(lines):
+    """Parses journal lines, skipping blank ones and records torn by an interrupted append."""
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            continue
+
+
+def iter_commits_reversed():
+    """
+    Yields commit records from newest to oldest, reading the journal
+    backwards so only the records actually consumed are read and parsed.
+    """
+    migrate_legacy_commits()
+    if not os.path.exists(COMMITS_JOURNAL):
+        return
+    with open(COMMITS_JOURNAL, "rb") as f:
+        yield from _parse_records(_reversed_lines(f))
+
+
+def read_last_commit():
+    """Returns the newest commit record, or None when there are no commits."""
+    return next(iter_commits_reversed(), None)
+
+
+def commit_tree(commit):
+    """Returns the root tree of a commit, building one for commits that predate trees."""
+    if "tree" in commit:
+        return commit["tree"]
+    return build_tree(commit.get("files", {}))
+
+
+def load_head_files():
+    """
+    Loads the flat {path: entry} file map of the commit HEAD resolves to and
+    the reference mtime for its stat data. The map comes from the stat cache
+    when it describes HEAD; otherwise HEAD's tree is flattened and every file
+    has to be hashed again.
+    """
+    migrate_legacy_commits()
+    commit_hash = resolve_head()
+    if commit_hash is None:
+        return {}, None
+    cached_commit, files, ref_mtime_ns = read_stat_cache()
+    if cached_commit == commit_hash:
+        return files, ref_mtime_ns
+    commit = read_commit(commit_hash)
+    if commit is None:
+        return {}, None
+    return flatten_tree(commit_tree(commit)), None
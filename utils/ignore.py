@@ -0,0 +1,147 @@
+import re
+
+DEFAULT_IGNORE_PATTERNS = [
+    "*.pyc",
+    "*.pyo",
+    "*.pyd",
+    "__pycache__/",
+    "*.so",
+    "*.o",
+    "*.a",
+    "*.dll",
+]
+
+# Repository metadata is never tracked, whatever the ignore files say
+ALWAYS_IGNORED = [".git", ".gitter"]
+
+
+def _translate(pattern):
+    """Translates a gitignore-style glob into a regular expression source."""
+    # A slash anywhere but at the end anchors the pattern to the repository root
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern.startswith("**", i) and (i == 0 or pattern[i - 1] == "/"):
+                end = i + 2
+                if end == n:
+                    out.append(".*")  # 'dir/**' matches everything inside dir
+                    i = end
+                    continue
+                if pattern[end] == "/":
+                    out.append("(?:.*/)?")  # '**/' matches zero or more directories
+                    i = end + 1
+                    continue
+            while i + 1 < n and pattern[i + 1] == "*":
+                i += 1
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1 : end].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+
+    source = "".join(out)
+    return source if anchored else "(?:.*/)?" + source
+
+
+def _parse_rule(pattern):
+    """Parses one ignore line into (regex source, negated, directory only)."""
+    pattern = pattern.strip()
+    if not pattern or pattern.startswith("#"):
+        return None
+    negated = pattern.startswith("!")
+    if negated:
+        pattern = pattern[1:]
+    elif pattern.startswith("\\!"):
+        pattern = pattern[1:]
+    dir_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    if not pattern:
+        return None
+    return _translate(pattern), negated, dir_only
+
+
+def _combine(rules):
+    """
+    Builds a single alternation over the rules. Later rules take precedence,
+    so they come first and the name of the group that matched tells which
+    rule decided and whether it was a negation.
+    """
+    rules = list(reversed(rules))
+    if not rules:
+        return None, ()
+    source = "|".join(f"(?P<r{i}>{rule[0]})" for i, rule in enumerate(rules))
+    return re.compile(source, re.DOTALL), tuple(rule[1] for rule in rules)
+
+
+class IgnoreMatcher:
+    """
+    Compiled form of a list of gitignore-style patterns. Supports '!' negation,
+    directory-only 'dir/' rules, root anchoring and '**'. As with git, the last
+    matching rule wins and nothing inside an ignored directory can be
+    re-included.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = tuple(patterns)
+        rules = [rule for rule in map(_parse_rule, self.patterns) if rule]
+        rules += [_parse_rule(pattern) for pattern in ALWAYS_IGNORED]
+        self._file_regex, self._file_negations = _combine(
+            [rule for rule in rules if not rule[2]]
+        )
+        self._dir_regex, self._dir_negations = _combine(rules)
+
+    def match(self, path, is_dir=False):
+        """Checks the rules against path alone, ignoring its parent directories."""
+        if is_dir:
+            regex, negations = self._dir_regex, self._dir_negations
+        else:
+            regex, negations = self._file_regex, self._file_negations
+        if regex is None:
+            return False
+        match = regex.fullmatch(path)
+        if match is None:
+            return False
+        return not negations[int(match.lastgroup[1:])]
+
+    def is_ignored(self, path, is_dir=False):
+        """Checks whether a normalized path or any of its parent directories is ignored."""
+        if path in (".", ""):
+            return False
+        parts = path.split("/")
+        for i in range(1, len(parts)):
+            if self.match("/".join(parts[:i]), is_dir=True):
+                return True
+        return self.match(path, is_dir)
+
+
+_matchers = {}
+
+
+def compile_ignore(patterns=None):
+    """Returns the compiled matcher for patterns, compiling each list only once."""
+    if isinstance(patterns, IgnoreMatcher):
+        return patterns
+    key = tuple(DEFAULT_IGNORE_PATTERNS if patterns is None else patterns)
+    matcher = _matchers.get(key)
+    if matcher is None:
+        matcher = _matchers[key] = IgnoreMatcher(key)
+    return matcher
@@ -0,0 +1,218 @@
+import json
+import os
+
+from .file_cache import load_cached
+from .file_operations import hash_file, normalize_path
+from .hashing import HashPool
+from .index_file import Index, IndexFile, encode_index
+from .lockfile import LockFile, write_file_atomic
+from .objects import hash_and_store_file
+
+# Staged entries in the binary format of index_file.py
+INDEX_FILE = ".gitter/index"
+# The pretty-printed JSON index of earlier versions, upgraded on first use
+LEGACY_INDEX_FILE = ".gitter/index.json"
+# Stat data for the files of the HEAD commit; trees are content-addressed and
+# cannot carry it, so it lives beside the index like git's
+STAT_CACHE_FILE = ".gitter/stat-cache.json"
+
+
+def make_entry(file_hash, st):
+    """Builds an index entry recording a file's hash together with its stat data."""
+    return {
+        "hash": file_hash,
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "ctime_ns": st.st_ctime_ns,
+        "ino": st.st_ino,
+        "mode": st.st_mode,
+    }
+
+
+def entry_hash(entry):
+    """Returns the content hash of an entry, accepting legacy bare-hash entries."""
+    if isinstance(entry, dict):
+        return entry.get("hash")
+    return entry
+
+
+def file_mtime_ns(path):
+    """Returns the mtime of path in nanoseconds, or None if it does not exist."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def is_racy(entry, ref_mtime_ns):
+    """
+    Checks whether an entry is racily clean: its file was modified in the same
+    timestamp tick as the file holding the entry (ref_mtime_ns) was written, so
+    a later same-size modification could go unnoticed by a stat comparison.
+    """
+    return ref_mtime_ns is None or entry.get("mtime_ns", 0) >= ref_mtime_ns
+
+
+def stat_matches(entry, st, ref_mtime_ns):
+    """Returns True if the entry's stat data matches st and can be trusted."""
+    if not isinstance(entry, dict) or is_racy(entry, ref_mtime_ns):
+        return False
+    return (
+        entry.get("size") == st.st_size
+        and entry.get("mtime_ns") == st.st_mtime_ns
+        and entry.get("ctime_ns") == st.st_ctime_ns
+        and entry.get("ino") == st.st_ino
+        and entry.get("mode") == st.st_mode
+    )
+
+
+def smudge_racy_entries(entries, ref_mtime_ns):
+    """
+    Invalidates the stat data of racily clean entries before they are carried
+    over into a newer file, which would otherwise make them look trustworthy.
+    The hash is kept; a smudged entry simply forces the file to be re-read.
+    """
+    for entry in entries.values():
+        if isinstance(entry, dict) and is_racy(entry, ref_mtime_ns):
+            entry["size"] = -1
+    return entries
+
+
+def cached_hash(path, st, *sources):
+    """
+    Returns the hash of path, reusing the hash recorded in the first of the
+    (entries, ref_mtime_ns) sources whose stat data still matches st, and only
+    reading the file when none does.
+    """
+    for entries, ref_mtime_ns in sources:
+        entry = entries.get(path)
+        if entry is not None and stat_matches(entry, st, ref_mtime_ns):
+            return entry_hash(entry)
+    return hash_file(path)
+
+
+def cached_hashes(files, *sources, jobs=None, store=False):
+    """
+    Returns a {path: hash} dict for (path, stat_result) pairs in their given
+    order. Hashes are reused from the sources as in cached_hash; the other
+    files are handed to the parallel hashing stage as soon as they are seen,
+    so a lazy walk and the hashing overlap. Unreadable files are left out.
+    With store, files that are hashed are also written to the object store
+    in the same read.
+    """
+    hashes = {}
+    hasher = hash_and_store_file if store else hash_file
+    with HashPool(jobs, hasher) as pool:
+        for path, st in files:
+            for entries, ref_mtime_ns in sources:
+                entry = entries.get(path)
+                if entry is not None and stat_matches(entry, st, ref_mtime_ns):
+                    hashes[path] = entry_hash(entry)
+                    break
+            else:
+                hashes[path] = pool.submit(path)
+
+    for path, file_hash in hashes.items():
+        if not isinstance(file_hash, str):
+            hashes[path] = file_hash.result()
+    return {path: file_hash for path, file_hash in hashes.items() if file_hash}
+
+
+def _upgrade_legacy_index(index_file):
+    """Converts a JSON index into the binary format and removes it."""
+    with LockFile(index_file) as lock:
+        # Another process may have converted it while we waited
+        ref_mtime_ns = file_mtime_ns(LEGACY_INDEX_FILE)
+        if ref_mtime_ns is None:
+            return
+        try:
+            with open(LEGACY_INDEX_FILE, "r") as f:
+                entries = json.load(f)
+        except json.JSONDecodeError:
+            entries = {}
+        # Early versions stored paths as walked, e.g. './a.txt'
+        entries = {normalize_path(path): entry for path, entry in entries.items()}
+        # Entries racy against the old file must not look clean against the new one
+        smudge_racy_entries(entries, ref_mtime_ns)
+        lock.write(encode_index(entries))
+        lock.commit()
+        os.remove(LEGACY_INDEX_FILE)
+
+
+def read_index(index_file=INDEX_FILE):
+    """
+    Loads the index as an Index mapping over the memory-mapped file, together
+    with the index file's mtime. Entries are only decoded when looked up. A
+    JSON index left by an earlier version is converted first.
+    """
+    if index_file == INDEX_FILE and os.path.exists(LEGACY_INDEX_FILE):
+        _upgrade_legacy_index(index_file)
+    # Stat before reading so a concurrent rewrite can only make entries look racier
+    ref_mtime_ns = file_mtime_ns(index_file)
+    if ref_mtime_ns is None:
+        return Index(), None
+    # The mapped file is never modified, so a kept one can be shared
+    return Index(load_cached(index_file, IndexFile)), ref_mtime_ns
+
+
+def lock_index(index_file=INDEX_FILE):
+    """
+    Returns a LockFile for the index. Commands that read, change and write
+    the index hold it throughout, so concurrent updates are serialized
+    rather than lost.
+    """
+    return LockFile(index_file)
+
+
+def write_index(index, index_file=INDEX_FILE, lock=None):
+    """
+    Writes the index entries to .gitter/index through its lock, which is
+    committed: fsynced and renamed into place. Without a lock held by the
+    caller, one is taken just for the write.
+    """
+    data = encode_index(dict(index.items()))
+    if lock is None:
+        write_file_atomic(index_file, data)
+    else:
+        lock.write(data)
+        lock.commit()
+
+
+def _load_stat_cache(stat_cache_file):
+    try:
+        with open(stat_cache_file, "r") as f:
+            cache = json.load(f)
+    except json.JSONDecodeError:
+        return None
+    return cache.get("commit"), cache.get("files", {})
+
+
+def _copy_stat_cache(cache):
+    # Entries get smudged in place, so callers get their own
+    if cache is None:
+        return None
+    commit_hash, files = cache
+    return commit_hash, {
+        path: dict(entry) if isinstance(entry, dict) else entry
+        for path, entry in files.items()
+    }
+
+
+def read_stat_cache(stat_cache_file=STAT_CACHE_FILE):
+    """
+    Loads the stat cache as (commit hash, {path: entry}, file mtime). The
+    commit hash says which commit the cached file map describes.
+    """
+    ref_mtime_ns = file_mtime_ns(stat_cache_file)
+    if ref_mtime_ns is None:
+        return None, {}, None
+    cache = load_cached(stat_cache_file, _load_stat_cache, _copy_stat_cache)
+    if cache is None:
+        return None, {}, None
+    return cache[0], cache[1], ref_mtime_ns
+
+
+def write_stat_cache(commit_hash, files, stat_cache_file=STAT_CACHE_FILE):
+    """Records the file entries of commit_hash, replacing the previous cache."""
+    data = json.dumps({"commit": commit_hash, "files": files}, separators=(",", ":"))
+    write_file_atomic(stat_cache_file, data.encode("utf-8"))
@@ -0,0 +1,262 @@
+import hashlib
+import mmap
+import struct
+from collections.abc import MutableMapping
+
+from .delta import decode_varint, encode_varint
+from .packs import HASH_SIZE
+
+INDEX_MAGIC = b"GIND"
+INDEX_VERSION = 1
+
+# Every RESTART_INTERVAL-th path is stored whole; the ones between share a
+# prefix with the path before them and only store the rest
+RESTART_INTERVAL = 16
+
+# Layout: magic, version, entry count and restart interval; the entries in
+# path order, each a varint shared-prefix length, varint suffix length, the
+# suffix, the raw hash and the stat fields; the offsets of the restart
+# entries; the offset of that table; then a sha1 of everything before it
+_HEADER = struct.Struct(">4sIII")
+_ENTRY = struct.Struct(">20sqqqQI")
+_OFFSET = struct.Struct(">Q")
+
+
+def _shared_prefix(a, b):
+    """Returns the length of the common prefix of two byte strings."""
+    lo, hi = 0, min(len(a), len(b))
+    # Slice comparisons run in C, so bisecting beats a byte-by-byte loop
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def encode_index(entries):
+    """Serializes {path: entry} into the binary index format."""
+    paths = sorted(entries)
+    out = bytearray(_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(paths), RESTART_INTERVAL))
+    restarts = []
+    previous = b""
+    for number, path in enumerate(paths):
+        name = path.encode("utf-8")
+        if number % RESTART_INTERVAL == 0:
+            restarts.append(len(out))
+            shared = 0
+        else:
+            shared = _shared_prefix(previous, name)
+        encode_varint(shared, out)
+        encode_varint(len(name) - shared, out)
+        out += name[shared:]
+        previous = name
+
+        entry = entries[path]
+        if isinstance(entry, dict):
+            out += _ENTRY.pack(
+                bytes.fromhex(entry["hash"]),
+                entry.get("size", -1),
+                entry.get("mtime_ns", 0),
+                entry.get("ctime_ns", 0),
+                entry.get("ino", 0),
+                entry.get("mode", 0),
+            )
+        else:
+            # Legacy bare-hash entries carry no stat data; a size of -1
+            # never matches a file, so they are always re-read
+            out += _ENTRY.pack(bytes.fromhex(entry), -1, 0, 0, 0, 0)
+
+    table = len(out)
+    for offset in restarts:
+        out += _OFFSET.pack(offset)
+    out += _OFFSET.pack(table)
+    out += hashlib.sha1(out).digest()
+    return bytes(out)
+
+
+class IndexFile:
+    """
+    A binary index file, memory-mapped. A lookup is a binary search over the
+    restart entries, whose paths are stored whole, followed by a scan of at
+    most RESTART_INTERVAL entries, so only a handful of entries are decoded.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        data = self._data
+        if len(data) < _HEADER.size + _OFFSET.size + HASH_SIZE:
+            raise ValueError(f"index file {path} is truncated")
+        magic, version, self.count, self.interval = _HEADER.unpack_from(data, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError(f"unsupported index file {path}")
+        body = len(data) - HASH_SIZE
+        if hashlib.sha1(data[:body]).digest() != data[body:]:
+            raise ValueError(f"index file {path} is corrupt (bad checksum)")
+        self._table = _OFFSET.unpack_from(data, body - _OFFSET.size)[0]
+        self._restarts = (body - _OFFSET.size - self._table) // _OFFSET.size
+
+    def __len__(self):
+        return self.count
+
+    def _restart(self, number):
+        return _OFFSET.unpack_from(self._data, self._table + number * _OFFSET.size)[0]
+
+    def _read_path(self, position, previous):
+        """Returns (path bytes, position of the entry's hash)."""
+        shared, position = decode_varint(self._data, position)
+        length, position = decode_varint(self._data, position)
+        end = position + length
+        return previous[:shared] + self._data[position:end], end
+
+    def _read_entry(self, position):
+        name, size, mtime_ns, ctime_ns, ino, mode = _ENTRY.unpack_from(self._data, position)
+        return {
+            "hash": name.hex(),
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "ctime_ns": ctime_ns,
+            "ino": ino,
+            "mode": mode,
+        }
+
+    def _iter_from(self, position, count):
+        """Yields (path bytes, entry position) for count entries starting at position."""
+        data = self._data
+        previous = b""
+        for _ in range(count):
+            # Nearly all prefix and suffix lengths fit in a single varint byte
+            shared = data[position]
+            length = data[position + 1]
+            if shared < 0x80 and length < 0x80:
+                position += 2
+            else:
+                shared, position = decode_varint(data, position)
+                length, position = decode_varint(data, position)
+            end = position + length
+            previous = previous[:shared] + data[position:end]
+            yield previous, end
+            position = end + _ENTRY.size
+
+    def get(self, path):
+        """Returns the entry for path, or None if the index does not hold it."""
+        key = path.encode("utf-8")
+        lo, hi = 0, self._restarts
+        # Find the last restart entry whose path is not above the key
+        while lo < hi:
+            mid = (lo + hi) // 2
+            name, _ = self._read_path(self._restart(mid), b"")
+            if name <= key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == 0:
+            return None
+        first = (lo - 1) * self.interval
+        count = min(self.interval, self.count - first)
+        for name, position in self._iter_from(self._restart(lo - 1), count):
+            if name == key:
+                return self._read_entry(position)
+            if name > key:
+                break
+        return None
+
+    def paths(self):
+        """Yields every path in sorted order without decoding the entries."""
+        if self.count:
+            for name, _ in self._iter_from(self._restart(0), self.count):
+                yield name.decode("utf-8")
+
+    def items(self):
+        """Yields (path, entry) for every entry in sorted order."""
+        if self.count:
+            for name, position in self._iter_from(self._restart(0), self.count):
+                yield name.decode("utf-8"), self._read_entry(position)
+
+
+# Share of the entries looked up one by one before the rest are decoded in
+# a single sequential pass, which is far cheaper per entry than searching
+BULK_LOAD_RATIO = 64
+
+
+class Index(MutableMapping):
+    """
+    The staged entries as a {path: entry} mapping over an IndexFile. Entries
+    are decoded when first looked up and kept, so they can be modified in
+    place; changes stay in memory until the index is written. Commands that
+    touch a few paths decode a few entries; once lookups show that most of
+    the index is wanted, it is decoded in one pass instead.
+    """
+
+    def __init__(self, base=None):
+        self._base = base
+        self._entries = {}
+        self._removed = set()
+        self._lookups = 0
+
+    def _load_all(self):
+        for path, entry in self._base.items():
+            if path not in self._removed:
+                self._entries.setdefault(path, entry)
+        self._base = None
+
+    def __getitem__(self, path):
+        entry = self._entries.get(path)
+        if entry is None:
+            if path in self._removed or self._base is None:
+                raise KeyError(path)
+            self._lookups += 1
+            if self._lookups > max(RESTART_INTERVAL, len(self._base) // BULK_LOAD_RATIO):
+                self._load_all()
+                return self[path]
+            entry = self._base.get(path)
+            if entry is None:
+                raise KeyError(path)
+            self._entries[path] = entry
+        return entry
+
+    def __setitem__(self, path, entry):
+        self._removed.discard(path)
+        self._entries[path] = entry
+
+    def __delitem__(self, path):
+        if path not in self:
+            raise KeyError(path)
+        self._entries.pop(path, None)
+        self._removed.add(path)
+
+    def __contains__(self, path):
+        try:
+            self[path]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        base_paths = set()
+        if self._base is not None:
+            for path in self._base.paths():
+                base_paths.add(path)
+                if path not in self._removed:
+                    yield path
+        for path in list(self._entries):
+            if path not in base_paths:
+                yield path
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __bool__(self):
+        return next(iter(self), None) is not None
+
+    def items(self):
+        """Returns the (path, entry) pairs, decoding the file sequentially rather than by lookup."""
+        if self._base is not None:
+            self._load_all()
+        return sorted(self._entries.items())
+
+    def values(self):
+        return [entry for _, entry in self.items()]
@@ -0,0 +1,59 @@
+import json
+import os
+import socket
+
+
+def connect(socket_path, timeout=None):
+    """Connects to the unix socket a gitter background process listens on."""
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(timeout)
+    try:
+        client.connect(socket_path)
+    except OSError:
+        client.close()
+        raise
+    return client
+
+
+def read_message(stream):
+    """Reads one JSON message; returns None when the other side closed the connection."""
+    line = stream.readline()
+    return json.loads(line) if line else None
+
+
+def write_message(stream, message):
+    stream.write(json.dumps(message).encode("utf-8") + b"\n")
+    stream.flush()
+
+
+def exchange(client, message):
+    """
+    Sends a message over a connected socket and returns the reply. Raises
+    OSError or ValueError when the reply is missing or garbled.
+    """
+    with client, client.makefile("rwb") as stream:
+        write_message(stream, message)
+        reply = read_message(stream)
+    if reply is None:
+        raise ConnectionError("no reply from the other side")
+    return reply
+
+
+def send_request(socket_path, message, timeout=None):
+    """
+    Sends a message and returns the reply. Raises OSError or ValueError
+    when nothing listens on the socket or the reply is missing or garbled.
+    """
+    return exchange(connect(socket_path, timeout), message)
+
+
+def listen(socket_path, backlog=16):
+    """Binds and listens on a unix socket, replacing one left by a process that died."""
+    try:
+        os.remove(socket_path)
+    except FileNotFoundError:
+        pass
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(backlog)
+    return server
@@ -0,0 +1,110 @@
+import os
+import random
+import time
+
+# Seconds to keep retrying a held lock, overridable with GITTER_LOCK_TIMEOUT
+DEFAULT_LOCK_TIMEOUT = 10.0
+# Bounds of the randomized, doubling wait between attempts
+MIN_BACKOFF = 0.001
+MAX_BACKOFF = 0.1
+
+
+class LockError(OSError):
+    """Raised when a lock is still held by another process after the timeout."""
+
+
+def lock_timeout():
+    value = os.environ.get("GITTER_LOCK_TIMEOUT")
+    return float(value) if value else DEFAULT_LOCK_TIMEOUT
+
+
+class LockFile:
+    """
+    Exclusive lock on a file, held by creating '<path>.lock' with O_EXCL, as
+    git does. The new contents are written to the lock file itself and
+    committed by fsyncing it and renaming it over the target, so readers see
+    either the old file or the complete new one. A lock that is released
+    without being committed is removed and the target is left untouched.
+
+        with LockFile(path) as lock:
+            data = read(path)
+            lock.write(update(data))
+            lock.commit()
+    """
+
+    def __init__(self, path, timeout=None):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.timeout = lock_timeout() if timeout is None else timeout
+        self._fd = None
+
+    def acquire(self):
+        """Creates the lock file, retrying with backoff while another process holds it."""
+        deadline = time.monotonic() + self.timeout
+        backoff = MIN_BACKOFF
+        while True:
+            try:
+                self._fd = os.open(self.lock_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+                return self
+            except FileExistsError:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise LockError(
+                        f"Unable to create '{self.lock_path}': File exists. Another gitter "
+                        "process seems to be running; if not, remove the file and retry."
+                    )
+                time.sleep(min(remaining, random.uniform(backoff / 2, backoff)))
+                backoff = min(backoff * 2, MAX_BACKOFF)
+
+    def write(self, data):
+        """Writes data to the lock file; it replaces the target on commit()."""
+        view = memoryview(data)
+        while view:
+            written = os.write(self._fd, view)
+            view = view[written:]
+
+    def commit(self):
+        """Flushes the written data to disk and renames the lock file over the target."""
+        os.fsync(self._fd)
+        os.close(self._fd)
+        self._fd = None
+        os.replace(self.lock_path, self.path)
+
+    def rollback(self):
+        """Releases the lock without changing the target."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            os.remove(self.lock_path)
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc_info):
+        self.rollback()
+
+
+def write_file_atomic(path, data):
+    """Replaces the contents of path with data under its lock, durably and atomically."""
+    with LockFile(path) as lock:
+        lock.write(data)
+        lock.commit()
+
+
+def append_lines(path, data, sync=False):
+    """
+    Appends newline-terminated lines to path, creating it if needed. A line
+    torn by a crash during an earlier append is left on a line of its own
+    rather than joined to the first new one. The caller holds whatever lock
+    guards the file; sync fsyncs it before returning.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        size = os.fstat(fd).st_size
+        if size and os.pread(fd, 1, size - 1) != b"\n":
+            data = b"\n" + data
+        os.write(fd, data)
+        if sync:
+            os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,352 @@
+import hashlib
+import io
+import json
+import os
+import zlib
+
+from .delta import apply_delta
+from .file_operations import BINARY_PLACEHOLDER, CHUNK_SIZE, iter_file_chunks
+from .packs import (ENTRY_DELTA, ENTRY_FULL, delta_base_cache, find_packed,
+                    load_packs)
+
+OBJECTS_DIR = ".gitter/objects"
+
+
+def object_path(object_hash):
+    """Returns the loose object path (.gitter/objects/<hash-prefix>/<hash-rest>)."""
+    return f"{OBJECTS_DIR}/{object_hash[:2]}/{object_hash[2:]}"
+
+
+def compression_level():
+    """Returns the zlib level for new objects from GITTER_COMPRESSION (-1 to 9)."""
+    value = os.environ.get("GITTER_COMPRESSION")
+    if not value:
+        return zlib.Z_DEFAULT_COMPRESSION
+    try:
+        level = int(value)
+    except ValueError:
+        level = None
+    if level is None or not -1 <= level <= 9:
+        raise ValueError(f"invalid compression level '{value}'")
+    return level
+
+
+def object_header(obj_type, size):
+    """Returns the '<type> <size>\\0' header stored in front of object content."""
+    return f"{obj_type} {size}\0".encode("ascii")
+
+
+def object_exists(object_hash):
+    """Checks whether an object is already in the store, packed or loose, without reading it."""
+    return find_packed(object_hash) is not None or os.path.exists(
+        object_path(object_hash)
+    )
+
+
+def _open_temp_object():
+    """Creates a temporary file in the object store for an object being written."""
+    # Imported on the first write: tempfile pulls in shutil and the
+    # compression modules, which commands that only read never need
+    import tempfile
+
+    os.makedirs(OBJECTS_DIR, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=OBJECTS_DIR, prefix="tmp_obj_")
+    return os.fdopen(fd, "wb"), temp_path
+
+
+def _install_object(temp_path, object_hash):
+    """
+    Moves a fully written temporary object into place, or drops it when the
+    object already exists. Readers never see a partially written object.
+    """
+    path = object_path(object_hash)
+    if object_exists(object_hash):
+        os.remove(temp_path)
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(temp_path, path)
+
+
+def write_object(data, obj_type="blob"):
+    """
+    Stores raw bytes in the object store under their SHA-1 hash and returns
+    it. Objects are a small header plus the content, compressed with zlib.
+    """
+    object_hash = hashlib.sha1(data).hexdigest()
+    if not object_exists(object_hash):
+        compressed = zlib.compress(
+            object_header(obj_type, len(data)) + data, compression_level()
+        )
+        f, temp_path = _open_temp_object()
+        with f:
+            f.write(compressed)
+        _install_object(temp_path, object_hash)
+    return object_hash
+
+
+def hash_and_store_file(path):
+    """
+    Hashes a working file and stores it as a blob in a single read, feeding
+    each chunk to both the hasher and the compressor. Returns the SHA-1 hash,
+    or None if the file could not be read.
+    """
+    temp_path = None
+    try:
+        with open(path, "rb", buffering=0) as src:
+            size = os.fstat(src.fileno()).st_size
+            hasher = hashlib.sha1()
+            compressor = zlib.compressobj(compression_level())
+            dst, temp_path = _open_temp_object()
+            with dst:
+                dst.write(compressor.compress(object_header("blob", size)))
+                read = 0
+                for chunk in iter_file_chunks(src):
+                    read += len(chunk)
+                    hasher.update(chunk)
+                    dst.write(compressor.compress(chunk))
+                dst.write(compressor.flush())
+        if read != size:
+            raise OSError("file changed while it was being read")
+        object_hash = hasher.hexdigest()
+        _install_object(temp_path, object_hash)
+        return object_hash
+    except Exception as e:
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)
+        print(f"Error processing file {path}: {str(e)}")
+        return None
+
+
+def _is_zlib_stream(prefix):
+    """Checks the two-byte zlib header (deflate method, valid check bits)."""
+    return (
+        len(prefix) >= 2
+        and prefix[0] & 0x0F == 8
+        and ((prefix[0] << 8) | prefix[1]) % 31 == 0
+    )
+
+
+class ObjectReader(io.RawIOBase):
+    """
+    Readable stream over an object's content that inflates it a chunk at a
+    time, so reading a large object needs no more than a chunk of memory.
+    Objects written before compression was introduced are read as is.
+    """
+
+    def __init__(self, f):
+        self._file = f
+        self._inflater = zlib.decompressobj()
+        self._pending = b""
+        self.type = None
+        self.size = None
+
+        prefix = f.read(2)
+        f.seek(0)
+        self._legacy = not _is_zlib_stream(prefix)
+        if not self._legacy:
+            try:
+                self._read_header()
+            except (zlib.error, ValueError):
+                f.seek(0)
+                self._legacy = True
+                self._pending = b""
+
+    def _read_header(self):
+        data = b""
+        while b"\0" not in data:
+            chunk = self._inflate()
+            if not chunk:
+                raise ValueError("truncated object header")
+            data += chunk
+        header, _, self._pending = data.partition(b"\0")
+        obj_type, size = header.decode("ascii").split(" ")
+        self.type, self.size = obj_type, int(size)
+
+    def _inflate(self):
+        """Returns the next chunk of content (empty at the end of the object)."""
+        if self._legacy:
+            return self._file.read(CHUNK_SIZE)
+        while not self._inflater.eof:
+            data = self._inflater.unconsumed_tail or self._file.read(CHUNK_SIZE)
+            if not data:
+                break
+            # Bounded output keeps highly compressible objects from ballooning
+            chunk = self._inflater.decompress(data, CHUNK_SIZE)
+            if chunk:
+                return chunk
+        return b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if not self._pending:
+            self._pending = self._inflate()
+            if not self._pending:
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+class ResolvedObject(io.BytesIO):
+    """In-memory object content, for objects rebuilt from a delta chain."""
+
+    def __init__(self, obj_type, data):
+        super().__init__(data)
+        self.type = obj_type
+        self.size = len(data)
+
+
+def _read_packed(pack, offset):
+    """
+    Returns (type, content) of a pack entry. Delta entries are applied to
+    their base, which is looked up in the delta-base cache before its own
+    chain is resolved.
+    """
+    kind, base_hash, window = pack.entry(offset)
+    with ObjectReader(window) as reader:
+        data = reader.read()
+        obj_type = reader.type
+    if kind == ENTRY_FULL:
+        return obj_type, data
+    if kind != ENTRY_DELTA:
+        raise ValueError(f"unknown pack entry kind {kind} in {pack.pack_path}")
+
+    base_offset = pack.find(base_hash)
+    if base_offset is None:
+        raise ValueError(f"missing delta base {base_hash} in {pack.pack_path}")
+    key = (pack.pack_path, base_offset)
+    base = delta_base_cache.get(key)
+    if base is None:
+        base = _read_packed(pack, base_offset)
+        delta_base_cache.put(key, *base)
+    return obj_type, apply_delta(base[1], data)
+
+
+def _open_packed(located):
+    pack, offset = located
+    kind, _, window = pack.entry(offset)
+    if kind == ENTRY_FULL:
+        # Full entries are inflated as they are read, like loose objects
+        return ObjectReader(window)
+    return ResolvedObject(*_read_packed(pack, offset))
+
+
+def open_object(object_hash):
+    """
+    Opens an object for streaming reads, or returns None if it is not in the
+    store. Packs are searched first, then loose objects; packs are rescanned
+    once before giving up in case a repack moved the object meanwhile.
+    """
+    located = find_packed(object_hash)
+    if located is not None:
+        return _open_packed(located)
+    try:
+        return ObjectReader(open(object_path(object_hash), "rb"))
+    except (FileNotFoundError, NotADirectoryError):
+        pass
+    located = find_packed(object_hash, refresh=True)
+    if located is not None:
+        return _open_packed(located)
+    return None
+
+
+def find_objects_by_prefix(prefix):
+    """Returns the sorted hashes of all packed and loose objects that start with a hex prefix."""
+    prefix = prefix.lower()
+    matches = set()
+    for pack in load_packs():
+        matches.update(pack.match_prefix(prefix))
+    if len(prefix) >= 2:
+        directory = f"{OBJECTS_DIR}/{prefix[:2]}"
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            names = []
+        matches.update(prefix[:2] + name for name in names if (prefix[:2] + name).startswith(prefix))
+    else:
+        matches.update(
+            object_hash for object_hash in iter_loose_objects() if object_hash.startswith(prefix)
+        )
+    return sorted(matches)
+
+
+def object_type(object_hash):
+    """Returns the type recorded in an object's header, or None if it is missing or predates headers."""
+    reader = open_object(object_hash)
+    if reader is None:
+        return None
+    with reader:
+        return reader.type
+
+
+def read_loose_object_bytes(object_hash):
+    """
+    Returns a loose object exactly as stored, compressing objects written
+    before compression was introduced so they match the current format.
+    """
+    with open(object_path(object_hash), "rb") as f:
+        data = f.read()
+    if _is_zlib_stream(data[:2]):
+        return data
+    return zlib.compress(object_header("blob", len(data)) + data, compression_level())
+
+
+def iter_loose_objects():
+    """Yields the hashes of all loose objects."""
+    try:
+        prefixes = sorted(os.listdir(OBJECTS_DIR))
+    except FileNotFoundError:
+        return
+    for prefix in prefixes:
+        if len(prefix) != 2:
+            continue
+        for rest in sorted(os.listdir(f"{OBJECTS_DIR}/{prefix}")):
+            if not rest.startswith("tmp_"):
+                yield prefix + rest
+
+
+def read_object(object_hash):
+    """Returns the content of an object, or None if it is not in the store."""
+    reader = open_object(object_hash)
+    if reader is None:
+        return None
+    with reader:
+        return reader.read()
+
+
+def read_committed_file(file_hash):
+    """
+    Reads the committed version of a file from the object store, decompressing
+    and decoding it as a stream. Returns the list of lines for diff processing.
+    """
+    reader = open_object(file_hash)
+    if reader is None:
+        return []
+    with io.TextIOWrapper(
+        io.BufferedReader(reader), encoding="utf-8", newline="\n"
+    ) as f:
+        try:
+            return list(f)
+        except UnicodeDecodeError:
+            return list(BINARY_PLACEHOLDER)  # Mark as binary
+
+
+def write_commit(commit):
+    """Stores a commit as a content-addressed object and returns its hash."""
+    data = json.dumps(commit, sort_keys=True, separators=(",", ":"))
+    return write_object(data.encode("utf-8"), "commit")
+
+
+def read_commit(commit_hash):
+    """Loads a commit object, or returns None if it does not exist."""
+    data = read_object(commit_hash)
+    if data is None:
+        return None
+    return json.loads(data)
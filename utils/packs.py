@@ -0,0 +1,312 @@
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from collections import OrderedDict
+
+PACK_DIR = ".gitter/objects/pack"
+
+PACK_MAGIC = b"GPCK"
+INDEX_MAGIC = b"GIDX"
+PACK_VERSION = 1
+
+# Pack entry kinds; a full entry holds the object exactly as it is stored
+# loose, a delta entry the hash of its base in the same pack followed by a
+# compressed object whose header describes the target and whose content is
+# the delta
+ENTRY_FULL = 0
+ENTRY_DELTA = 1
+
+# Memory the delta-base cache may hold, overridable with GITTER_DELTA_BASE_CACHE
+DEFAULT_DELTA_BASE_CACHE = 32 << 20
+
+# Index layout: magic, version, 256 cumulative counts by first hash byte,
+# the sorted binary hashes, their pack offsets, then the pack and index checksums
+_HEADER = struct.Struct(">4sI")
+_FANOUT = struct.Struct(">256I")
+_OFFSET = struct.Struct(">Q")
+_PACK_HEADER = struct.Struct(">4sII")
+HASH_SIZE = 20
+
+
+def match_sorted_prefix(name_at, fanout, prefix):
+    """
+    Returns the hex names starting with prefix from a sorted table of binary
+    hashes, where name_at(position) reads one name and fanout holds the
+    cumulative counts by first byte. The range the fan-out gives is narrowed
+    with a binary search, so only the matches themselves are read.
+    """
+    if len(prefix) < 2:
+        lo, hi = 0, fanout[255]
+    else:
+        first = int(prefix[:2], 16)
+        lo = fanout[first - 1] if first else 0
+        hi = fanout[first]
+    # Binary search for the first name not below the prefix, padded with zeros
+    key = bytes.fromhex(prefix.ljust(HASH_SIZE * 2, "0"))
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if name_at(mid) < key:
+            lo = mid + 1
+        else:
+            hi = mid
+    matches = []
+    while lo < fanout[255]:
+        name = name_at(lo).hex()
+        if not name.startswith(prefix):
+            break
+        matches.append(name)
+        lo += 1
+    return matches
+
+
+class PackWindow:
+    """Read-only file-like view of a pack from one entry onwards, served from the mapping."""
+
+    def __init__(self, data, start):
+        self._data = data
+        self._start = start
+        self._position = start
+
+    def read(self, size=-1):
+        end = len(self._data) if size < 0 else self._position + size
+        chunk = self._data[self._position : end]
+        self._position += len(chunk)
+        return chunk
+
+    def seek(self, position):
+        self._position = self._start + position
+
+    def close(self):
+        pass
+
+
+class Pack:
+    """
+    A packfile and its index, both memory-mapped. Looking an object up is a
+    binary search over the index mapping within the range the fan-out table
+    gives for its first byte, so it costs no system calls.
+    """
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self.pack_path = index_path[: -len(".idx")] + ".pack"
+        self._index = _map(index_path)
+        self._pack = _map(self.pack_path)
+
+        magic, version = _HEADER.unpack_from(self._index, 0)
+        if magic != INDEX_MAGIC or version != PACK_VERSION:
+            raise ValueError(f"unsupported pack index {index_path}")
+        self._fanout = _FANOUT.unpack_from(self._index, _HEADER.size)
+        self.count = self._fanout[255]
+        self._names = _HEADER.size + _FANOUT.size
+        self._offsets = self._names + self.count * HASH_SIZE
+        expected = self._offsets + self.count * _OFFSET.size + 2 * HASH_SIZE
+        if len(self._index) != expected:
+            raise ValueError(f"truncated pack index {index_path}")
+
+        magic, version, count = _PACK_HEADER.unpack_from(self._pack, 0)
+        if magic != PACK_MAGIC or count != self.count:
+            raise ValueError(f"pack does not match its index {self.pack_path}")
+
+    def __len__(self):
+        return self.count
+
+    def _name(self, position):
+        start = self._names + position * HASH_SIZE
+        return self._index[start : start + HASH_SIZE]
+
+    def find(self, object_hash):
+        """Returns the pack offset of an object, or None if it is not in this pack."""
+        try:
+            key = bytes.fromhex(object_hash)
+        except ValueError:
+            return None
+        lo = self._fanout[key[0] - 1] if key[0] else 0
+        hi = self._fanout[key[0]]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            name = self._name(mid)
+            if name < key:
+                lo = mid + 1
+            elif name > key:
+                hi = mid
+            else:
+                return _OFFSET.unpack_from(self._index, self._offsets + mid * _OFFSET.size)[0]
+        return None
+
+    def match_prefix(self, prefix):
+        """Returns the hashes in this pack that start with a hex prefix, in sorted order."""
+        return match_sorted_prefix(self._name, self._fanout, prefix)
+
+    def hashes(self):
+        """Yields the hashes of all objects in the pack, in sorted order."""
+        for position in range(self.count):
+            yield self._name(position).hex()
+
+    def entry(self, offset):
+        """
+        Returns (kind, base hash, window) for the entry at offset. The window
+        starts at the entry's compressed stream; the base hash is None for
+        full entries.
+        """
+        kind = self._pack[offset]
+        if kind == ENTRY_DELTA:
+            base = self._pack[offset + 1 : offset + 1 + HASH_SIZE].hex()
+            return kind, base, PackWindow(self._pack, offset + 1 + HASH_SIZE)
+        return kind, None, PackWindow(self._pack, offset + 1)
+
+    def raw_entries(self):
+        """Yields (hash, entry bytes) for every object, copied as stored."""
+        offsets = sorted(
+            (_OFFSET.unpack_from(self._index, self._offsets + i * _OFFSET.size)[0], i)
+            for i in range(self.count)
+        )
+        ends = [offset for offset, _ in offsets[1:]] + [len(self._pack) - HASH_SIZE]
+        for (offset, position), end in zip(offsets, ends):
+            yield self._name(position).hex(), self._pack[offset:end]
+
+
+class DeltaBaseCache:
+    """
+    LRU cache of resolved objects used as delta bases, keyed by pack and
+    offset and bounded by the bytes it holds. Reading several versions of a
+    file walks the same delta chain again and again; with the bases cached
+    each read only applies the deltas that are new.
+    """
+
+    def __init__(self, limit=None):
+        if limit is None:
+            value = os.environ.get("GITTER_DELTA_BASE_CACHE")
+            limit = int(value) if value else DEFAULT_DELTA_BASE_CACHE
+        self.limit = limit
+        self.size = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, obj_type, data):
+        if key in self._entries or len(data) > self.limit:
+            return
+        self._entries[key] = (obj_type, data)
+        self.size += len(data)
+        while self.size > self.limit:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+
+delta_base_cache = DeltaBaseCache()
+
+
+def _map(path):
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+_packs = None
+_packs_root = None
+
+
+def load_packs(refresh=False):
+    """
+    Returns the packs in the repository, mapped on first use and kept for the
+    rest of the process. refresh rescans the pack directory for packs written
+    since. Packs whose index is missing or damaged are skipped.
+    """
+    global _packs, _packs_root
+    root = os.getcwd()
+    if _packs is not None and not refresh and _packs_root == root:
+        return _packs
+    known = {pack.index_path: pack for pack in _packs or []} if _packs_root == root else {}
+    packs = []
+    try:
+        names = sorted(os.listdir(PACK_DIR))
+    except FileNotFoundError:
+        names = []
+    for name in names:
+        if not name.endswith(".idx"):
+            continue
+        index_path = f"{PACK_DIR}/{name}"
+        pack = known.get(index_path)
+        if pack is None:
+            try:
+                pack = Pack(index_path)
+            except (OSError, ValueError, struct.error) as e:
+                print(f"Warning: ignoring pack {index_path}: {str(e)}", file=sys.stderr)
+                continue
+        packs.append(pack)
+    _packs, _packs_root = packs, root
+    return packs
+
+
+def find_packed(object_hash, refresh=False):
+    """Returns (pack, offset) for a packed object, or None if no pack holds it."""
+    for pack in load_packs(refresh):
+        offset = pack.find(object_hash)
+        if offset is not None:
+            return pack, offset
+    return None
+
+
+def write_pack(entries):
+    """
+    Writes (hash, entry bytes) pairs to a new pack and its index and returns
+    the pack path. Both files are written under temporary names and the
+    index is renamed into place last, so readers never see a partial pack.
+    """
+    # Only repack writes packs; readers should not pay for importing tempfile
+    import tempfile
+
+    os.makedirs(PACK_DIR, exist_ok=True)
+    fd, temp_pack = tempfile.mkstemp(dir=PACK_DIR, prefix="tmp_pack_")
+    offsets = {}
+    pack_hasher = hashlib.sha1()
+    with os.fdopen(fd, "w+b") as f:
+        # The object count is patched in once all entries are written
+        header = _PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, 0)
+        f.write(header)
+        position = len(header)
+        for object_hash, data in entries:
+            if object_hash in offsets:
+                continue
+            offsets[object_hash] = position
+            f.write(data)
+            position += len(data)
+        f.seek(0)
+        f.write(_PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, len(offsets)))
+        f.flush()
+        f.seek(0)
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            pack_hasher.update(chunk)
+        pack_checksum = pack_hasher.digest()
+        f.seek(0, os.SEEK_END)
+        f.write(pack_checksum)
+
+    names = sorted(bytes.fromhex(object_hash) for object_hash in offsets)
+    fanout = [0] * 256
+    for name in names:
+        fanout[name[0]] += 1
+    for i in range(1, 256):
+        fanout[i] += fanout[i - 1]
+
+    index = bytearray(_HEADER.pack(INDEX_MAGIC, PACK_VERSION))
+    index += _FANOUT.pack(*fanout)
+    for name in names:
+        index += name
+    for name in names:
+        index += _OFFSET.pack(offsets[name.hex()])
+    index += pack_checksum
+    index += hashlib.sha1(index).digest()
+
+    base = f"{PACK_DIR}/pack-{pack_checksum.hex()}"
+    fd, temp_index = tempfile.mkstemp(dir=PACK_DIR, prefix="tmp_idx_")
+    with os.fdopen(fd, "wb") as f:
+        f.write(index)
+    os.replace(temp_pack, base + ".pack")
+    os.replace(temp_index, base + ".idx")
+    return base + ".pack"
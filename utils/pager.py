@@ -0,0 +1,86 @@
+import io
+import os
+import sys
+from contextlib import contextmanager
+
+DEFAULT_PAGER = "less"
+# Quit when the output fits on one screen, keep colors, don't clear the screen
+DEFAULT_LESS = "FRX"
+# Output is handed to the pager in blocks this large
+WRITE_BUFFER_SIZE = 64 * 1024
+
+
+def pager_command():
+    """
+    Returns the pager command from GITTER_PAGER or PAGER, or None when
+    output should not be paged: stdout is not a terminal or the pager is
+    disabled with an empty value or 'cat'.
+    """
+    if not sys.stdout.isatty():
+        return None
+    command = os.environ.get("GITTER_PAGER", os.environ.get("PAGER", DEFAULT_PAGER))
+    if not command.strip() or command.strip() == "cat":
+        return None
+    return command
+
+
+@contextmanager
+def open_pager(enabled=True):
+    """
+    Yields a buffered text stream that feeds the pager, or stdout when
+    there is no pager. Writes are collected into large blocks rather than
+    flushed line by line. When the reader quits the pager early, writing
+    raises BrokenPipeError, so callers producing output lazily can stop.
+    """
+    command = pager_command() if enabled else None
+    if command is None:
+        sys.stdout.flush()
+        try:
+            raw = io.FileIO(sys.stdout.fileno(), "w", closefd=False)
+        except (AttributeError, io.UnsupportedOperation):
+            # Output captured in memory, as the daemon does, is written as is
+            yield sys.stdout
+            return
+        out = io.TextIOWrapper(
+            io.BufferedWriter(raw, WRITE_BUFFER_SIZE),
+            encoding=sys.stdout.encoding or "utf-8",
+            errors="replace",
+        )
+        try:
+            yield out
+        except BrokenPipeError:
+            pass
+        finally:
+            try:
+                out.flush()
+            except BrokenPipeError:
+                pass
+        return
+
+    # Only needed when there is a terminal to page on
+    import shlex
+    import subprocess
+
+    env = dict(os.environ)
+    env.setdefault("LESS", DEFAULT_LESS)
+    try:
+        process = subprocess.Popen(
+            shlex.split(command), stdin=subprocess.PIPE, env=env, bufsize=WRITE_BUFFER_SIZE
+        )
+    except OSError:
+        # A missing pager is no reason not to show the output
+        with open_pager(enabled=False) as out:
+            yield out
+        return
+
+    out = io.TextIOWrapper(process.stdin, encoding="utf-8", errors="replace")
+    try:
+        yield out
+    except BrokenPipeError:
+        pass
+    finally:
+        try:
+            out.close()
+        except BrokenPipeError:
+            pass
+        process.wait()
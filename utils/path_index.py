@@ -0,0 +1,161 @@
+import hashlib
+import heapq
+import json
+import os
+
+from .commit_graph import iter_ancestry, lookup_commit
+from .history import migrate_legacy_commits
+from .lockfile import LockFile, append_lines
+from .refs import resolve_head
+from .trees import diff_trees
+
+# Which commits changed each path, so path-limited history never has to
+# look at commits that did not touch the path. Records are spread over
+# buckets named by the first byte of the path's sha1; each bucket is an
+# append-only journal of {"seq", "commit", "path"} records in commit order.
+PATH_INDEX_DIR = ".gitter/path-index"
+# The newest commit the buckets cover and how many commits precede it
+PATH_INDEX_HEAD = f"{PATH_INDEX_DIR}/HEAD"
+
+
+def _bucket_path(path):
+    digest = hashlib.sha1(path.encode("utf-8")).hexdigest()
+    return f"{PATH_INDEX_DIR}/{digest[:2]}"
+
+
+def _indexed_paths(path):
+    """Yields a changed file path and each directory containing it."""
+    yield path
+    while "/" in path:
+        path = path.rsplit("/", 1)[0]
+        yield path
+
+
+def _read_head():
+    try:
+        with open(PATH_INDEX_HEAD, "r") as f:
+            head = json.load(f)
+        return head["commit"], head["seq"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None, 0
+
+
+def _commit_head(lock, commit_hash, seq):
+    lock.write(json.dumps({"commit": commit_hash, "seq": seq}).encode("utf-8"))
+    lock.commit()
+
+
+def _index_commits(commits, seq):
+    """
+    Appends the paths changed by each (commit hash, parent tree, tree), in
+    commit order starting at sequence number seq, grouped so each bucket
+    is written once.
+    """
+    buckets = {}
+    for commit_hash, parent_tree, tree in commits:
+        seq += 1
+        changed = set()
+        for file_path, _, _ in diff_trees(parent_tree, tree):
+            changed.update(_indexed_paths(file_path))
+        for path in sorted(changed):
+            record = {"seq": seq, "commit": commit_hash, "path": path}
+            buckets.setdefault(_bucket_path(path), []).append(
+                json.dumps(record, separators=(",", ":")) + "\n"
+            )
+    os.makedirs(PATH_INDEX_DIR, exist_ok=True)
+    for bucket, lines in buckets.items():
+        append_lines(bucket, "".join(lines).encode("utf-8"))
+    return seq
+
+
+def record_commit_paths(commit_hash, parent, parent_tree, tree):
+    """
+    Adds a new commit to the path index when the index is current up to its
+    parent. Otherwise the index is left alone and caught up the next time
+    it is read, so committing never pays for indexing old history.
+    """
+    os.makedirs(PATH_INDEX_DIR, exist_ok=True)
+    with LockFile(PATH_INDEX_HEAD) as lock:
+        indexed, seq = _read_head()
+        if indexed != parent:
+            return
+        seq = _index_commits([(commit_hash, parent_tree, tree)], seq)
+        _commit_head(lock, commit_hash, seq)
+
+
+def update_path_index():
+    """
+    Brings the path index up to HEAD, indexing the commits made since it
+    was last updated. The index is rebuilt from scratch if HEAD does not
+    descend from the commit it covers.
+    """
+    migrate_legacy_commits()
+    head = resolve_head()
+    if head == _read_head()[0]:
+        return
+
+    os.makedirs(PATH_INDEX_DIR, exist_ok=True)
+    # Held while indexing, so concurrent updates never append a commit twice
+    with LockFile(PATH_INDEX_HEAD) as lock:
+        indexed, seq = _read_head()
+        if head == indexed:
+            return
+
+        pending = []
+        for record in iter_ancestry(head):
+            if record["hash"] == indexed:
+                break
+            pending.append(record)
+        else:
+            if indexed is not None:
+                # History was rewritten underneath the index
+                for name in os.listdir(PATH_INDEX_DIR):
+                    if len(name) == 2:
+                        os.remove(f"{PATH_INDEX_DIR}/{name}")
+                seq = 0
+
+        # Each pending commit's parent is the next one; only the oldest needs a lookup
+        trees = {record["hash"]: record["tree"] for record in pending}
+        commits = []
+        for record in reversed(pending):
+            parent = record["parent"]
+            if parent is not None and parent not in trees:
+                parent_record = lookup_commit(parent)
+                trees[parent] = parent_record["tree"] if parent_record else None
+            commits.append((record["hash"], trees.get(parent), record["tree"]))
+        seq = _index_commits(commits, seq)
+        if head is not None:
+            _commit_head(lock, head, seq)
+
+
+def _path_records(path):
+    """Returns (seq, commit) for every commit that changed path or a file under it, newest first."""
+    records = {}
+    try:
+        with open(_bucket_path(path), "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("path") == path:
+                    records[record["seq"]] = record["commit"]
+    except FileNotFoundError:
+        pass
+    return sorted(records.items(), reverse=True)
+
+
+def path_commits(paths):
+    """
+    Yields the hashes of the commits that changed any of paths (files or
+    directories), newest first. Only the buckets of the given paths are
+    read, so the cost follows the number of changes to them rather than
+    the length of the history.
+    """
+    update_path_index()
+    seen = set()
+    streams = [_path_records(path.strip("/")) for path in paths]
+    for _, commit_hash in heapq.merge(*streams, reverse=True):
+        if commit_hash not in seen:
+            seen.add(commit_hash)
+            yield commit_hash
@@ -0,0 +1,41 @@
+import os
+
+from .lockfile import write_file_atomic
+
+HEAD_FILE = ".gitter/HEAD"
+DEFAULT_REF = "refs/heads/main"
+
+
+def head_ref():
+    """Returns the ref HEAD points at, or None when HEAD holds a bare commit hash."""
+    try:
+        with open(HEAD_FILE, "r") as f:
+            head = f.read().strip()
+    except FileNotFoundError:
+        return DEFAULT_REF
+    if head.startswith("ref: "):
+        return head[len("ref: ") :]
+    return None
+
+
+def head_path():
+    """Returns the file holding the current commit hash: the branch ref or HEAD itself."""
+    ref = head_ref()
+    return f".gitter/{ref}" if ref else HEAD_FILE
+
+
+def resolve_head():
+    """Resolves HEAD through its branch ref to a commit hash (None before the first commit)."""
+    try:
+        with open(head_path(), "r") as f:
+            commit_hash = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return commit_hash or None
+
+
+def update_head(commit_hash):
+    """Points the current branch (or a detached HEAD) at commit_hash."""
+    path = head_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_file_atomic(path, (commit_hash + "\n").encode("utf-8"))
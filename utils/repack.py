@@ -0,0 +1,128 @@
+import os
+import zlib
+
+from .delta import create_delta
+from .history import commit_tree
+from .objects import (OBJECTS_DIR, compression_level, iter_loose_objects,
+                      object_header, object_path, open_object, read_commit,
+                      read_loose_object_bytes, read_object)
+from .packs import ENTRY_DELTA, ENTRY_FULL, load_packs, write_pack
+from .refs import resolve_head
+from .trees import diff_trees
+
+# Longest chain of deltas an object may sit at the end of
+DEFAULT_DEPTH = 50
+
+
+def path_history():
+    """
+    Returns {path: [blob hashes, newest first]} for the commits reachable
+    from HEAD, taken from the changes each commit made to its parent's tree.
+    """
+    history = {}
+    commit_hash = resolve_head()
+    commit = read_commit(commit_hash) if commit_hash else None
+    while commit is not None:
+        parent_hash = commit.get("parent")
+        parent = read_commit(parent_hash) if parent_hash else None
+        parent_tree = commit_tree(parent) if parent is not None else None
+        for path, _, new_hash in diff_trees(parent_tree, commit_tree(commit)):
+            if new_hash is not None:
+                history.setdefault(path, []).append(new_hash)
+        commit = parent
+    return history
+
+
+def _full_entry(object_hash, obj_type, data):
+    compressed = zlib.compress(object_header(obj_type, len(data)) + data, compression_level())
+    return object_hash, bytes([ENTRY_FULL]) + compressed
+
+
+def _delta_entries(depth, written):
+    """
+    Yields pack entries for the file versions in the history, storing each
+    version as a delta against the next newer version of the same path, so
+    the newest version of a file is always stored whole and reads fastest.
+    A chain is cut when it reaches depth or a delta would not save enough.
+    """
+    level = compression_level()
+    depths = {}
+    for versions in path_history().values():
+        base = base_data = None
+        for object_hash in versions:
+            if object_hash in written:
+                base, base_data = object_hash, None
+                continue
+            data = read_object(object_hash)
+            if data is None:
+                continue
+            entry = None
+            if base is not None and depths.get(base, 0) < depth:
+                if base_data is None:
+                    base_data = read_object(base)
+                delta = create_delta(base_data, data)
+                if len(delta) < len(data) // 2:
+                    compressed = zlib.compress(
+                        object_header("blob", len(data)) + delta, level
+                    )
+                    entry = bytes([ENTRY_DELTA]) + bytes.fromhex(base) + compressed
+                    depths[object_hash] = depths.get(base, 0) + 1
+            if entry is None:
+                _, entry = _full_entry(object_hash, "blob", data)
+                depths[object_hash] = 0
+            written.add(object_hash)
+            yield object_hash, entry
+            base, base_data = object_hash, data
+
+
+def repack(depth=DEFAULT_DEPTH):
+    """
+    Consolidates every loose object and existing pack into a single new pack,
+    then removes what it replaced. Successive versions of a file are stored
+    as deltas, in chains of at most depth. Returns (pack path, object count),
+    or None when the store is already a single pack with no loose objects.
+    """
+    old_packs = load_packs(refresh=True)
+    loose = list(iter_loose_objects())
+    if not loose and len(old_packs) <= 1:
+        return None
+
+    def entries():
+        written = set()
+        yield from _delta_entries(depth, written)
+        # Full packed entries are copied without being inflated
+        for pack in old_packs:
+            for object_hash, data in pack.raw_entries():
+                if object_hash in written:
+                    continue
+                written.add(object_hash)
+                if data[0] == ENTRY_FULL:
+                    yield object_hash, data
+                else:
+                    # Old deltas may point at bases chained differently now
+                    with open_object(object_hash) as reader:
+                        yield _full_entry(object_hash, reader.type, reader.read())
+        for object_hash in loose:
+            if object_hash not in written:
+                written.add(object_hash)
+                yield object_hash, bytes([ENTRY_FULL]) + read_loose_object_bytes(object_hash)
+
+    pack_path = write_pack(entries())
+    new_pack = next(
+        pack for pack in load_packs(refresh=True) if pack.pack_path == pack_path
+    )
+
+    # Everything is reachable through the new pack before anything is removed
+    for pack in old_packs:
+        if pack.pack_path != pack_path:
+            os.remove(pack.index_path)
+            os.remove(pack.pack_path)
+    for object_hash in loose:
+        os.remove(object_path(object_hash))
+    for prefix in {object_hash[:2] for object_hash in loose}:
+        try:
+            os.rmdir(f"{OBJECTS_DIR}/{prefix}")
+        except OSError:
+            pass  # Still holds objects written since the repack started
+    load_packs(refresh=True)
+    return pack_path, len(new_pack)
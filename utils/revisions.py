@@ -0,0 +1,79 @@
+import os
+import re
+
+from .commit_graph import load_commit_graph, lookup_commit
+from .objects import find_objects_by_prefix, object_type, read_commit
+from .refs import resolve_head
+
+# Shortest abbreviated hash accepted, as in git
+MIN_ABBREV = 4
+
+_HEX = re.compile(r"[0-9a-fA-F]+")
+_ANCESTRY = re.compile(r"(?:~\d*|\^)+$")
+_STEP = re.compile(r"~(\d*)|\^")
+
+
+def _is_commit(object_hash):
+    obj_type = object_type(object_hash)
+    if obj_type is None:
+        # Objects written before headers existed carry no type
+        commit = read_commit(object_hash) if object_hash else None
+        return isinstance(commit, dict) and "message" in commit
+    return obj_type == "commit"
+
+
+def _resolve_name(name, revision):
+    if name in ("HEAD", "@"):
+        commit_hash = resolve_head()
+        if commit_hash is None:
+            raise ValueError(f"unknown revision '{revision}'")
+        return commit_hash
+
+    # Branch names resolve through their ref
+    ref_path = f".gitter/refs/heads/{name}"
+    if name and ".." not in name and os.path.isfile(ref_path):
+        with open(ref_path, "r") as f:
+            return f.read().strip()
+
+    if len(name) >= MIN_ABBREV and _HEX.fullmatch(name):
+        name = name.lower()
+        # Commits in the graph are found by binary search and need no type check
+        graph = load_commit_graph()
+        graphed = set(graph.match_prefix(name)) if graph is not None else set()
+        if len(name) == 40:
+            candidates = [name] if name in graphed or _is_commit(name) else []
+        else:
+            candidates = sorted(
+                graphed
+                | {
+                    object_hash
+                    for object_hash in find_objects_by_prefix(name)
+                    if object_hash not in graphed and _is_commit(object_hash)
+                }
+            )
+        if len(candidates) == 1:
+            return candidates[0]
+        if candidates:
+            raise ValueError(f"ambiguous revision '{revision}'")
+    raise ValueError(f"unknown revision '{revision}'")
+
+
+def resolve_revision(revision):
+    """
+    Resolves a revision to a commit hash. Accepts HEAD, branch names and full
+    or abbreviated commit hashes of at least MIN_ABBREV digits, optionally
+    followed by ~N or ^ to step back through parents. Raises ValueError for
+    unknown or ambiguous revisions.
+    """
+    match = _ANCESTRY.search(revision)
+    name = revision[: match.start()] if match else revision
+    commit_hash = _resolve_name(name, revision)
+    if match:
+        for step in _STEP.finditer(match.group()):
+            count = 1 if step.group().startswith("^") else int(step.group(1) or 1)
+            for _ in range(count):
+                commit = lookup_commit(commit_hash)
+                commit_hash = commit["parent"] if commit else None
+                if commit_hash is None:
+                    raise ValueError(f"unknown revision '{revision}'")
+    return commit_hash
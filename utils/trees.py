@@ -0,0 +1,112 @@
+import json
+
+from .index import entry_hash
+from .objects import read_object, write_object
+
+TREE_MODE = "040000"
+
+
+def blob_mode(entry):
+    """Returns the git-style mode of a file entry ('100755' if executable)."""
+    if isinstance(entry, dict) and entry.get("mode", 0) & 0o111:
+        return "100755"
+    return "100644"
+
+
+def write_tree_object(entries):
+    """Stores one directory level {name: {type, hash, mode}} and returns its hash."""
+    data = json.dumps(entries, sort_keys=True, separators=(",", ":"))
+    return write_object(data.encode("utf-8"), "tree")
+
+
+def read_tree(tree_hash):
+    """Loads one directory level of a tree; a missing tree reads as empty."""
+    if not tree_hash:
+        return {}
+    data = read_object(tree_hash)
+    return json.loads(data) if data is not None else {}
+
+
+def update_tree(tree_hash, changes):
+    """
+    Applies {relpath: entry or None} changes to a tree and returns the new
+    tree hash (None once it is empty). Only the directories along changed
+    paths are rewritten; every other subtree keeps its hash and is shared
+    with the base tree.
+    """
+    entries = read_tree(tree_hash)
+    subdirs = {}
+    for path, entry in changes.items():
+        name, sep, rest = path.partition("/")
+        if sep:
+            subdirs.setdefault(name, {})[rest] = entry
+        elif entry is None:
+            entries.pop(name, None)
+        else:
+            entries[name] = {
+                "type": "blob",
+                "hash": entry_hash(entry),
+                "mode": blob_mode(entry),
+            }
+
+    for name, sub_changes in subdirs.items():
+        existing = entries.get(name)
+        base = existing["hash"] if existing and existing["type"] == "tree" else None
+        sub_hash = update_tree(base, sub_changes)
+        if sub_hash is None:
+            entries.pop(name, None)
+        else:
+            entries[name] = {"type": "tree", "hash": sub_hash, "mode": TREE_MODE}
+
+    if not entries:
+        return None
+    return write_tree_object(entries)
+
+
+def build_tree(files):
+    """Builds a tree from a flat {path: entry} map and returns its hash."""
+    return update_tree(None, files) or write_tree_object({})
+
+
+def flatten_tree(tree_hash, prefix=""):
+    """Returns the flat {path: blob hash} map of every file below a tree."""
+    files = {}
+    for name, entry in sorted(read_tree(tree_hash).items()):
+        path = prefix + name
+        if entry["type"] == "tree":
+            files.update(flatten_tree(entry["hash"], path + "/"))
+        else:
+            files[path] = entry["hash"]
+    return files
+
+
+def diff_trees(old_tree, new_tree, prefix=""):
+    """
+    Yields (path, old_hash, new_hash) for every file that differs between two
+    trees, in path order, with None for a missing side. Entries are merged
+    level by level and subtrees with equal hashes are skipped without being
+    read, so the work scales with the size of the change.
+    """
+    if old_tree == new_tree:
+        return
+    old_entries = read_tree(old_tree)
+    new_entries = read_tree(new_tree)
+    for name in sorted(old_entries.keys() | new_entries.keys()):
+        old = old_entries.get(name)
+        new = new_entries.get(name)
+        if old is not None and new is not None and old["hash"] == new["hash"]:
+            continue
+        path = prefix + name
+        old_is_tree = old is not None and old["type"] == "tree"
+        new_is_tree = new is not None and new["type"] == "tree"
+        if old_is_tree or new_is_tree:
+            yield from diff_trees(
+                old["hash"] if old_is_tree else None,
+                new["hash"] if new_is_tree else None,
+                path + "/",
+            )
+        if not old_is_tree or not new_is_tree:
+            old_hash = old["hash"] if old is not None and not old_is_tree else None
+            new_hash = new["hash"] if new is not None and not new_is_tree else None
+            if old_hash != new_hash:
+                yield path, old_hash, new_hash
@@ -0,0 +1,90 @@
+import glob
+import os
+import stat
+
+from .file_operations import normalize_path
+from .ignore import compile_ignore
+
+
+def _scan_directory(path, matcher):
+    """
+    Yields (relpath, stat_result) for the regular files below a directory,
+    in sorted path order. File types come from the directory listing itself,
+    so the only per-file syscall is the stat whose result is handed out.
+    """
+    prefix = "" if path == "." else path + "/"
+    try:
+        scanner = os.scandir(path)
+    except OSError:
+        return
+    with scanner:
+        entries = sorted(scanner, key=lambda entry: entry.name)
+
+    for entry in entries:
+        rel_path = prefix + entry.name
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            continue
+        if is_dir:
+            # Like os.walk, symlinked directories are listed but not followed
+            if entry.is_symlink() or matcher.match(rel_path, is_dir=True):
+                continue
+            yield from _scan_directory(rel_path, matcher)
+        elif not matcher.match(rel_path):
+            try:
+                st = entry.stat()
+            except OSError:
+                continue  # Vanished, or a dangling symlink
+            if stat.S_ISREG(st.st_mode):
+                yield rel_path, st
+
+
+def walk_files(paths, ignore_patterns=None, missing_files=None):
+    """
+    Generator yielding (relpath, stat_result) for every non-ignored regular
+    file under paths, which may be files, directories or glob patterns.
+    Records are produced as the walk goes, so callers can start working
+    before it finishes. Paths that match nothing are appended to
+    missing_files when a list is given.
+    """
+    matcher = compile_ignore(ignore_patterns)
+
+    for path in paths:
+        rel_path = normalize_path(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            st = None
+
+        if st is not None and stat.S_ISDIR(st.st_mode):
+            if not matcher.is_ignored(rel_path, is_dir=True):
+                yield from _scan_directory(rel_path, matcher)
+        elif st is not None:
+            if stat.S_ISREG(st.st_mode) and not matcher.is_ignored(rel_path):
+                yield rel_path, st
+        else:
+            # Handle glob patterns
+            glob_files = glob.glob(path)
+            if not glob_files and missing_files is not None:
+                missing_files.append(path)
+            for file in glob_files:
+                rel_path = normalize_path(file)
+                try:
+                    st = os.stat(file)
+                except OSError:
+                    continue
+                if stat.S_ISREG(st.st_mode) and not matcher.is_ignored(rel_path):
+                    yield rel_path, st
+
+
+def get_files(paths, ignore_patterns=None):
+    """
+    Get valid files from a list of paths, filtering out ignored files.
+    Ignored directories are pruned before the walk descends into them.
+    """
+    missing_files = []
+    valid_files = [
+        path for path, _ in walk_files(paths, ignore_patterns, missing_files)
+    ]
+    return valid_files, missing_files